@@ -1,29 +1,38 @@
 import asyncio
 from contextlib import suppress
 import logging
+import time
+from typing import Awaitable, TypeVar
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage
 from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
 
+from app import create_dispatcher
 from config import Config, load_config
-from database import DefaultDatabase, PostgresDatabase
-from handlers import admin_router, commands_router, user_router
+from database import DefaultDatabase, head_revision, PostgresDatabase
 from keyboards.set_menu import setup_menu
 from logger import get_logger
-from middleware import setup as setup_middlewares
-from repository import GenreRepository, SongHistoryRepository, SongRepository, UserRepository, WishlistRepository
-from service import GenreService, SongService, UserService
+from metrics import DatabasePoolCollector, MetricsServer, REGISTRY
+from scheduler import Cron, Interval, Scheduler
+from service import BroadcastService, HistoryRetentionService, RecommendationService, TrendingService
+from storage import create_redis, HashTagKeyBuilder, PipelinedRedisStorage
+
+
+T = TypeVar("T")
 
 
 async def shutdown(
     bot: Bot,
     dp: Dispatcher,
     logger: logging.Logger,
-    redis: Redis | None,
+    redis: Redis | RedisCluster | None,
     db: DefaultDatabase,
+    metrics_server: MetricsServer | None,
+    scheduler: Scheduler,
+    background_tasks: list[asyncio.Task],
 ) -> None:
     """
     Gracefully shutdown bot and resources.
@@ -31,6 +40,12 @@ async def shutdown(
 
     logger.info("Shutting down bot...")
 
+    logger.debug("Stopping background jobs...")
+    await scheduler.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
     logger.debug("Closing storage...")
     await dp.fsm.storage.close()
     if redis:
@@ -45,6 +60,13 @@ async def shutdown(
     except Exception as e:
         logger.error("Failed to close bot session: %s", str(e))
 
+    if metrics_server:
+        logger.debug("Stopping metrics server...")
+        try:
+            await metrics_server.stop()
+        except Exception as e:
+            logger.error("Failed to stop metrics server: %s", str(e))
+
     logger.debug("Closing database connection...")
     try:
         await db.close()
@@ -54,7 +76,134 @@ async def shutdown(
     logger.info("Bot shut down successfully.")
 
 
+async def start_metrics_server(config: Config, db: PostgresDatabase, logger: logging.Logger) -> MetricsServer | None:
+    """
+    Expose the metrics endpoint if it is enabled.
+    """
+
+    if not config.metrics.enabled:
+        return None
+
+    logger.debug("Starting metrics server...")
+    pools = [("primary", "primary", db.engine.pool)]
+    pools += [(replica.address, "replica", replica.engine.pool) for replica in db.replicas]
+    REGISTRY.register(DatabasePoolCollector(pools))
+    metrics_server = MetricsServer(config.metrics)
+    try:
+        await metrics_server.start()
+    except Exception as e:
+        logger.error("Metrics server failed to start: %s", str(e))
+        return None
+    return metrics_server
+
+
+def schedule_jobs(scheduler: Scheduler, config: Config, dp: Dispatcher, logger: logging.Logger) -> None:
+    """
+    Register the periodic jobs.
+    """
+
+    recommendation_service: RecommendationService = dp.workflow_data["recommendation_service"]
+    trending_service: TrendingService = dp.workflow_data["trending_service"]
+    retention_service: HistoryRetentionService = dp.workflow_data["retention_service"]
+
+    refresh_interval = config.recommendations.refresh_interval
+    scheduler.add("recommendations", recommendation_service.refresh, Interval(refresh_interval))
+    # Every instance picks up the tables stored by the one that computed them, half an interval later
+    scheduler.add(
+        "recommendations-reload",
+        recommendation_service.load,
+        Interval(refresh_interval, offset=refresh_interval / 2),
+        jitter=min(60, refresh_interval / 10),
+        exclusive=False,
+    )
+    scheduler.add("trending", trending_service.rebuild, Interval(config.trending.refresh_interval))
+    scheduler.add(
+        "history-retention",
+        retention_service.maintain,
+        Interval(config.retention.interval),
+        timeout=config.retention.interval,
+    )
+
+    db: PostgresDatabase = dp.workflow_data["database"]
+    if db.replicas:
+        scheduler.add(
+            "replica-health",
+            db.check_replicas,
+            Interval(config.postgres.replica_check_interval),
+            exclusive=False,
+        )
+
+    storage = dp.fsm.storage
+    if isinstance(storage, PipelinedRedisStorage):
+
+        async def sweep_fsm() -> None:
+            deleted = await storage.sweep(config.scheduler.fsm_max_idle)
+            logger.info("FSM sweep deleted %d records", deleted)
+
+        scheduler.add("fsm-sweep", sweep_fsm, Cron(config.scheduler.fsm_sweep))
+
+
+async def check_schema(db: PostgresDatabase) -> None:
+    """
+    Make sure the database is migrated to the latest revision shipped with the bot.
+    """
+
+    # Parsing the migration scripts is blocking file I/O
+    expected, current = await asyncio.gather(asyncio.to_thread(head_revision), db.get_revision())
+    if current != expected:
+        raise RuntimeError(f"database is at revision {current}, expected {expected}; run `alembic upgrade head`")
+
+
+async def warm_up(dp: Dispatcher, db: PostgresDatabase) -> None:
+    """
+    Fill the caches and open the connections before the first update arrives.
+    """
+
+    recommendation_service: RecommendationService = dp.workflow_data["recommendation_service"]
+    retention_service: HistoryRetentionService = dp.workflow_data["retention_service"]
+    await asyncio.gather(
+        db.warm_up(),
+        # History can only be written once the partition of the current month exists
+        retention_service.ensure_partitions(),
+        recommendation_service.load(),
+    )
+
+
+def start_background_jobs(bot: Bot, dp: Dispatcher, scheduler: Scheduler, logger: logging.Logger) -> list[asyncio.Task]:
+    """
+    Start the periodic jobs and the workers.
+    """
+
+    logger.debug("Starting background jobs...")
+    broadcast_service: BroadcastService = dp.workflow_data["broadcast_service"]
+    scheduler.start()
+    return [asyncio.create_task(broadcast_service.run(bot), name="broadcast")]
+
+
+class StartupTimer:
+    """
+    Measures the startup phases for a single report line.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: dict[str, float] = {}
+
+    async def measure(self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[name] = time.perf_counter() - started
+
+    def report(self) -> str:
+        phases = ", ".join(f"{name} {duration:.3f} s" for name, duration in self.durations.items())
+        return f"{time.perf_counter() - self.started:.3f} s ({phases})"
+
+
 async def main() -> None:
+    timer = StartupTimer()
+
     # Loading the config
     config: Config = load_config()
 
@@ -62,70 +211,66 @@ async def main() -> None:
     logger = get_logger("main", config.logger)
     logger.info("Starting bot...")
 
-    logger.debug("Initializing the storage object...")
-    redis = Redis(host=config.redis.host, port=config.redis.port, db=config.redis.db)
-    try:
-        await redis.ping()
-    except Exception as e:
-        logger.fatal("Storage initialization failed: %s", str(e))
-        return
-    storage = RedisStorage(redis=redis)
-
-    logger.debug("Connecting to the database...")
-    db = PostgresDatabase(config=config.postgres)
-    try:
-        await db.init_db()
-    except Exception as e:
-        logger.fatal("Database connection failed: %s", str(e))
-        return
-
+    # Nothing below connects anywhere yet, connections are opened concurrently afterwards
     logger.debug("Initializing the bot...")
     try:
+        redis = create_redis(config.redis)
+        storage = PipelinedRedisStorage(
+            redis=redis,
+            key_builder=HashTagKeyBuilder(),
+            state_ttl=config.redis.state_ttl,
+            data_ttl=config.redis.data_ttl,
+        )
+        db = PostgresDatabase(config=config.postgres, logger=logger)
         bot = Bot(token=config.bot.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-        dp = Dispatcher(storage=storage)
+        dp = create_dispatcher(config, storage, db, logger, redis)
     except Exception as e:
         logger.fatal("Bot initialization failed: %s", str(e))
         return
-    dp.workflow_data["logger"] = logger
-    dp.workflow_data["database"] = db
 
-    logger.debug("Loading menu...")
-    try:
-        await setup_menu(bot)
-    except Exception as e:
-        logger.fatal("Menu loading failed: %s", str(e))
-
-    logger.debug("Registering repositories...")
-    user_repository = UserRepository(db)
-    song_repository = SongRepository(db)
-    song_history_repository = SongHistoryRepository(db)
-    genre_repository = GenreRepository(db)
-    wishlist_repository = WishlistRepository(db)
-
-    logger.debug("Registering services...")
-    user_service = UserService(user_repository, wishlist_repository, song_history_repository, logger)
-    dp.workflow_data["user_service"] = user_service
-    genre_service = GenreService(genre_repository, logger)
-    dp.workflow_data["genre_service"] = genre_service
-    song_service = SongService(song_repository, genre_service, logger)
-    dp.workflow_data["song_service"] = song_service
-
-    logger.debug("Registering routers...")
-    dp.include_router(commands_router)
-    dp.include_router(admin_router)
-    dp.include_router(user_router)
-
-    logger.debug("Registering middlewares...")
-    setup_middlewares(dp, logger, user_service=user_service)
-
-    # Graceful shutdown handling
+    scheduler = Scheduler(redis, config.scheduler, logger)
+    metrics_server: MetricsServer | None = None
+    background_tasks: list[asyncio.Task] = []
+
+    # Everything opened from here on, including by a startup step that failed, is closed by shutdown()
     try:
+        logger.debug("Connecting to the storage, the database and Telegram...")
+        redis_ping, schema, me, menu, metrics_server = await asyncio.gather(
+            timer.measure("redis", redis.ping()),
+            timer.measure("schema", check_schema(db)),
+            timer.measure("bot", bot.me()),
+            timer.measure("menu", setup_menu(bot)),
+            timer.measure("metrics", start_metrics_server(config, db, logger)),
+            return_exceptions=True,
+        )
+        if isinstance(metrics_server, BaseException):
+            logger.error("Metrics server failed to start: %s", str(metrics_server))
+            metrics_server = None
+        failed = False
+        for name, result in (("Storage", redis_ping), ("Database", schema), ("Bot", me)):
+            if isinstance(result, BaseException):
+                logger.fatal("%s initialization failed: %s", name, str(result))
+                failed = True
+        if failed:
+            return
+        if isinstance(menu, BaseException):
+            logger.error("Menu loading failed: %s", str(menu))
+        elif not menu:
+            logger.debug("Menu is up to date")
+
+        logger.debug("Warming up...")
+        await timer.measure("warm-up", warm_up(dp, db))
+
+        schedule_jobs(scheduler, config, dp, logger)
+        background_tasks = start_background_jobs(bot, dp, scheduler, logger)
+        logger.info("Startup took %s", timer.report())
+
         logger.info("Bot was started")
         await dp.start_polling(bot)
     except Exception as e:
         logger.fatal("An error occurred: %s", e)
     finally:
-        await shutdown(bot, dp, logger, redis, db)
+        await shutdown(bot, dp, logger, redis, db, metrics_server, scheduler, background_tasks)
 
 
 if __name__ == "__main__":
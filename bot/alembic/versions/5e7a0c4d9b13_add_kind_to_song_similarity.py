@@ -0,0 +1,34 @@
+"""add kind to song_similarity
+
+Revision ID: 5e7a0c4d9b13
+Revises: c3d9e1a2b4f6
+Create Date: 2026-10-19 14:02:17.548112
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e7a0c4d9b13"
+down_revision: Union[str, None] = "c3d9e1a2b4f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows are co-occurrence neighbours
+    op.add_column("song_similarity", sa.Column("kind", sa.SmallInteger(), nullable=False, server_default="1"))
+    op.alter_column("song_similarity", "kind", server_default=None)
+    op.drop_constraint("song_similarity_pkey", "song_similarity", type_="primary")
+    op.create_primary_key("song_similarity_pkey", "song_similarity", ["song_id", "kind", "similar_song_id"])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM song_similarity WHERE kind <> 1")
+    op.drop_constraint("song_similarity_pkey", "song_similarity", type_="primary")
+    op.create_primary_key("song_similarity_pkey", "song_similarity", ["song_id", "similar_song_id"])
+    op.drop_column("song_similarity", "kind")
@@ -0,0 +1,102 @@
+"""partition view_history by month
+
+Revision ID: e4b7a9d2c613
+Revises: d81c5f3a7e20
+Create Date: 2026-10-19 18:22:40.173905
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b7a9d2c613"
+down_revision: Union[str, None] = "d81c5f3a7e20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions are created from the oldest row up to this many months ahead;
+# later ones are created by HistoryRetentionService
+MONTHS_AHEAD = 3
+
+
+def _move_aside() -> None:
+    op.execute("ALTER TABLE view_history RENAME TO view_history_old")
+    op.execute("ALTER TABLE view_history_old RENAME CONSTRAINT view_history_pkey TO view_history_old_pkey")
+    op.execute("ALTER INDEX ix_view_history_viewed_at_user_id RENAME TO ix_view_history_old_viewed_at_user_id")
+    # The id sequence survives the old table and keeps numbering the new one
+    op.execute("ALTER SEQUENCE view_history_id_seq OWNED BY NONE")
+
+
+def upgrade() -> None:
+    _move_aside()
+    op.execute(
+        """
+        CREATE TABLE view_history (
+            id INTEGER NOT NULL DEFAULT nextval('view_history_id_seq'),
+            user_id VARCHAR(20) NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            song_title VARCHAR(150) NOT NULL,
+            viewed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            PRIMARY KEY (id, viewed_at)
+        ) PARTITION BY RANGE (viewed_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE view_history_id_seq OWNED BY view_history.id")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            bound timestamp := date_trunc('month', coalesce((SELECT min(viewed_at) FROM view_history_old), now()));
+        BEGIN
+            WHILE bound <= date_trunc('month', now()) + interval '{MONTHS_AHEAD} months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF view_history FOR VALUES FROM (%L) TO (%L)',
+                    'view_history_p' || to_char(bound, 'YYYY_MM'),
+                    bound,
+                    bound + interval '1 month'
+                );
+                bound := bound + interval '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute(
+        "INSERT INTO view_history (id, user_id, song_title, viewed_at, action) "
+        "SELECT id, user_id, song_title, viewed_at, action FROM view_history_old"
+    )
+    op.execute("DROP TABLE view_history_old")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_index("ix_view_history_viewed_at_user_id", "view_history", ["viewed_at", "user_id"], unique=False)
+    op.create_index("ix_view_history_user_id_viewed_at", "view_history", ["user_id", "viewed_at"], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    _move_aside()
+    op.execute(
+        """
+        CREATE TABLE view_history (
+            id INTEGER NOT NULL DEFAULT nextval('view_history_id_seq'),
+            user_id VARCHAR(20) NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            song_title VARCHAR(150) NOT NULL,
+            viewed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE view_history_id_seq OWNED BY view_history.id")
+    op.execute(
+        "INSERT INTO view_history (id, user_id, song_title, viewed_at, action) "
+        "SELECT id, user_id, song_title, viewed_at, action FROM view_history_old"
+    )
+    # Drops the partitions as well; archived partitions are not restored
+    op.execute("DROP TABLE view_history_old")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_index("ix_view_history_viewed_at_user_id", "view_history", ["viewed_at", "user_id"], unique=False)
+    # ### end Alembic commands ###
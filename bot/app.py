@@ -0,0 +1,116 @@
+import logging
+from typing import Optional, Union
+
+from aiogram import Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
+from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+
+from config import Config
+from database import DefaultDatabase
+from handlers import admin_router, commands_router, user_router
+from middleware import setup as setup_middlewares
+from repository import (
+    GenreRepository,
+    HistoryPartitionRepository,
+    SimilarityRepository,
+    SongHistoryRepository,
+    SongRepository,
+    StatsRepository,
+    UserRepository,
+    WishlistRepository,
+)
+from service import (
+    BroadcastService,
+    GenreService,
+    HistoryRetentionService,
+    RecommendationService,
+    SongService,
+    StatsService,
+    TrendingService,
+    UserService,
+    WishlistCache,
+)
+from storage import BoundedEventIsolation
+
+
+def create_dispatcher(
+    config: Config,
+    storage: BaseStorage,
+    db: DefaultDatabase,
+    logger: logging.Logger,
+    redis: Optional[Union[Redis, RedisCluster]] = None,
+) -> Dispatcher:
+    """Build the dispatcher with all repositories, services, routers and middlewares.
+
+    Args:
+        config (Config): Application config
+        storage (BaseStorage): FSM storage
+        db (DefaultDatabase): Database
+        logger (logging.Logger): Application logger
+        redis (Optional[Union[Redis, RedisCluster]]): Redis client for the trending songs,
+            the wishlist cache and the broadcast state. Disabled if None
+
+    Returns:
+        Dispatcher: Dispatcher ready for polling or feeding updates
+    """
+    dp = Dispatcher(storage=storage, events_isolation=BoundedEventIsolation(config.isolation))
+    dp.workflow_data["logger"] = logger
+    dp.workflow_data["database"] = db
+
+    logger.debug("Registering repositories...")
+    user_repository = UserRepository(db)
+    song_repository = SongRepository(db)
+    song_history_repository = SongHistoryRepository(db)
+    genre_repository = GenreRepository(db)
+    wishlist_repository = WishlistRepository(db)
+    similarity_repository = SimilarityRepository(db)
+    stats_repository = StatsRepository(db)
+    partition_repository = HistoryPartitionRepository(db)
+
+    logger.debug("Registering services...")
+    trending_service = TrendingService(redis, config.trending, logger)
+    dp.workflow_data["trending_service"] = trending_service
+    user_service = UserService(
+        user_repository,
+        wishlist_repository,
+        song_history_repository,
+        logger,
+        trending=trending_service,
+        history_config=config.history,
+        wishlist_cache=WishlistCache(redis, wishlist_repository, config.wishlist, logger),
+    )
+    dp.workflow_data["user_service"] = user_service
+    genre_service = GenreService(genre_repository, logger)
+    dp.workflow_data["genre_service"] = genre_service
+    song_service = SongService(song_repository, genre_service, logger)
+    dp.workflow_data["song_service"] = song_service
+    recommendation_service = RecommendationService(similarity_repository, config.recommendations, logger)
+    dp.workflow_data["recommendation_service"] = recommendation_service
+    stats_service = StatsService(stats_repository, config.stats, logger)
+    dp.workflow_data["stats_service"] = stats_service
+    retention_service = HistoryRetentionService(partition_repository, config.retention, logger)
+    dp.workflow_data["retention_service"] = retention_service
+    broadcast_service = BroadcastService(redis, user_service, config.broadcast, logger)
+    dp.workflow_data["broadcast_service"] = broadcast_service
+
+    logger.debug("Registering routers...")
+    dp.include_router(commands_router)
+    dp.include_router(admin_router)
+    dp.include_router(user_router)
+
+    logger.debug("Registering middlewares...")
+    setup_middlewares(
+        dp,
+        logger,
+        user_service=user_service,
+        query_budget=config.postgres.query_budget,
+        nav_debounce=config.bot.nav_debounce,
+        # Without replicas every read already sees every write
+        read_your_writes=config.postgres.read_your_writes if config.postgres.replicas else 0,
+    )
+
+    return dp
+
+
+__all__ = ["create_dispatcher"]
@@ -0,0 +1,283 @@
+"""Deterministic synthetic dataset.
+
+The same seed and ``until`` date always produce the same rows. Rows are generated lazily
+and streamed into PostgreSQL with COPY, so millions of history rows never sit in memory.
+"""
+
+from bisect import bisect
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from logging import Logger
+import random
+import time
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from models import HistoryAction, SongTempo, SongType
+from repository.partition import add_months, month_of, partition_ddl
+
+# Telegram ids of the generated users, far away from real ones
+USER_ID_BASE = 10**12
+
+TYPE_WEIGHTS = {
+    SongType.universal: 35,
+    SongType.female: 30,
+    SongType.male: 20,
+    SongType.duet: 10,
+    SongType.children: 5,
+}
+TEMPO_WEIGHTS = {
+    SongTempo.dance: 40,
+    SongTempo.mid_tempo: 35,
+    SongTempo.slow: 25,
+}
+GENRES = [
+    "Поп",
+    "Эстрада",
+    "Шансон",
+    "Рок",
+    "Романс",
+    "Свадебная",
+    "Юбилейная",
+    "Лирика",
+    "Баллада",
+    "Диско",
+    "Фолк",
+    "Джаз",
+    "Хип-хоп",
+    "Электроника",
+    "Новогодняя",
+    "Патриотическая",
+    "Детская",
+    "Военная",
+    "Кантри",
+    "Инди",
+]
+# Share of history rows per action
+ACTION_WEIGHTS = {HistoryAction.view: 90, HistoryAction.like: 6, HistoryAction.remove: 3, HistoryAction.delete: 1}
+
+WORDS = (
+    "любовь ночь город небо сердце море дорога весна ветер звезда песня танец огонь мечта лето "
+    "осень зима снег дождь солнце память судьба берег глаза руки время счастье свет путь дом"
+).split()
+
+
+@dataclass
+class DatasetSize:
+    """Row counts derived from the number of history rows"""
+
+    history: int
+    users: int
+    songs: int
+    # Mean wishlist length; the actual lengths follow an exponential distribution
+    wishlist_per_user: float = 5
+    # History rows are spread over this many months before ``until``
+    months: int = 6
+
+    @classmethod
+    def for_rows(cls, rows: int) -> "DatasetSize":
+        return cls(history=rows, users=max(100, rows // 100), songs=max(100, rows // 100))
+
+    def user_id(self, n: int) -> str:
+        return str(USER_ID_BASE + n)
+
+
+class _Picker:
+    """Weighted random choice with precomputed cumulative weights"""
+
+    def __init__(self, rng: random.Random, weights: Sequence[float]):
+        self.rng = rng
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def __call__(self) -> int:
+        return bisect(self.cumulative, self.rng.random() * self.total)
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1 / (rank**s) for rank in range(1, n + 1)]
+
+
+class DatasetGenerator:
+    """Generates the rows of every table in dependency order"""
+
+    def __init__(self, size: DatasetSize, seed: int = 42, until: Optional[datetime] = None):
+        self.size = size
+        self.seed = seed
+        self.until = until or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        # Every table gets its own stream, so changing one of them does not shift the others
+        self._rngs = {name: random.Random(f"{seed}:{name}") for name in ("users", "songs", "wishlist", "history")}
+
+        rng = random.Random(f"{seed}:popularity")
+        song_ranks = list(range(1, size.songs + 1))
+        rng.shuffle(song_ranks)
+        # Song popularity follows Zipf's law, user activity a log-normal distribution
+        self.song_weights = [1 / (rank**1.1) for rank in song_ranks]
+        self.user_weights = [rng.lognormvariate(0, 1.2) for _ in range(size.users)]
+
+    def users(self) -> Iterator[Tuple[Any, ...]]:
+        rng = self._rngs["users"]
+        start = self.until - timedelta(days=30 * self.size.months * 2)
+        span = (self.until - start).total_seconds()
+        for n in range(1, self.size.users + 1):
+            joined = start + timedelta(seconds=rng.random() * span)
+            # The first user is the admin who uploaded the catalog
+            yield self.size.user_id(n), f"user_{n}", n == 1, False, joined
+
+    def genres(self) -> Iterator[Tuple[Any, ...]]:
+        for n, title in enumerate(GENRES, start=1):
+            yield n, title
+
+    def songs(self) -> Iterator[Tuple[Any, ...]]:
+        rng = self._rngs["songs"]
+        pick_type = _Picker(rng, list(TYPE_WEIGHTS.values()))
+        pick_tempo = _Picker(rng, list(TEMPO_WEIGHTS.values()))
+        types = list(TYPE_WEIGHTS)
+        tempos = list(TEMPO_WEIGHTS)
+        author = self.size.user_id(1)
+
+        for n in range(1, self.size.songs + 1):
+            title = f"{' '.join(rng.sample(WORDS, 2)).capitalize()} #{n}"
+            lyrics = None
+            if rng.random() < 0.7:
+                lyrics = "\n".join(" ".join(rng.choices(WORDS, k=6)) for _ in range(16))
+            song_type, tempo = types[pick_type()], tempos[pick_tempo()]
+            yield n, author, title, lyrics, f"synthetic_{n}", "video", song_type.name, tempo.name
+
+    def genre_to_song(self) -> Iterator[Tuple[Any, ...]]:
+        rng = self._rngs["songs"]
+        pick_genre = _Picker(rng, _zipf_weights(len(GENRES), 0.8))
+        for song_id in range(1, self.size.songs + 1):
+            genre_ids = {pick_genre() + 1 for _ in range(rng.choice((1, 1, 2, 2, 3)))}
+            for genre_id in sorted(genre_ids):
+                yield genre_id, song_id
+
+    def wishlist(self) -> Iterator[Tuple[Any, ...]]:
+        rng = self._rngs["wishlist"]
+        pick_song = _Picker(rng, self.song_weights)
+        span = timedelta(days=30 * self.size.months).total_seconds()
+        start = self.until - timedelta(seconds=span)
+        for n in range(1, self.size.users + 1):
+            count = min(int(rng.expovariate(1 / self.size.wishlist_per_user)), self.size.songs)
+            song_ids = {pick_song() + 1 for _ in range(count)}
+            for song_id in sorted(song_ids):
+                yield self.size.user_id(n), song_id, start + timedelta(seconds=rng.random() * span)
+
+    def history(self) -> Iterator[Tuple[Any, ...]]:
+        rng = self._rngs["history"]
+        pick_song = _Picker(rng, self.song_weights)
+        pick_user = _Picker(rng, self.user_weights)
+        pick_action = _Picker(rng, list(ACTION_WEIGHTS.values()))
+        actions = list(ACTION_WEIGHTS)
+        span = timedelta(days=30 * self.size.months).total_seconds()
+        start = self.until - timedelta(seconds=span)
+        for n in range(1, self.size.history + 1):
+            viewed_at = start + timedelta(seconds=rng.random() * span)
+            user_id, song_id, action = self.size.user_id(pick_user() + 1), pick_song() + 1, int(actions[pick_action()])
+            yield n, user_id, song_id, viewed_at, viewed_at, action
+
+    def tables(self) -> List[Tuple[str, List[str], Iterator[Tuple[Any, ...]]]]:
+        """Tables with their columns and rows, in the order they have to be loaded"""
+        return [
+            ("users", ["id", "username", "is_staff", "is_superuser", "date_joined"], self.users()),
+            ("genres", ["id", "title"], self.genres()),
+            (
+                "songs",
+                ["id", "author_id", "title", "lyrics", "file_id", "file_type", "type", "tempo"],
+                self.songs(),
+            ),
+            ("genre_to_song", ["genre_id", "song_id"], self.genre_to_song()),
+            ("wishlist", ["user_id", "song_id", "added_at"], self.wishlist()),
+            (
+                "view_history",
+                ["id", "user_id", "song_id", "viewed_at", "last_seen_at", "action"],
+                self.history(),
+            ),
+        ]
+
+
+async def _check_disposable(conn: AsyncConnection) -> None:
+    real_users = await conn.scalar(
+        text("SELECT count(*) FROM users WHERE length(id) < :digits"),
+        {"digits": len(str(USER_ID_BASE))},
+    )
+    if real_users:
+        raise RuntimeError(f"Refusing to seed: the database has {real_users} real users")
+
+
+async def generate(
+    engine: AsyncEngine,
+    size: DatasetSize,
+    seed: int = 42,
+    until: Optional[datetime] = None,
+    logger: Optional[Logger] = None,
+) -> None:
+    """Replace the contents of a database without real users with a synthetic dataset.
+
+    Args:
+        engine (AsyncEngine): Engine of a database with the current schema
+        size (DatasetSize): Row counts
+        seed (int): Seed of the generator
+        until (Optional[datetime]): End of the history period. Defaults to today's midnight
+        logger (Optional[Logger]): Logger for the progress
+
+    Raises:
+        RuntimeError: If the database contains users that were not generated
+    """
+    generator = DatasetGenerator(size, seed, until)
+
+    async with engine.begin() as conn:
+        await _check_disposable(conn)
+        await conn.execute(
+            text(
+                "TRUNCATE song_stats, view_history, wishlist, genre_to_song, songs, genres, users "
+                "RESTART IDENTITY CASCADE",
+            ),
+        )
+
+        # view_history is partitioned by month, every month of the generated period needs its partition
+        month = month_of(generator.until - timedelta(days=30 * size.months))
+        while month <= month_of(generator.until):
+            await conn.execute(text(partition_ddl(month)))
+            month = add_months(month, 1)
+
+        raw = await conn.get_raw_connection()
+        copy_connection = raw.driver_connection
+        for table, columns, rows in generator.tables():
+            start = time.perf_counter()
+            result = await copy_connection.copy_records_to_table(table, records=rows, columns=columns)
+            if logger:
+                logger.info("%s: %s in %.1f s", table, result, time.perf_counter() - start)
+
+        # Explicit ids were copied, so move the sequences past them
+        for table in ("genres", "songs", "view_history"):
+            await conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) "
+                    f"FROM {table}",
+                ),
+            )
+
+        # Popularity counters are maintained by the bot, so derive them from the copied history
+        await conn.execute(
+            text(
+                "INSERT INTO song_stats (song_id, views, likes, removes) "
+                "SELECT song_id, "
+                "count(*) FILTER (WHERE action = :view), "
+                "count(*) FILTER (WHERE action = :like), "
+                "count(*) FILTER (WHERE action = :remove) "
+                "FROM view_history WHERE song_id IS NOT NULL "
+                "GROUP BY song_id",
+            ),
+            {"view": HistoryAction.view, "like": HistoryAction.like, "remove": HistoryAction.remove},
+        )
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+
+
+__all__ = ["DatasetGenerator", "DatasetSize", "USER_ID_BASE", "generate"]
@@ -0,0 +1,437 @@
+"""End-to-end load test of the bot.
+
+Real Telegram updates are fed into the real Dispatcher (middlewares, filters, FSM storage,
+services and PostgreSQL); only the Bot API is replaced by an in-process session with a
+configurable latency. Every virtual user runs one of the scripted scenarios in a loop.
+
+The admin scenario edits songs, so run it against a local database only.
+
+Usage (from the bot directory):
+    python -m benchmarks.loadtest --users 200 --duration 60 --output loadtest.json
+"""
+
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import itertools
+import json
+import logging
+import random
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message, TelegramObject, Update, User
+
+from app import create_dispatcher
+from config import Config, load_config
+from database import PostgresDatabase
+from logger import get_logger
+from models import SongTempo, SongType
+from service import GenreService, SongService, UserService
+from storage import create_redis, HashTagKeyBuilder, PipelinedRedisStorage
+
+# Telegram ids of the virtual users, far away from real ones
+USER_ID_BASE = 10**12
+BOT_ID = 42
+
+
+class FakeSession(BaseSession):
+    """Bot API session that answers every request locally after a fixed delay"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        returning = method.__returning__
+        if returning is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message.model_validate(  # type: ignore[return-value]
+                {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": BOT_ID, "is_bot": True, "first_name": "SongSellBot"},
+                    "text": "",
+                },
+                context={"bot": bot},
+            )
+        if returning is User:
+            return User(id=BOT_ID, is_bot=True, first_name="SongSellBot")  # type: ignore[return-value]
+        return True  # type: ignore[return-value]
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+class HandlerRecorder(BaseMiddleware):
+    """Remembers which handler processed each update and whether it failed.
+
+    The logging middleware swallows handler exceptions, so they are noted here.
+    """
+
+    def __init__(self, handlers: Dict[int, str], failed: set[int]):
+        self.handlers = handlers
+        self.failed = failed
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_id = data["event_update"].update_id
+        self.handlers[update_id] = data["handler"].callback.__name__
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.failed.add(update_id)
+            raise
+
+
+@dataclass
+class Catalog:
+    """Real values the scenarios pick from"""
+
+    genres: List[str]
+    titles: List[str]
+
+
+@dataclass
+class Results:
+    started: float = 0.0
+    finished: float = 0.0
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Counter = field(default_factory=Counter)
+
+
+# A step is ("text", value) for a message or ("callback", value) for a button press
+Step = tuple[str, str]
+
+
+def catalog_scenario(catalog: Catalog) -> List[Step]:
+    steps = [
+        ("text", "/catalog"),
+        ("callback", f"type:{random.choice(list(SongType)).value}"),
+        ("callback", "action:filter"),
+        ("callback", f"tempo:{random.choice(list(SongTempo)).value}"),
+    ]
+    if catalog.genres:
+        steps.append(("callback", f"genre:{random.choice(catalog.genres)}"))
+    steps += [
+        ("callback", "genre:done"),
+        ("callback", "nav:next"),
+        ("callback", "nav:next"),
+        ("callback", "nav:prev"),
+    ]
+    return steps
+
+
+def swipe_scenario(catalog: Catalog) -> List[Step]:
+    steps = [
+        ("text", "/catalog"),
+        ("callback", f"type:{random.choice(list(SongType)).value}"),
+        ("callback", "action:all"),
+    ]
+    steps += [("callback", "nav:next")] * random.randint(3, 8)
+    steps += [("callback", "nav:prev")] * random.randint(0, 3)
+    return steps
+
+
+def wishlist_scenario(catalog: Catalog) -> List[Step]:
+    return [
+        ("text", "/catalog"),
+        ("callback", f"type:{random.choice(list(SongType)).value}"),
+        ("callback", "action:all"),
+        ("callback", "nav:like"),
+        ("callback", "nav:next"),
+        ("callback", "nav:like"),
+        ("text", "/wishlist"),
+        ("callback", "wish:next"),
+        ("callback", "wish:prev"),
+    ]
+
+
+def admin_scenario(catalog: Catalog) -> List[Step]:
+    return [
+        ("text", "🔐 Панель администратора"),
+        ("text", "✏️ Изменить песню"),
+        ("text", random.choice(catalog.titles) if catalog.titles else "-"),
+        ("callback", "edit_tempo"),
+        ("callback", random.choice(list(SongTempo)).value),
+        ("callback", "edit_exit"),
+    ]
+
+
+USER_SCENARIOS = [catalog_scenario, swipe_scenario, wishlist_scenario]
+
+
+class LoadTest:
+    def __init__(self, bot: Bot, dp: Dispatcher, catalog: Catalog, args: argparse.Namespace):
+        self.bot = bot
+        self.dp = dp
+        self.catalog = catalog
+        self.args = args
+        self.results = Results()
+        self.handlers: Dict[int, str] = {}
+        self.failed: set[int] = set()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+        recorder = HandlerRecorder(self.handlers, self.failed)
+        dp.message.middleware(recorder)
+        dp.callback_query.middleware(recorder)
+
+    def _build_update(self, user_id: int, kind: str, value: str) -> Update:
+        update_id = next(self._update_ids)
+        user = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load_{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        now = int(time.time())
+
+        if kind == "text":
+            raw: Dict[str, Any] = {
+                "update_id": update_id,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": now,
+                    "chat": chat,
+                    "from": user,
+                    "text": value,
+                },
+            }
+        else:
+            raw = {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": user,
+                    "chat_instance": str(user_id),
+                    "data": value,
+                    "message": {
+                        "message_id": next(self._message_ids),
+                        "date": now,
+                        "chat": chat,
+                        "from": {"id": BOT_ID, "is_bot": True, "first_name": "SongSellBot"},
+                        "text": "",
+                    },
+                },
+            }
+        return Update.model_validate(raw, context={"bot": self.bot})
+
+    async def _send(self, user_id: int, kind: str, value: str) -> None:
+        update = self._build_update(user_id, kind, value)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        failed = False
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            failed = True
+        elapsed = loop.time() - start
+
+        name = self.handlers.pop(update.update_id, "unhandled")
+        self.results.latencies[name].append(elapsed)
+        if failed or update.update_id in self.failed:
+            self.failed.discard(update.update_id)
+            self.results.errors[name] += 1
+
+    async def _virtual_user(self, user_id: int, is_admin: bool, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        # Spread the first requests instead of starting every user at once
+        await asyncio.sleep(random.uniform(0, self.args.think_time))
+        while loop.time() < deadline:
+            scenario = admin_scenario if is_admin else random.choice(USER_SCENARIOS)
+            for kind, value in scenario(self.catalog):
+                if loop.time() >= deadline:
+                    return
+                await self._send(user_id, kind, value)
+                if self.args.think_time:
+                    await asyncio.sleep(random.uniform(0, 2 * self.args.think_time))
+
+    async def run(self, users: List[tuple[int, bool]]) -> Results:
+        loop = asyncio.get_running_loop()
+        self.results.started = loop.time()
+        deadline = self.results.started + self.args.duration
+        await asyncio.gather(*(self._virtual_user(user_id, is_admin, deadline) for user_id, is_admin in users))
+        self.results.finished = loop.time()
+        return self.results
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(share * len(values))) - 1))
+    return values[rank]
+
+
+def summarize(results: Results, api_calls: Counter, args: argparse.Namespace) -> Dict[str, Any]:
+    elapsed = results.finished - results.started
+    handlers: Dict[str, Dict[str, Any]] = {}
+    total = 0
+    for name, values in sorted(results.latencies.items()):
+        values.sort()
+        total += len(values)
+        handlers[name] = {
+            "count": len(values),
+            "errors": results.errors[name],
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "users": args.users,
+            "duration": args.duration,
+            "think_time": args.think_time,
+            "api_latency": args.api_latency,
+            "admin_share": args.admin_share,
+            "storage": args.storage,
+        },
+        "elapsed_s": elapsed,
+        "updates": total,
+        "errors": sum(results.errors.values()),
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "handlers": handlers,
+        "api_calls": dict(api_calls.most_common()),
+    }
+
+
+def log_report(report: Dict[str, Any], logger: logging.Logger) -> None:
+    logger.info(
+        "%d updates in %.1f s: %.1f updates/s, %d errors",
+        report["updates"],
+        report["elapsed_s"],
+        report["throughput_rps"],
+        report["errors"],
+    )
+    logger.info(f"{'handler':<32}{'count':>8}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, row in sorted(report["handlers"].items(), key=lambda item: -item[1]["count"]):
+        logger.info(
+            f"{name:<32}{row['count']:>8}{row['errors']:>8}"
+            f"{row['mean_ms']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}",
+        )
+    logger.info("Bot API calls: " + ", ".join(f"{method} {count}" for method, count in report["api_calls"].items()))
+
+
+async def prepare_users(user_service: UserService, count: int, admin_share: float) -> List[tuple[int, bool]]:
+    admins = int(count * admin_share)
+    users = []
+    for n in range(count):
+        user_id = USER_ID_BASE + n
+        is_admin = n < admins
+        if is_admin:
+            await user_service.get_or_create(id=str(user_id), username=f"load_{user_id}")
+            await user_service.update_role(str(user_id), is_staff=True)
+        users.append((user_id, is_admin))
+    return users
+
+
+async def load_catalog(song_service: SongService, genre_service: GenreService) -> Catalog:
+    genres = await genre_service.get_all()
+    songs = await song_service.get_all()
+    return Catalog(genres=[g.title for g in genres], titles=[s.title for s in songs])
+
+
+def create_storage(config: Config, kind: str) -> BaseStorage:
+    if kind == "memory":
+        return MemoryStorage()
+    return PipelinedRedisStorage(
+        redis=create_redis(config.redis),
+        key_builder=HashTagKeyBuilder(),
+        state_ttl=config.redis.state_ttl,
+        data_ttl=config.redis.data_ttl,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    config = load_config()
+    logger = get_logger("loadtest", config.logger)
+    logger.setLevel(args.log_level)
+    # The bot logger is kept quiet during the test, the progress and the report go to their own one
+    reporter = get_logger("loadtest-report", config.logger)
+
+    db = PostgresDatabase(config=config.postgres, logger=logger)
+    await db.init_db()
+    storage = create_storage(config, args.storage)
+
+    session = FakeSession(latency=args.api_latency)
+    bot = Bot(token=f"{BOT_ID}:LOADTEST", session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    dp = create_dispatcher(config, storage, db, logger, getattr(storage, "redis", None))
+
+    try:
+        catalog = await load_catalog(dp.workflow_data["song_service"], dp.workflow_data["genre_service"])
+        users = await prepare_users(dp.workflow_data["user_service"], args.users, args.admin_share)
+        reporter.info(
+            "Running %d virtual users for %s s (%d songs, %d genres)...",
+            len(users),
+            args.duration,
+            len(catalog.titles),
+            len(catalog.genres),
+        )
+
+        results = await LoadTest(bot, dp, catalog, args).run(users)
+        report = summarize(results, session.calls, args)
+        log_report(report, reporter)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+    finally:
+        await storage.close()
+        await db.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="number of concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="test duration in seconds")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between user actions, s")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="simulated Bot API latency, s")
+    parser.add_argument("--admin-share", type=float, default=0.02, help="share of users running the admin scenario")
+    parser.add_argument("--storage", choices=["redis", "memory"], default="redis", help="FSM storage")
+    parser.add_argument("--log-level", default="WARNING", help="level of the bot logger during the test")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
+
+
+__all__ = ["FakeSession", "HandlerRecorder", "LoadTest"]
@@ -0,0 +1,233 @@
+"""Micro-benchmarks of the repository layer.
+
+Every scale gets a fresh synthetic dataset in a disposable database ("<POSTGRES_DB>_bench",
+created and dropped by the benchmark), then each repository call is timed in isolation.
+Results are written as JSON; with --baseline the run is compared to an earlier one and
+exits with status 1 if a median got slower than the threshold allows.
+
+Usage (from the bot directory):
+    python -m benchmarks.repository --scales 10000 100000 1000000 --output bench.json
+    python -m benchmarks.repository --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.dataset import DatasetSize, generate
+from benchmarks.loadtest import percentile
+from config import load_config
+from database import Base, PostgresConfig, PostgresDatabase
+from logger import get_logger
+from models import SongTempo, SongType
+from repository import GenreRepository, SongHistoryRepository, SongRepository, UserRepository, WishlistRepository
+
+
+@dataclass
+class Case:
+    name: str
+    # Called once per iteration, gets the iteration number
+    run: Callable[[int], Awaitable[Any]]
+
+
+def build_cases(db: PostgresDatabase, size: DatasetSize, rng: random.Random) -> List[Case]:
+    songs = SongRepository(db)
+    genres = GenreRepository(db)
+    users = UserRepository(db)
+    history = SongHistoryRepository(db)
+    wishlist = WishlistRepository(db)
+
+    song_ids = [rng.randint(1, size.songs) for _ in range(1000)]
+    user_ids = [size.user_id(rng.randint(1, size.users)) for _ in range(1000)]
+    filters = [
+        (rng.choice(list(SongType)), rng.choice(list(SongTempo)), rng.sample(range(1, size.genres + 1), 2))
+        for _ in range(1000)
+    ]
+
+    since = datetime.now() - timedelta(days=30)
+
+    def pick(values: List[Any], n: int) -> Any:
+        return values[n % len(values)]
+
+    return [
+        Case("SongRepository.get_one", lambda n: songs.get_one(pick(song_ids, n))),
+        Case("SongRepository.get_by_filter[type]", lambda n: songs.get_by_filter(pick(filters, n)[0], None, [])),
+        Case("SongRepository.get_by_filter[type,tempo,genres]", lambda n: songs.get_by_filter(*pick(filters, n))),
+        Case(
+            "SongRepository.get_by_filter[type,popular]",
+            lambda n: songs.get_by_filter(pick(filters, n)[0], None, [], popular_first=True),
+        ),
+        Case("GenreRepository.get_by_type_and_tempo", lambda n: genres.get_by_type_and_tempo(*pick(filters, n)[:2])),
+        Case("WishlistRepository.get_song_ids", lambda n: wishlist.get_song_ids(pick(user_ids, n))),
+        Case("UserRepository.search[prefix]", lambda n: users.search(f"user_{n % 100}")),
+        Case(
+            "SongHistoryRepository.get_by_user[30d]",
+            lambda n: history.get_by_user(pick(user_ids, n), since=since),
+        ),
+        Case(
+            "SongHistoryRepository.get_page[30d]",
+            lambda n: history.get_page(pick(user_ids, n), since=since),
+        ),
+        Case(
+            "SongHistoryRepository.log",
+            lambda n: history.log(pick(user_ids, n), pick(song_ids, n)),
+        ),
+    ]
+
+
+async def time_case(case: Case, iterations: int, warmup: int) -> Dict[str, float]:
+    for n in range(warmup):
+        await case.run(n)
+
+    timings = []
+    for n in range(iterations):
+        start = time.perf_counter()
+        await case.run(warmup + n)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "min_ms": timings[0] * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+    }
+
+
+async def create_database(config: PostgresConfig, name: str) -> None:
+    engine = create_async_engine(config.get_database_url(), isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+            await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    finally:
+        await engine.dispose()
+
+
+async def drop_database(config: PostgresConfig, name: str) -> None:
+    engine = create_async_engine(config.get_database_url(), isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+    finally:
+        await engine.dispose()
+
+
+async def run_scale(
+    config: PostgresConfig,
+    rows: int,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+) -> Dict[str, Any]:
+    size = DatasetSize.for_rows(rows)
+    db = PostgresDatabase(config=config, logger=logger)
+    try:
+        async with db.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        logger.info("[%d] seeding %d users, %d songs, %d history rows...", rows, size.users, size.songs, size.history)
+        start = time.perf_counter()
+        await generate(db.engine, size, seed=args.seed)
+        logger.info("[%d] seeded in %.1f s", rows, time.perf_counter() - start)
+
+        results = {}
+        for case in build_cases(db, size, random.Random(args.seed)):
+            results[case.name] = await time_case(case, args.iterations, args.warmup)
+            logger.info("[%d] %-50s p50 %8.2f ms", rows, case.name, results[case.name]["p50_ms"])
+        return {"size": asdict(size), "cases": results}
+    finally:
+        await db.close()
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every case whose median got slower than the threshold allows."""
+    regressions = []
+    for scale, current in report["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if not previous:
+            continue
+        for name, result in current["cases"].items():
+            before = previous["cases"].get(name)
+            if not before or not before["p50_ms"]:
+                continue
+            ratio = result["p50_ms"] / before["p50_ms"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"[{scale}] {name}: p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms (x{ratio:.2f})",
+                )
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> int:
+    config = load_config()
+    logger = get_logger("benchmarks", config.logger)
+    postgres = replace(config.postgres, debug=False, slow_query_ms=0)
+    bench = replace(postgres, db_name=f"{postgres.db_name}_bench")
+
+    await create_database(postgres, bench.db_name)
+    report: Dict[str, Any] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "params": {"iterations": args.iterations, "warmup": args.warmup, "seed": args.seed},
+        "scales": {},
+    }
+    try:
+        for rows in args.scales:
+            report["scales"][str(rows)] = await run_scale(bench, rows, args, logger)
+    finally:
+        if not args.keep:
+            await drop_database(postgres, bench.db_name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        if regressions:
+            logger.error("Regressions above %.0f%%:\n%s", args.threshold * 100, "\n".join(regressions))
+            return 1
+        logger.info("No regressions above %.0f%%", args.threshold * 100)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="history rows")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed calls per case")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the dataset and the call arguments")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown of the median, 0.2 = 20%%")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
+
+
+__all__ = ["compare"]
@@ -3,20 +3,27 @@ from dataclasses import dataclass
 from environs import Env
 
 from database import PostgresConfig
-from logger import LoggerConfig
-
-
-@dataclass
-class RedisConfig:
-    host: str
-    port: int
-    db: int
+from logger import LoggerConfig, LogRotation
+from metrics import MetricsConfig
+from scheduler import SchedulerConfig
+from service import (
+    BroadcastConfig,
+    HistoryConfig,
+    RecommendationConfig,
+    RetentionConfig,
+    StatsConfig,
+    TrendingConfig,
+    WishlistCacheConfig,
+)
+from storage import IsolationConfig, RedisConfig, RedisMode
 
 
 @dataclass
 class BotConfig:
     bot_token: str
     debug: bool
+    # Seconds without ⬅️/➡️ clicks after which a burst of them is rendered once; 0 disables it
+    nav_debounce: float = 0.3
 
 
 @dataclass
@@ -25,6 +32,16 @@ class Config:
     logger: LoggerConfig
     redis: RedisConfig
     postgres: PostgresConfig
+    metrics: MetricsConfig
+    recommendations: RecommendationConfig
+    trending: TrendingConfig
+    stats: StatsConfig
+    retention: RetentionConfig
+    history: HistoryConfig
+    wishlist: WishlistCacheConfig
+    broadcast: BroadcastConfig
+    scheduler: SchedulerConfig
+    isolation: IsolationConfig
 
 
 def load_config(path: str | None = None) -> Config:
@@ -43,15 +60,35 @@ def load_config(path: str | None = None) -> Config:
         bot=BotConfig(
             bot_token=env("BOT_TOKEN", default="").replace("\\x3a", ":"),
             debug=env.bool("DEBUG", default=True),
+            nav_debounce=env.float("NAV_DEBOUNCE_WINDOW", default=0.3),
         ),
         logger=LoggerConfig(
             debug=env.bool("DEBUG", default=True),
             file_path=env("LOGGER_FILE_PATH", default="app.log"),
+            json=env.bool("LOGGER_JSON", default=False),
+            rotation=LogRotation(env("LOGGER_ROTATION", default=LogRotation.size.value)),
+            max_bytes=env.int("LOGGER_MAX_BYTES", default=10 * 1024 * 1024),
+            backup_count=env.int("LOGGER_BACKUP_COUNT", default=5),
+            rotate_when=env("LOGGER_ROTATE_WHEN", default="midnight"),
+            request_sample_rate=env.float("LOGGER_REQUEST_SAMPLE_RATE", default=1.0),
         ),
         redis=RedisConfig(
             host=env("REDIS_HOST", default="localhost"),
             port=env.int("REDIS_PORT", default=6379),
             db=env.int("REDIS_DB", default=0),
+            password=env("REDIS_PASSWORD", default=None),
+            mode=RedisMode(env("REDIS_MODE", default=RedisMode.standalone.value)),
+            sentinels=env.list("REDIS_SENTINELS", default=[]),
+            sentinel_master=env("REDIS_SENTINEL_MASTER", default="mymaster"),
+            cluster_nodes=env.list("REDIS_CLUSTER_NODES", default=[]),
+            max_connections=env.int("REDIS_MAX_CONNECTIONS", default=50),
+            socket_keepalive=env.bool("REDIS_SOCKET_KEEPALIVE", default=True),
+            socket_timeout=env.float("REDIS_SOCKET_TIMEOUT", default=5.0),
+            socket_connect_timeout=env.float("REDIS_SOCKET_CONNECT_TIMEOUT", default=5.0),
+            health_check_interval=env.int("REDIS_HEALTH_CHECK_INTERVAL", default=30),
+            retry_attempts=env.int("REDIS_RETRY_ATTEMPTS", default=3),
+            state_ttl=env.int("REDIS_FSM_STATE_TTL", default=None),
+            data_ttl=env.int("REDIS_FSM_DATA_TTL", default=None),
         ),
         postgres=PostgresConfig(
             user=env("POSTGRES_USER", default=""),
@@ -59,6 +96,71 @@ def load_config(path: str | None = None) -> Config:
             db_name=env("POSTGRES_DB", default=""),
             host=env("POSTGRES_HOST", default="localhost"),
             port=env.int("POSTGRES_PORT", default=5432),
+            debug=env.bool("DEBUG", default=True),
+            slow_query_ms=env.int("SLOW_QUERY_MS", default=200),
+            query_budget=env.int("QUERY_BUDGET", default=10),
+            replicas=env.list("POSTGRES_REPLICAS", default=[]),
+            replica_max_lag=env.float("POSTGRES_REPLICA_MAX_LAG", default=5.0),
+            replica_retry=env.int("POSTGRES_REPLICA_RETRY", default=30),
+            replica_check_interval=env.int("POSTGRES_REPLICA_CHECK_INTERVAL", default=10),
+            read_your_writes=env.float("POSTGRES_READ_YOUR_WRITES", default=10.0),
+        ),
+        metrics=MetricsConfig(
+            enabled=env.bool("METRICS_ENABLED", default=True),
+            host=env("METRICS_HOST", default="127.0.0.1"),
+            port=env.int("METRICS_PORT", default=9101),
+        ),
+        recommendations=RecommendationConfig(
+            top_k=env.int("RECOMMENDATIONS_TOP_K", default=10),
+            refresh_interval=env.int("RECOMMENDATIONS_REFRESH_INTERVAL", default=3600),
+            history_days=env.int("RECOMMENDATIONS_HISTORY_DAYS", default=180),
+            min_support=env.int("RECOMMENDATIONS_MIN_SUPPORT", default=2),
+        ),
+        trending=TrendingConfig(
+            bucket_seconds=env.int("TRENDING_BUCKET_SECONDS", default=3600),
+            window=env.int("TRENDING_WINDOW", default=168),
+            half_life=env.int("TRENDING_HALF_LIFE", default=86400),
+            refresh_interval=env.int("TRENDING_REFRESH_INTERVAL", default=60),
+            capacity=env.int("TRENDING_CAPACITY", default=1000),
+            top_n=env.int("TRENDING_TOP_N", default=50),
+        ),
+        stats=StatsConfig(
+            cache_ttl=env.int("STATS_CACHE_TTL", default=60),
+            days=env.int("STATS_DAYS", default=14),
+            top=env.int("STATS_TOP", default=5),
+            min_views=env.int("STATS_MIN_VIEWS", default=10),
+        ),
+        retention=RetentionConfig(
+            keep_months=env.int("HISTORY_KEEP_MONTHS", default=12),
+            months_ahead=env.int("HISTORY_MONTHS_AHEAD", default=3),
+            archive_dir=env("HISTORY_ARCHIVE_DIR", default="archive"),
+            interval=env.int("HISTORY_RETENTION_INTERVAL", default=86400),
+            batch_size=env.int("HISTORY_ARCHIVE_BATCH_SIZE", default=5000),
+        ),
+        history=HistoryConfig(
+            compaction_window=env.int("HISTORY_COMPACTION_WINDOW", default=1800),
+            view_days=env.int("HISTORY_VIEW_DAYS", default=90),
+        ),
+        wishlist=WishlistCacheConfig(
+            ttl=env.int("WISHLIST_CACHE_TTL", default=86400),
+        ),
+        broadcast=BroadcastConfig(
+            rate=env.int("BROADCAST_RATE", default=25),
+            batch_size=env.int("BROADCAST_BATCH_SIZE", default=500),
+            progress_interval=env.int("BROADCAST_PROGRESS_INTERVAL", default=5),
+            attempts=env.int("BROADCAST_ATTEMPTS", default=3),
+            lock_ttl=env.int("BROADCAST_LOCK_TTL", default=60),
+            poll_interval=env.int("BROADCAST_POLL_INTERVAL", default=10),
+            retry_delay=env.int("BROADCAST_RETRY_DELAY", default=30),
+        ),
+        scheduler=SchedulerConfig(
+            claim_ttl=env.int("SCHEDULER_CLAIM_TTL", default=3600),
+            timeout=env.float("SCHEDULER_JOB_TIMEOUT", default=1800),
+            fsm_sweep=env("FSM_SWEEP_CRON", default="15 4 * * *"),
+            fsm_max_idle=env.int("FSM_MAX_IDLE", default=2592000),
+        ),
+        isolation=IsolationConfig(
+            max_concurrent_updates=env.int("UPDATES_CONCURRENCY", default=15),
         ),
     )
 
@@ -1,5 +1,18 @@
 from database.db import Base, DefaultDatabase
+from database.instrumentation import current_query_stats, QueryStats, track_queries
+from database.migrations import head_revision
 from database.postgres import Database as PostgresDatabase, PostgresConfig
+from database.routing import read_from_primary
 
 
-__all__ = ["Base", "DefaultDatabase", "PostgresDatabase", "PostgresConfig"]
+__all__ = [
+    "Base",
+    "DefaultDatabase",
+    "PostgresDatabase",
+    "PostgresConfig",
+    "QueryStats",
+    "current_query_stats",
+    "track_queries",
+    "head_revision",
+    "read_from_primary",
+]
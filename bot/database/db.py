@@ -20,8 +20,12 @@ class DefaultDatabase(ABC):
         """Deleting all tables from the database."""
 
     @abstractmethod
-    def get_session(self) -> _AsyncGeneratorContextManager[Any, None]:
-        """Context manager for sessions."""
+    def get_session(self, readonly: bool = False) -> _AsyncGeneratorContextManager[Any, None]:
+        """Context manager for sessions.
+
+        Read-only sessions may be served by a replica, so they can miss the latest writes of other
+        updates; use them for reads that tolerate that, e.g. the catalog.
+        """
 
     @abstractmethod
     async def close(self):
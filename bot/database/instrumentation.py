@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from logging import Logger
+import time
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import ORMExecuteState, raiseload, Session
+
+
+@dataclass
+class QueryStats:
+    """Statements executed on behalf of one update"""
+
+    update_id: int
+    handler: str = "-"
+    count: int = 0
+    duration: float = 0.0
+    # Whether the update committed a transaction
+    wrote: bool = False
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(update_id: int) -> Iterator[QueryStats]:
+    """Attribute every statement executed inside the block to the update."""
+    stats = QueryStats(update_id=update_id)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryInstrumentation:
+    """Engine event hooks that count and time every statement"""
+
+    def __init__(self, logger: Logger, slow_query_ms: int):
+        self.logger = logger
+        self.slow_query_ms = slow_query_ms
+
+    def attach(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn: Connection, cursor: Any, statement: str, *args: Any) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn: Connection, cursor: Any, statement: str, *args: Any) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+        stats = _current_stats.get()
+        if stats:
+            stats.count += 1
+            stats.duration += elapsed
+
+        if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+            self.logger.warning(
+                "<%s> %-7s: %d ms in %s: %s",
+                stats.update_id if stats else "-",
+                "slow",
+                elapsed * 1000,
+                stats.handler if stats else "-",
+                " ".join(statement.split())[:500],
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _track_commit(session: Session) -> None:
+    stats = _current_stats.get()
+    if stats:
+        stats.wrote = True
+
+
+class RaiseloadSession(Session):
+    """Session that forbids implicit lazy loads, used in debug mode"""
+
+
+@event.listens_for(RaiseloadSession, "do_orm_execute")
+def _raise_on_lazy_load(execute_state: ORMExecuteState) -> None:
+    if execute_state.is_select and not execute_state.is_column_load and not execute_state.is_relationship_load:
+        # Explicit joinedload/selectinload options still take precedence over the wildcard
+        execute_state.statement = execute_state.statement.options(raiseload("*"))
+
+
+__all__ = ["QueryStats", "QueryInstrumentation", "RaiseloadSession", "current_query_stats", "track_queries"]
@@ -0,0 +1,15 @@
+from pathlib import Path
+from typing import Optional
+
+from alembic.script import ScriptDirectory
+
+
+SCRIPT_LOCATION = Path(__file__).resolve().parent.parent / "alembic"
+
+
+def head_revision(script_location: Path = SCRIPT_LOCATION) -> Optional[str]:
+    """Latest revision of the migration scripts shipped with the bot"""
+    return ScriptDirectory(str(script_location)).get_current_head()
+
+
+__all__ = ["SCRIPT_LOCATION", "head_revision"]
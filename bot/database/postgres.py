@@ -1,10 +1,26 @@
+import asyncio
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import List, Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from database import Base, DefaultDatabase
+from database.instrumentation import QueryInstrumentation, RaiseloadSession
+from database.routing import reads_from_primary
+
+
+# Seconds the replica is behind the primary; zero when it has replayed everything it received,
+# otherwise an idle primary would look like a growing lag. NULL on the primary itself
+REPLICATION_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END",
+)
 
 
 @dataclass
@@ -14,41 +30,158 @@ class PostgresConfig:
     db_name: str
     host: str
     port: int
+    debug: bool = False
+    slow_query_ms: int = 200
+    query_budget: int = 10
+    # Read replicas as host[:port], with the credentials and database name of the primary
+    replicas: List[str] = field(default_factory=list)
+    # A replica further behind the primary than this many seconds gets no reads
+    replica_max_lag: float = 5.0
+    # Seconds a replica gets no reads after it failed
+    replica_retry: int = 30
+    # Seconds between the health checks of the replicas
+    replica_check_interval: int = 10
+    # Seconds an admin keeps reading from the primary after a change
+    read_your_writes: float = 10.0
+
+    def get_database_url(self, host: Optional[str] = None, port: Optional[int] = None) -> str:
+        host, port = host or self.host, port or self.port
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{host}:{port}/{self.db_name}"
+
+
+class Replica:
+    """Read replica engine and its health"""
 
-    def get_database_url(self) -> str:
-        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.db_name}"
+    def __init__(self, address: str, engine: AsyncEngine):
+        self.address = address
+        self.engine = engine
+        # time.monotonic() until which the replica gets no reads
+        self.down_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.down_until
 
 
 class Database(DefaultDatabase):
-    """Postgres Database class"""
+    """Postgres Database class
+
+    Writes and ordinary reads go to the primary. Read-only sessions (``get_session(readonly=True)``)
+    are spread over the replicas round-robin, skipping the ones that failed a query or the health
+    check, and fall back to the primary when none is left. The reads of an update that committed
+    something, or of a ``read_from_primary`` block, stay on the primary to see its own writes.
+    """
 
-    def __init__(self, config: PostgresConfig):
+    def __init__(self, config: PostgresConfig, logger: Optional[logging.Logger] = None):
         self.config = config
-        self.engine = create_async_engine(
-            config.get_database_url(),
-            echo=False,
-        )
-        self.async_session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)  # type: ignore
+        self.log = logger or logging.getLogger(__name__)
+        self.engine = self._create_engine(config.get_database_url())
+        self.replicas = [
+            Replica(address, self._create_engine(config.get_database_url(*_parse_address(address))))
+            for address in config.replicas
+        ]
+        self._next_replica = 0
+        self.async_session = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            # Surface accidental lazy loads while developing
+            sync_session_class=RaiseloadSession if config.debug else Session,
+        )  # type: ignore
+
+    def _create_engine(self, url: str) -> AsyncEngine:
+        engine = create_async_engine(url, echo=False)
+        QueryInstrumentation(self.log, self.config.slow_query_ms).attach(engine)
+        return engine
 
     async def init_db(self):
         """Creating all tables in the database."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
+    async def get_revision(self) -> Optional[str]:
+        """Alembic revision the database is migrated to, None if it was never migrated."""
+        async with self.engine.connect() as conn:
+            try:
+                result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            except ProgrammingError:
+                return None
+            return result.scalar_one_or_none()
+
+    async def warm_up(self, connections: Optional[int] = None):
+        """Open the pool connections up front, so the first updates do not wait for them."""
+        connections = connections or self.engine.pool.size()
+
+        async def ping():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(self.check_replicas(), *(ping() for _ in range(connections)))
+
+    async def check_replicas(self):
+        """Take the replicas that are unreachable or lag behind out of the rotation and put the recovered ones back."""
+        await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+
+    async def _check_replica(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                lag = (await conn.execute(REPLICATION_LAG)).scalar_one()
+        except Exception as e:
+            self._mark_down(replica, str(e))
+            return
+
+        if lag is not None and lag > self.config.replica_max_lag:
+            self._mark_down(replica, "%.1f s behind the primary" % lag)
+        elif replica.down_until:
+            self.log.info("Replica %s is back in rotation", replica.address)
+            replica.down_until = 0.0
+
+    def _mark_down(self, replica: Replica, reason: str):
+        if replica.available(time.monotonic()):
+            self.log.warning("Replica %s is out of rotation: %s", replica.address, reason)
+        replica.down_until = time.monotonic() + self.config.replica_retry
+
+    def _pick_replica(self) -> Optional[Replica]:
+        if not self.replicas or reads_from_primary():
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next_replica]
+            self._next_replica = (self._next_replica + 1) % len(self.replicas)
+            if replica.available(now):
+                return replica
+        return None
+
     async def drop_db(self):
         """Deleting all tables from the database."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
 
     @asynccontextmanager
-    async def get_session(self):
+    async def get_session(self, readonly: bool = False):
         """Context manager for sessions."""
-        async with self.async_session() as session:  # type: ignore
-            yield session
+        replica = self._pick_replica() if readonly else None
+        if replica is None:
+            async with self.async_session() as session:  # type: ignore
+                yield session
+            return
+
+        async with self.async_session(bind=replica.engine) as session:  # type: ignore
+            try:
+                yield session
+            except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+                # Only a lost connection says something about the replica, not a failed statement
+                if not isinstance(e, DBAPIError) or isinstance(e, InterfaceError) or e.connection_invalidated:
+                    self._mark_down(replica, str(e))
+                raise
 
     async def close(self):
         """Close all database connections and cleanup."""
-        await self.engine.dispose()
+        await asyncio.gather(self.engine.dispose(), *(replica.engine.dispose() for replica in self.replicas))
+
+
+def _parse_address(address: str) -> Tuple[str, Optional[int]]:
+    host, _, port = address.partition(":")
+    return host, int(port) if port else None
 
 
-__all__ = ["Database", "PostgresConfig"]
+__all__ = ["Database", "PostgresConfig", "Replica"]
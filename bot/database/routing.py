@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from database.instrumentation import current_query_stats
+
+
+_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+@contextmanager
+def read_from_primary() -> Iterator[None]:
+    """Send the read-only sessions opened inside the block to the primary."""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def reads_from_primary() -> bool:
+    """Whether the reads of the current context have to see its writes"""
+    if _primary.get():
+        return True
+    # A replica may not have the changes the update committed yet
+    stats = current_query_stats()
+    return bool(stats and stats.wrote)
+
+
+__all__ = ["read_from_primary", "reads_from_primary"]
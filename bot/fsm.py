@@ -27,6 +27,8 @@ class FSMAdmin(StatesGroup):
     edit_song_media = State()
     # User history
     enter_username = State()
+    # Broadcast
+    broadcast_message = State()
 
 
 __all__ = ["FSMUser"]
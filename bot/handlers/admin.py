@@ -1,9 +1,12 @@
+from contextlib import suppress
 import csv
+from datetime import datetime
+import html
 import io
-import math
 from typing import cast, List
 
 from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
@@ -19,8 +22,18 @@ from aiogram.types import (
 from filters import IsAdminFilter
 from fsm import FSMAdmin
 from keyboards import AcceptCancelKeyboard, AdminPanelKeyboard, CancelKeyboard, EditionCancelKeyboart
-from models import Genre, SongTempo, SongType, User
-from service import GenreService, SongService, UserService
+from models import Genre, HistoryAction, SongTempo, SongType, User
+from service import (
+    BroadcastService,
+    Dashboard,
+    GenreService,
+    RecommendationService,
+    SongService,
+    StatsService,
+    TrendingService,
+    UserService,
+)
+from service.broadcast import BroadcastStatus, format_progress
 
 router = Router()
 router.message.filter(IsAdminFilter())
@@ -230,7 +243,13 @@ async def handle_confirmation(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "✅ Подтвердить", FSMAdmin.confirm_data)
-async def process_confirm(message: Message, state: FSMContext, song_service: SongService, current_user: User):
+async def process_confirm(
+    message: Message,
+    state: FSMContext,
+    song_service: SongService,
+    recommendation_service: RecommendationService,
+    current_user: User,
+):
     data = await state.get_data()
 
     song = await song_service.create_with_genres(
@@ -246,6 +265,7 @@ async def process_confirm(message: Message, state: FSMContext, song_service: Son
     if not song:
         await message.answer("❌ Ошибка создания песни")
         return
+    await recommendation_service.refresh_song(song.id)
 
     await state.clear()
     await message.answer(
@@ -273,7 +293,8 @@ async def admin_process_delete(
     message: Message,
     state: FSMContext,
     song_service: SongService,
-    user_service: UserService,
+    recommendation_service: RecommendationService,
+    trending_service: TrendingService,
 ):
     title = str(message.text).strip()
     song = await song_service.get_by_title(title)
@@ -284,9 +305,10 @@ async def admin_process_delete(
         await handle_admin_panel(message, state)
         return
 
-    for customer in await song_service.get_customers(song.id):
-        await user_service.log_view(customer.id, song.title, "delete")
+    # Customers get their "delete" history rows in the same transaction
     await song_service.delete(song.id)
+    recommendation_service.forget(song.id)
+    await trending_service.forget(song.id)
     await state.clear()
     await message.answer(
         f"✅ Песня с названием «{title}» удалена",
@@ -413,7 +435,12 @@ async def edit_song_type(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(FSMAdmin.edit_song_type)
-async def process_edit_type(callback: CallbackQuery, state: FSMContext, song_service: SongService):
+async def process_edit_type(
+    callback: CallbackQuery,
+    state: FSMContext,
+    song_service: SongService,
+    recommendation_service: RecommendationService,
+):
     new_type = callback.data
     data = await state.get_data()
     song_id = int(data["song_id"])
@@ -423,6 +450,7 @@ async def process_edit_type(callback: CallbackQuery, state: FSMContext, song_ser
     if not updated:
         await callback.message.answer("❌ Ошибка при обновлении типа песни")  # type: ignore
     else:
+        await recommendation_service.refresh_song(song_id)
         await callback.answer("✅ Тип песни обновлен")
 
     await state.set_state(FSMAdmin.edit_song_select_field)
@@ -446,7 +474,12 @@ async def edit_song_tempo(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(FSMAdmin.edit_song_tempo)
-async def process_edit_tempo(callback: CallbackQuery, state: FSMContext, song_service: SongService):
+async def process_edit_tempo(
+    callback: CallbackQuery,
+    state: FSMContext,
+    song_service: SongService,
+    recommendation_service: RecommendationService,
+):
     new_tempo = callback.data
     data = await state.get_data()
     song_id = int(data["song_id"])
@@ -456,6 +489,7 @@ async def process_edit_tempo(callback: CallbackQuery, state: FSMContext, song_se
     if not updated:
         await callback.message.answer("❌ Ошибка при обновлении темпа песни")  # type: ignore
     else:
+        await recommendation_service.refresh_song(song_id)
         await callback.answer("✅ Темп песни обновлен")
 
     await state.set_state(FSMAdmin.edit_song_select_field)
@@ -488,6 +522,7 @@ async def process_edit_genres(
     state: FSMContext,
     song_service: SongService,
     genre_service: GenreService,
+    recommendation_service: RecommendationService,
 ):
     input_text = str(message.text).strip().lower()
     data = await state.get_data()
@@ -521,6 +556,8 @@ async def process_edit_genres(
         if not updated:
             await message.answer("❌ Ошибка при обновлении жанров")
 
+    if updated:
+        await recommendation_service.refresh_song(song_id)
     await state.set_state(FSMAdmin.edit_song_select_field)
     await show_edit_menu(message, state, song_service)
 
@@ -550,7 +587,12 @@ async def edit_song_lyrics(callback: CallbackQuery, state: FSMContext, song_serv
 
 
 @router.message(FSMAdmin.edit_song_lyrics)
-async def process_edit_lyrics(message: Message, state: FSMContext, song_service: SongService):
+async def process_edit_lyrics(
+    message: Message,
+    state: FSMContext,
+    song_service: SongService,
+    recommendation_service: RecommendationService,
+):
     input_text = str(message.text).strip()
     data = await state.get_data()
     song_id = int(data["song_id"])
@@ -564,6 +606,8 @@ async def process_edit_lyrics(message: Message, state: FSMContext, song_service:
 
     if not updated:
         await message.answer("❌ Ошибка при обновлении текста")
+    else:
+        await recommendation_service.refresh_song(song_id)
 
     await state.set_state(FSMAdmin.edit_song_select_field)
     await show_edit_menu(message, state, song_service)
@@ -652,22 +696,19 @@ async def cancel_editing(callback: CallbackQuery, state: FSMContext, song_servic
 """User history handlers"""
 
 PAGE_SIZE = 20
+USERS_PAGE_SIZE = 10
 
 
 @router.message(F.text == "📜 История пользователя")
 async def admin_request_history(message: Message, state: FSMContext, user_service: UserService):
     await state.clear()
     await state.set_state(FSMAdmin.enter_username)
-
-    users = await user_service.get()
-    users_text = "\n".join([f"👤 @{u.username} (ID: {u.id})" for u in users if u.is_staff is False])
-
     await message.answer(
-        f"📜 Введите ID пользователя или его username, чтобы получить историю просмотров:\n\n"
-        f"<b>Список пользователей:</b>\n{users_text}",
+        "📜 Введите ID пользователя, его username или начало username для поиска.",
         reply_markup=CancelKeyboard()(),
-        parse_mode="HTML",
     )
+    await state.update_data(users_query="", users_cursors=[None])
+    await show_users_page(message, state, user_service)
 
 
 @router.message(FSMAdmin.enter_username)
@@ -681,53 +722,143 @@ async def admin_process_username(
     if not user:
         user = await user_service.get_one(identifier)
     if not user:
-        await message.answer("❌ Пользователь не найден. Попробуйте ещё раз или /cancel.")
+        # Not an exact match, show the users whose username starts with it
+        await state.update_data(users_query=identifier, users_cursors=[None])
+        await show_users_page(message, state, user_service)
+        return
+
+    await open_user_history(message, state, user_service, user)
+
+
+@router.callback_query(FSMAdmin.enter_username, F.data.startswith("users:pick:"), IsAdminFilter())
+async def admin_pick_user(callback: CallbackQuery, state: FSMContext, user_service: UserService):
+    user = await user_service.get_one(str(callback.data).removeprefix("users:pick:"))
+    if not user:
+        await callback.answer("❌ Пользователь не найден", show_alert=True)
+        return
+    await open_user_history(callback, state, user_service, user)
+
+
+@router.callback_query(FSMAdmin.enter_username, F.data.in_({"users:prev", "users:next"}), IsAdminFilter())
+async def admin_users_page(callback: CallbackQuery, state: FSMContext, user_service: UserService):
+    data = await state.get_data()
+    cursors = data["users_cursors"]
+    if callback.data == "users:prev":
+        cursors = cursors[:-1] or [None]
+    else:
+        cursors = cursors + [data["users_next"]]
+    await state.update_data(users_cursors=cursors)
+    await show_users_page(callback, state, user_service)
+
+
+async def show_users_page(msg: Message | CallbackQuery, state: FSMContext, user_service: UserService):
+    """One page of the user picker. Pages are fetched by keyset: the FSM keeps the cursor of
+    every page opened so far, so "back" needs no offset either."""
+    data = await state.get_data()
+    query = data["users_query"]
+    cursors = data["users_cursors"]
+    after = cursors[-1]
+
+    # One extra row tells whether there is a next page
+    users = await user_service.search(query, after=tuple(after) if after else None, limit=USERS_PAGE_SIZE + 1)
+    has_next = len(users) > USERS_PAGE_SIZE
+    users = users[:USERS_PAGE_SIZE]
+    total = await user_service.count_search(query)
+
+    if not users:
+        text = f"❌ Пользователи на «{html.escape(query)}» не найдены." if query else "❌ Пользователей пока нет."
+        if isinstance(msg, CallbackQuery):
+            await msg.answer(text, show_alert=True)
+        else:
+            await msg.answer(text)
         return
 
+    start = (len(cursors) - 1) * USERS_PAGE_SIZE
+    title = f"по запросу «{html.escape(query)}»" if query else "все"
+    text = (
+        f"👥 <b>Пользователи</b> ({title}): {start + 1}–{start + len(users)} из {total}\n"
+        "Выберите пользователя или отправьте начало username для поиска."
+    )
+    await state.update_data(users_next=[users[-1].username, users[-1].id] if has_next else None)
+
+    buttons = [
+        [InlineKeyboardButton(text=f"👤 @{u.username} ({u.id})", callback_data=f"users:pick:{u.id}")] for u in users
+    ]
+    nav_row = []
+    if len(cursors) > 1:
+        nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data="users:prev"))
+    if has_next:
+        nav_row.append(InlineKeyboardButton(text="➡️ Далее", callback_data="users:next"))
+    if nav_row:
+        buttons.append(nav_row)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    if isinstance(msg, CallbackQuery):
+        await msg.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")  # type: ignore
+        await msg.answer()
+    else:
+        await msg.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+async def open_user_history(msg: Message | CallbackQuery, state: FSMContext, user_service: UserService, user: User):
     await state.update_data(
         target_user_id=str(user.id),
         target_username=user.username,
-        history_page=0,
+        target_wishlist=await user_service.get_wishlist_titles(str(user.id)),
+        history_cursors=[None],
     )
-    await show_history_page(message, state, user_service)
+    await show_history_page(msg, state, user_service)
 
 
 async def show_history_page(msg: Message | CallbackQuery, state: FSMContext, user_service: UserService):
+    """One page of the history of the picked user, fetched by keyset like the user picker"""
     data = await state.get_data()
     user_id = data["target_user_id"]
     username = data["target_username"]
-    page = data["history_page"]
-
-    history = await user_service.get_history(user_id)
-    total = len(history)
-    pages = math.ceil(total / PAGE_SIZE)
+    cursors = data["history_cursors"]
+    before = cursors[-1]
+    if before is not None:
+        viewed_at, last_seen_at, history_id = before
+        before = (datetime.fromisoformat(viewed_at), datetime.fromisoformat(last_seen_at), history_id)
+
+    # One extra row tells whether there is a next page
+    chunk = await user_service.get_history_page(user_id, before=before, limit=PAGE_SIZE + 1)
+    has_next = len(chunk) > PAGE_SIZE
+    chunk = chunk[:PAGE_SIZE]
+    total = await user_service.count_history(user_id)
+    last = chunk[-1] if chunk else None
+    await state.update_data(
+        history_next=[last.viewed_at.isoformat(), last.last_seen_at.isoformat(), last.id] if has_next else None,
+    )
 
-    start = page * PAGE_SIZE
-    end = start + PAGE_SIZE
-    chunk = history[::-1][start:end]
+    start = (len(cursors) - 1) * PAGE_SIZE
+    end = start + len(chunk)
 
     lines = []
     for rec in chunk:
-        action_fixed = f"{rec.action:<6}"
-        ts_str = rec.viewed_at.strftime("%d.%m.%Y %H:%M")
-        lines.append(f"{ts_str} — <i>{action_fixed}</i> — <b>{rec.song_title}</b>")
+        action_fixed = f"{HistoryAction(rec.action).name:<6}"
+        ts_str = rec.last_seen_at.strftime("%d.%m.%Y %H:%M")
+        repeats = f" ×{rec.count}" if rec.count > 1 else ""
+        lines.append(f"{ts_str} — <i>{action_fixed}</i> — <b>{rec.title}</b>{repeats}")
 
-    header = f"📜 <b>История @{username}</b> " f"({start+1}–{min(end, total)} из {total}):\n\n"
+    days = user_service.history_config.view_days
+    header = f"📜 <b>История @{username}</b> за {days} дн. " f"({start+1}–{end} из {total}):\n\n"
     text = header + "\n".join(lines)
 
-    cart_items = await user_service.get_wishlist(user_id)
+    # Loaded once when the user is picked, pages only re-render it
+    cart_items = data.get("target_wishlist", [])
 
     if cart_items:
-        cart_text = "\n".join([f"🛒 {item.title}" for item in cart_items])
+        cart_text = "\n".join([f"🛒 {title}" for title in cart_items])
         text += f"\n\n<b>Ваш список желаемого:</b>\n{cart_text}"
     else:
         text += "\n\n<b>Ваш список желаемого пуст.</b>"
 
     # Кнопки навигации
     nav_row = []
-    if page > 0:
+    if len(cursors) > 1:
         nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data="history:prev"))
-    if page < pages - 1:
+    if has_next:
         nav_row.append(InlineKeyboardButton(text="➡️ Далее", callback_data="history:next"))
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -750,15 +881,15 @@ async def history_export(callback: CallbackQuery, state: FSMContext, user_servic
     user_id = data["target_user_id"]
     username = data["target_username"]
 
-    history = (await user_service.get_history(user_id))[::-1]
+    history = await user_service.get_history(user_id)
 
     # Создаём CSV в памяти
     buffer = io.StringIO()
     writer = csv.writer(buffer)
-    writer.writerow(["Timestamp", "Action", "Song Title"])
+    writer.writerow(["Timestamp", "Action", "Song Title", "Count"])
     for rec in history:
-        ts = rec.viewed_at.strftime("%Y-%m-%d %H:%M:%S")
-        writer.writerow([ts, rec.action, rec.song_title])
+        ts = rec.last_seen_at.strftime("%Y-%m-%d %H:%M:%S")
+        writer.writerow([ts, HistoryAction(rec.action).name, rec.title, rec.count])
     csv_text = buffer.getvalue().encode("utf-8")  # bytes
 
     file = BufferedInputFile(csv_text, filename=f"history_{username}.csv")
@@ -773,17 +904,92 @@ async def history_export(callback: CallbackQuery, state: FSMContext, user_servic
 @router.callback_query(F.data == "history:prev")
 async def history_prev(callback: CallbackQuery, state: FSMContext, user_service: UserService):
     data = await state.get_data()
-    await state.update_data(history_page=data["history_page"] - 1)
+    await state.update_data(history_cursors=data["history_cursors"][:-1] or [None])
     await show_history_page(callback, state, user_service)
 
 
 @router.callback_query(F.data == "history:next")
 async def history_next(callback: CallbackQuery, state: FSMContext, user_service: UserService):
     data = await state.get_data()
-    await state.update_data(history_page=data["history_page"] + 1)
+    if data.get("history_next") is None:
+        await callback.answer()
+        return
+    await state.update_data(history_cursors=data["history_cursors"] + [data["history_next"]])
     await show_history_page(callback, state, user_service)
 
 
+"""Statistics handlers"""
+
+
+def format_dashboard(dashboard: Dashboard) -> str:
+    lines = [f"📊 <b>Статистика</b> <i>на {dashboard.generated_at.strftime('%d.%m.%Y %H:%M')}</i>\n"]
+
+    lines.append("<b>👥 Активные пользователи по дням:</b>")
+    lines += [f"{day.strftime('%d.%m')} — {count}" for day, count in dashboard.active_users] or ["нет данных"]
+
+    lines.append("\n<b>👁 Топ по просмотрам:</b>")
+    lines += [
+        f"{i}. {title} — {views} просм., {likes} ❤️" for i, (title, views, likes) in enumerate(dashboard.top_viewed, 1)
+    ] or ["нет данных"]
+
+    lines.append("\n<b>❤️ Топ по добавлениям в желаемое:</b>")
+    lines += [
+        f"{i}. {title} — {likes} ❤️, {views} просм." for i, (title, views, likes) in enumerate(dashboard.top_liked, 1)
+    ] or ["нет данных"]
+
+    lines.append(
+        f"\n<b>🛒 Желаемое / просмотры:</b> {dashboard.total_wishlisted} / {dashboard.total_views} "
+        f"({dashboard.wishlist_ratio:.1%})",
+    )
+    lines += [
+        f"{i}. {title} — {users} из {views} ({ratio:.1%})"
+        for i, (title, views, users, ratio) in enumerate(dashboard.conversion, 1)
+    ]
+
+    lines.append("\n<b>🎼 Спрос по жанрам:</b>")
+    lines += [f"#{title} — {views} просм., {likes} ❤️" for title, views, likes in dashboard.genres] or ["нет данных"]
+
+    lines.append("\n<b>🥁 Спрос по темпу:</b>")
+    lines += [f"{TempoRus[tempo.value]} — {views} просм., {likes} ❤️" for tempo, views, likes in dashboard.tempos] or [
+        "нет данных",
+    ]
+    return "\n".join(lines)
+
+
+@router.message(F.text == "📊 Статистика")
+async def admin_stats(message: Message, state: FSMContext, stats_service: StatsService):
+    await state.clear()
+    dashboard = await stats_service.get_dashboard()
+    if not dashboard:
+        await message.answer("❌ Не удалось собрать статистику. Попробуйте позже.")
+        return
+
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🔄 Обновить", callback_data="stats:refresh")]],
+    )
+    await message.answer(format_dashboard(dashboard), reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data == "stats:refresh", IsAdminFilter())
+async def admin_stats_refresh(callback: CallbackQuery, stats_service: StatsService):
+    dashboard = await stats_service.get_dashboard(refresh=True)
+    if not dashboard:
+        await callback.answer("❌ Не удалось собрать статистику", show_alert=True)
+        return
+
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🔄 Обновить", callback_data="stats:refresh")]],
+    )
+    with suppress(TelegramBadRequest):
+        # Telegram rejects an edit that does not change the message
+        await callback.message.edit_text(  # type: ignore
+            format_dashboard(dashboard),
+            reply_markup=keyboard,
+            parse_mode="HTML",
+        )
+    await callback.answer()
+
+
 @router.callback_query(F.data == "admin:panel")
 async def history_back(callback: CallbackQuery, state: FSMContext):
     await state.clear()
@@ -792,4 +998,74 @@ async def history_back(callback: CallbackQuery, state: FSMContext):
     await callback.message.delete()  # type: ignore
 
 
+"""Broadcast handlers"""
+
+
+@router.message(F.text == "📣 Рассылка")
+async def admin_broadcast(message: Message, state: FSMContext, broadcast_service: BroadcastService):
+    job = await broadcast_service.get_job()
+    if job is not None and job.status == BroadcastStatus.running:
+        await message.answer(
+            format_progress(job),
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[[InlineKeyboardButton(text="⏹ Остановить", callback_data="broadcast:stop")]],
+            ),
+            parse_mode="HTML",
+        )
+        return
+
+    await state.set_state(FSMAdmin.broadcast_message)
+    await message.answer(
+        "📣 Отправьте сообщение для рассылки: текст, фото, видео или аудио. Его получат все пользователи.",
+        reply_markup=CancelKeyboard()(),
+    )
+
+
+@router.message(FSMAdmin.broadcast_message)
+async def admin_broadcast_preview(message: Message, state: FSMContext, user_service: UserService):
+    await state.update_data(broadcast_chat_id=message.chat.id, broadcast_message_id=message.message_id)
+    total = await user_service.count_recipients()
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=f"✅ Отправить ({total})", callback_data="broadcast:start")],
+            [InlineKeyboardButton(text="❌ Отменить", callback_data="broadcast:cancel")],
+        ],
+    )
+    await message.answer(f"📣 Сообщение выше получат {total} пользователей. Отправить?", reply_markup=keyboard)
+
+
+@router.callback_query(FSMAdmin.broadcast_message, F.data == "broadcast:start", IsAdminFilter())
+async def admin_broadcast_start(callback: CallbackQuery, state: FSMContext, broadcast_service: BroadcastService):
+    data = await state.get_data()
+    started = await broadcast_service.start(
+        from_chat_id=data["broadcast_chat_id"],
+        message_id=data["broadcast_message_id"],
+        # The confirmation turns into the progress report
+        report_chat_id=callback.message.chat.id,  # type: ignore
+        report_message_id=callback.message.message_id,  # type: ignore
+    )
+    if not started:
+        await callback.answer("⏳ Другая рассылка ещё не закончилась", show_alert=True)
+        return
+
+    await state.clear()
+    await callback.message.edit_text("📣 <b>Рассылка запущена</b>", parse_mode="HTML")  # type: ignore
+    await callback.answer()
+    await handle_admin_panel(callback.message, state)  # type: ignore
+
+
+@router.callback_query(FSMAdmin.broadcast_message, F.data == "broadcast:cancel", IsAdminFilter())
+async def admin_broadcast_cancel(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("🚫 Рассылка отменена")  # type: ignore
+    await callback.answer()
+    await handle_admin_panel(callback.message, state)  # type: ignore
+
+
+@router.callback_query(F.data == "broadcast:stop", IsAdminFilter())
+async def admin_broadcast_stop(callback: CallbackQuery, broadcast_service: BroadcastService):
+    await broadcast_service.stop()
+    await callback.answer("⏹ Рассылка будет остановлена")
+
+
 __all__ = ["router"]
@@ -8,8 +8,8 @@ from aiogram.types import BufferedInputFile, CallbackQuery, InlineKeyboardButton
 
 from fsm import FSMUser
 from keyboards import ToMainMenu
-from models import SongTempo, SongType, User
-from service import GenreService, SongService, UserService
+from models import HistoryAction, Song, SongTempo, SongType, User
+from service import GenreService, RecommendationService, SongService, TrendingService, UserService
 
 router = Router()
 
@@ -53,17 +53,17 @@ async def cmd_catalog(message: Message, state: FSMContext, song_service: SongSer
         songs = await song_service.get_by_filter(type_str=song_type.value, tempo_str=None, genre_titles=None)
         song_count_by_type.append((song_type, len(songs)))
 
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text=f"{TypeRus[t.value]} ({count} шт.)",  # Добавляем количество песен
-                    callback_data=f"type:{t.value}",
-                ),
-            ]
-            for t, count in song_count_by_type
-        ],
-    )
+    buttons = [
+        [
+            InlineKeyboardButton(
+                text=f"{TypeRus[t.value]} ({count} шт.)",  # Добавляем количество песен
+                callback_data=f"type:{t.value}",
+            ),
+        ]
+        for t, count in song_count_by_type
+    ]
+    buttons.append([InlineKeyboardButton(text="🔥 Сейчас популярно", callback_data="action:trending")])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     text = (
         "Каждая из этих композиций это готовая история, которая ждёт своего исполнителя. Вам осталось лишь выбрать, "
         "кто её расскажет.\n\n"
@@ -88,6 +88,7 @@ async def on_type(callback: CallbackQuery, state: FSMContext):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="▶️ Послушать все", callback_data="action:all")],
+            [InlineKeyboardButton(text="⭐ Сначала популярные", callback_data="action:popular")],
             [InlineKeyboardButton(text="🎧 Выбрать темп и жанр", callback_data="action:filter")],
             [InlineKeyboardButton(text="↩️ Изменить тип", callback_data="nav:type")],
         ],
@@ -139,23 +140,45 @@ async def on_type(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(FSMUser.music_list, F.data == "action:all")
+@router.callback_query(FSMUser.music_list, F.data.in_({"action:all", "action:popular"}))
 async def on_all(
     callback: CallbackQuery,
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
 ):
     data = await state.get_data()
-    songs = await song_service.get_by_filter(data["type_str"], None, None)
+    popular_first = callback.data == "action:popular"
+    songs = await song_service.get_by_filter(data["type_str"], None, None, popular_first=popular_first)
     if not songs:
         await callback.message.edit_text("😔 Песен данного типа не найдено.")  # type: ignore
         await cmd_catalog(callback.message, state, song_service)
         return
     ids = list(dict.fromkeys(s.id for s in songs))
     await state.update_data(songs_list=ids, index=0)
-    await send_current(callback.message, state, song_service, user_service, current_user)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
+    await callback.answer()
+    await callback.message.delete()  # type: ignore
+
+
+@router.callback_query(FSMUser.music_list, F.data == "action:trending")
+async def on_trending(
+    callback: CallbackQuery,
+    state: FSMContext,
+    song_service: SongService,
+    user_service: UserService,
+    recommendation_service: RecommendationService,
+    trending_service: TrendingService,
+    current_user: User,
+):
+    ids = await trending_service.top()
+    if not ids:
+        await callback.answer("😔 Пока нет популярных песен", show_alert=True)
+        return
+    await state.update_data(songs_list=ids, index=0)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
     await callback.answer()
     await callback.message.delete()  # type: ignore
 
@@ -222,6 +245,7 @@ async def on_genre_done(
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
 ):
     data = await state.get_data()
@@ -238,7 +262,7 @@ async def on_genre_done(
 
     ids = list(dict.fromkeys(s.id for s in songs))
     await state.update_data(songs_list=ids, index=0)
-    await send_current(callback.message, state, song_service, user_service, current_user)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
     await callback.answer()
     await callback.message.delete()  # type: ignore
 
@@ -289,18 +313,21 @@ async def on_genre_toggle(
     await callback.answer(f"Выбрано: {len(selected)} из 3")
 
 
+# nav_steps is set by NavigationDebounceMiddleware when a burst of clicks is handled at once
 @router.callback_query(FSMUser.music_list, F.data == "nav:prev")
 async def nav_prev(
     callback: CallbackQuery,
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
+    nav_steps: int = -1,
 ):
     data = await state.get_data()
-    idx = (data["index"] - 1) % len(data["songs_list"])
+    idx = (data["index"] + nav_steps) % len(data["songs_list"])
     await state.update_data(index=idx)
-    await send_current(callback.message, state, song_service, user_service, current_user)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
     await callback.answer()
     await callback.message.delete()  # type: ignore
 
@@ -311,12 +338,14 @@ async def nav_next(
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
+    nav_steps: int = 1,
 ):
     data = await state.get_data()
-    idx = (data["index"] + 1) % len(data["songs_list"])
+    idx = (data["index"] + nav_steps) % len(data["songs_list"])
     await state.update_data(index=idx)
-    await send_current(callback.message, state, song_service, user_service, current_user)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
     await callback.answer()
     await callback.message.delete()  # type: ignore
 
@@ -419,6 +448,43 @@ async def nav_like(
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
+    current_user: User,
+):
+    data = await state.get_data()
+    song_id = data["songs_list"][data["index"]]
+    song = await song_service.get_one(song_id)
+    if not song:
+        await callback.message.answer("🔎 Песня не найдена")  # type: ignore
+        await cmd_catalog(callback.message, state, song_service)
+        return
+    # The cached membership spares the insert for a song that is already there
+    added = not await user_service.in_wishlist(current_user.id, song_id) and await user_service.add_to_wishlist(
+        current_user.id,
+        song_id,
+    )
+    if not added:
+        await callback.answer("🛒 Уже в списке желаемого")
+        return
+    await user_service.log_view(
+        current_user.id,
+        song.id,
+        HistoryAction.like,
+    )
+    await callback.message.edit_reply_markup(  # type: ignore
+        reply_markup=song_keyboard(song, True, recommendation_service),
+    )
+    total = await user_service.count_wishlist(current_user.id)
+    await callback.answer(f"🛒 Добавлено в список желаемого ({total})")
+
+
+@router.callback_query(FSMUser.music_list, F.data == "nav:unlike")
+async def nav_unlike(
+    callback: CallbackQuery,
+    state: FSMContext,
+    song_service: SongService,
+    user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
 ):
     data = await state.get_data()
@@ -428,13 +494,39 @@ async def nav_like(
         await callback.message.answer("🔎 Песня не найдена")  # type: ignore
         await cmd_catalog(callback.message, state, song_service)
         return
-    await user_service.add_to_wishlist(current_user.id, song_id)
+    if not await user_service.remove_from_wishlist(current_user.id, song_id):
+        await callback.answer()
+        return
     await user_service.log_view(
         current_user.id,
-        song.title,
-        "like",
+        song.id,
+        HistoryAction.remove,
+    )
+    await callback.message.edit_reply_markup(  # type: ignore
+        reply_markup=song_keyboard(song, False, recommendation_service),
     )
-    await callback.answer("🛒 Добавлено в список желаемого")
+    await callback.answer("🗑 Удалено из списка желаемого")
+
+
+@router.callback_query(FSMUser.music_list, F.data == "nav:similar")
+async def nav_similar(
+    callback: CallbackQuery,
+    state: FSMContext,
+    song_service: SongService,
+    user_service: UserService,
+    recommendation_service: RecommendationService,
+    current_user: User,
+):
+    data = await state.get_data()
+    song_id = data["songs_list"][data["index"]]
+    similar = recommendation_service.similar(song_id)
+    if not similar:
+        await callback.answer("🎯 Похожих песен пока нет")
+        return
+    await state.update_data(songs_list=similar, index=0)
+    await send_current(callback.message, state, song_service, user_service, recommendation_service, current_user)
+    await callback.answer()
+    await callback.message.delete()  # type: ignore
 
 
 async def send_current(
@@ -442,6 +534,7 @@ async def send_current(
     state: FSMContext,
     song_service: SongService,
     user_service: UserService,
+    recommendation_service: RecommendationService,
     current_user: User,
 ):
     data = await state.get_data()
@@ -452,7 +545,7 @@ async def send_current(
         await cmd_catalog(msg_obj, state, song_service)
         return
 
-    await user_service.log_view(current_user.id, song.title)
+    await user_service.log_view(current_user.id, song.id)
 
     current_pos = data["index"] + 1
     total_songs = len(data["songs_list"])
@@ -466,6 +559,17 @@ async def send_current(
         f"{position_info}"
     )
 
+    liked = await user_service.in_wishlist(current_user.id, song.id)
+    keyboard = song_keyboard(song, liked, recommendation_service)
+
+    if song.file_id:
+        await msg_obj.answer_video(song.file_id, caption=text, reply_markup=keyboard)
+    else:
+        await msg_obj.answer(text, reply_markup=keyboard)
+
+
+def song_keyboard(song: Song, liked: bool, recommendation_service: RecommendationService) -> InlineKeyboardMarkup:
+    """Keyboard of a catalog song card; the wishlist button adds or removes the song"""
     support_text = (
         f"Здравствуйте! Я хочу приобрести песню:\n\n"
         f'🎵 "{song.title}"\n'
@@ -479,32 +583,35 @@ async def send_current(
     encoded_text = urllib.parse.quote(support_text)
     support_url = f"https://t.me/MusicCompanyIraEuphoria?text={encoded_text}"
 
-    btns = [InlineKeyboardButton(text="🛒 В список желаемого", callback_data="nav:like")]
+    if liked:
+        btns = [InlineKeyboardButton(text="🗑 Убрать из желаемого", callback_data="nav:unlike")]
+    else:
+        btns = [InlineKeyboardButton(text="🛒 В список желаемого", callback_data="nav:like")]
     if song.lyrics:
         btns.insert(0, InlineKeyboardButton(text="📄 Читать текст", callback_data="download:lyrics"))
 
-    keyboard = InlineKeyboardMarkup(
+    filter_btns = [
+        InlineKeyboardButton(text="🎧 Темп", callback_data="nav:tempo"),
+        InlineKeyboardButton(text="🎭 Жанр", callback_data="nav:genre"),
+        InlineKeyboardButton(text="🎤 Тип", callback_data="nav:type"),
+    ]
+    # Neighbours are kept in memory, so the button costs no queries
+    if recommendation_service.similar(song.id):
+        filter_btns.append(InlineKeyboardButton(text="🎯 Похожие", callback_data="nav:similar"))
+
+    return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="⬅️ Предыдущая", callback_data="nav:prev"),
                 InlineKeyboardButton(text="➡️ Следующая", callback_data="nav:next"),
             ],
-            [
-                InlineKeyboardButton(text="🎧 Темп", callback_data="nav:tempo"),
-                InlineKeyboardButton(text="🎭 Жанр", callback_data="nav:genre"),
-                InlineKeyboardButton(text="🎤 Тип", callback_data="nav:type"),
-            ],
+            filter_btns,
             btns,
             [InlineKeyboardButton(text="💬 Хочу эту песню!", url=support_url)],
             [InlineKeyboardButton(text="🏠 На главную", callback_data="to_main")],
         ],
     )
 
-    if song.file_id:
-        await msg_obj.answer_video(song.file_id, caption=text, reply_markup=keyboard)
-    else:
-        await msg_obj.answer(text, reply_markup=keyboard)
-
 
 @router.callback_query(lambda c: c.data == "download:lyrics")
 async def handle_download_lyrics(callback: CallbackQuery, state: FSMContext, song_service: SongService):
@@ -544,12 +651,11 @@ async def cmd_wishlist(
     await state.clear()
     await state.set_state(FSMUser.music_list)
 
-    songs = await user_service.get_wishlist(current_user.id)
-    if not songs:
+    ids = await user_service.get_wishlist_ids(current_user.id)
+    if not ids:
         return await message.answer("🧺 Ваш список желаемого пуст.", reply_markup=ToMainMenu()())
 
     await message.answer("🧺 Ваш список желаемого:", reply_markup=ToMainMenu()())
-    ids = list(dict.fromkeys(s.id for s in songs))
     await state.update_data(songs_list=ids, index=0, in_wishlist=True)
     return await send_wishlist_current(
         message,
@@ -560,9 +666,9 @@ async def cmd_wishlist(
 
 # Навигация по Wishlist
 @router.callback_query(FSMUser.music_list, F.data == "wish:prev")
-async def wish_prev(callback: CallbackQuery, state: FSMContext, song_service: SongService):
+async def wish_prev(callback: CallbackQuery, state: FSMContext, song_service: SongService, nav_steps: int = -1):
     data = await state.get_data()
-    idx = (data["index"] - 1) % len(data["songs_list"])
+    idx = (data["index"] + nav_steps) % len(data["songs_list"])
     await state.update_data(index=idx)
     await send_wishlist_current(
         callback.message,
@@ -574,9 +680,9 @@ async def wish_prev(callback: CallbackQuery, state: FSMContext, song_service: So
 
 
 @router.callback_query(FSMUser.music_list, F.data == "wish:next")
-async def wish_next(callback: CallbackQuery, state: FSMContext, song_service: SongService):
+async def wish_next(callback: CallbackQuery, state: FSMContext, song_service: SongService, nav_steps: int = 1):
     data = await state.get_data()
-    idx = (data["index"] + 1) % len(data["songs_list"])
+    idx = (data["index"] + nav_steps) % len(data["songs_list"])
     await state.update_data(index=idx)
     await send_wishlist_current(
         callback.message,
@@ -607,8 +713,8 @@ async def wish_remove(
         return
     await user_service.log_view(
         current_user.id,
-        song.title,
-        "remove",
+        song.id,
+        HistoryAction.remove,
     )
 
     songs_list = data["songs_list"]
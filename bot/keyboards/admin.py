@@ -10,7 +10,8 @@ class AdminPanelKeyboard:
                 KeyboardButton(text="✏️ Изменить песню"),
                 KeyboardButton(text="🗑 Удалить песню"),
             ],
-            [KeyboardButton(text="📜 История пользователя")],
+            [KeyboardButton(text="📜 История пользователя"), KeyboardButton(text="📊 Статистика")],
+            [KeyboardButton(text="📣 Рассылка")],
         ]
         return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
@@ -2,15 +2,20 @@ from aiogram import Bot
 from aiogram.types import BotCommand
 
 
-async def setup_menu(bot: Bot):
-    await bot.set_my_commands(
-        [
-            BotCommand(command="start", description="Перезапустить бота"),
-            BotCommand(command="help", description="Информация о боте"),
-            BotCommand(command="catalog", description="Каталог песен"),
-            BotCommand(command="wishlist", description="Список желаемого"),
-        ],
-    )
+COMMANDS = [
+    BotCommand(command="start", description="Перезапустить бота"),
+    BotCommand(command="help", description="Информация о боте"),
+    BotCommand(command="catalog", description="Каталог песен"),
+    BotCommand(command="wishlist", description="Список желаемого"),
+]
 
 
-__all__ = ["setup_menu"]
+async def setup_menu(bot: Bot) -> bool:
+    """Publish the command menu; False if Telegram already has the same one."""
+    if await bot.get_my_commands() == COMMANDS:
+        return False
+    await bot.set_my_commands(COMMANDS)
+    return True
+
+
+__all__ = ["COMMANDS", "setup_menu"]
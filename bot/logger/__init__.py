@@ -1,4 +1,4 @@
-from logger.logger import get_logger, LoggerConfig
+from logger.logger import get_logger, LoggerConfig, LogRotation
 
 
-__all__ = ["get_logger", "LoggerConfig"]
+__all__ = ["get_logger", "LoggerConfig", "LogRotation"]
@@ -1,13 +1,34 @@
+import atexit
+import copy
 from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum as PyEnum
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import SimpleQueue
+import random
 
 from colorlog import ColoredFormatter
 
 
+class LogRotation(PyEnum):
+    none = "none"
+    size = "size"
+    time = "time"
+
+
 @dataclass
 class LoggerConfig:
     debug: bool
     file_path: str
+    json: bool = False
+    rotation: LogRotation = LogRotation.size
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+    rotate_when: str = "midnight"
+    # Share of per-request INFO lines that are written, 1.0 keeps all of them
+    request_sample_rate: float = 1.0
 
 
 class ConditionalColoredFormatter(ColoredFormatter):
@@ -15,18 +36,80 @@ class ConditionalColoredFormatter(ColoredFormatter):
 
     def format(self, record):
         if record.levelno >= logging.WARNING:
+            # The record is shared between handlers, so it must not be modified in place
+            record = copy.copy(record)
             extra_info = f"\t[File: {record.filename}:{record.lineno}]"
             record.msg += extra_info
 
         return super().format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.levelno >= logging.WARNING:
+            payload["file"] = f"{record.filename}:{record.lineno}"
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Drops a share of the records marked with ``extra={"sampled": True}``"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that leaves the formatting to the listener thread"""
+
+    def prepare(self, record):
+        # Only merge the arguments, so later mutations of them do not leak into the log
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _get_file_handler(cfg: LoggerConfig) -> logging.Handler:
+    if cfg.rotation is LogRotation.size:
+        return RotatingFileHandler(
+            cfg.file_path,
+            maxBytes=cfg.max_bytes,
+            backupCount=cfg.backup_count,
+            encoding="utf-8",
+        )
+    if cfg.rotation is LogRotation.time:
+        return TimedRotatingFileHandler(
+            cfg.file_path,
+            when=cfg.rotate_when,
+            backupCount=cfg.backup_count,
+            encoding="utf-8",
+        )
+    return logging.FileHandler(cfg.file_path, encoding="utf-8")
+
+
 def get_logger(name: str, cfg: LoggerConfig) -> logging.Logger:
     """Get the configured logger.
 
+    Records are put into an in-memory queue; formatting and I/O happen in a background thread.
+
     Args:
         name (str): The name of the logger
-        level (int): Logging level. Defaults to logging.DEBUG.
+        cfg (LoggerConfig): Logger configuration
 
     Returns:
         logging.Logger: The configured logger
@@ -38,38 +121,54 @@ def get_logger(name: str, cfg: LoggerConfig) -> logging.Logger:
     logger.setLevel(level)
 
     if not logger.hasHandlers():
-        console_formatter = ConditionalColoredFormatter(
-            "%(blue)s%(asctime)s\t%(log_color)s[%(levelname)-8s]%(reset)s\t%(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "red,bg_black",
-            },
-        )
+        if cfg.json:
+            console_formatter: logging.Formatter = JsonFormatter()
+        else:
+            console_formatter = ConditionalColoredFormatter(
+                "%(blue)s%(asctime)s\t%(log_color)s[%(levelname)-8s]%(reset)s\t%(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S",
+                log_colors={
+                    "DEBUG": "cyan",
+                    "INFO": "green",
+                    "WARNING": "yellow",
+                    "ERROR": "red",
+                    "CRITICAL": "red,bg_black",
+                },
+            )
 
         console_handler = logging.StreamHandler()
         console_handler.setLevel(level=level)
         console_handler.setFormatter(console_formatter)
 
-        logger.addHandler(console_handler)
+        handlers: list[logging.Handler] = [console_handler]
 
         # Configuring the log file
         if cfg.file_path:
-            file_formatter = logging.Formatter(
-                "%(asctime)s    [%(levelname)-8s]    %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S",
-            )
-
-            file_handler = logging.FileHandler(cfg.file_path, encoding="utf-8")
+            if cfg.json:
+                file_formatter: logging.Formatter = JsonFormatter()
+            else:
+                file_formatter = logging.Formatter(
+                    "%(asctime)s    [%(levelname)-8s]    %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S",
+                )
+
+            file_handler = _get_file_handler(cfg)
             file_handler.setLevel(logging.INFO)
             file_handler.setFormatter(file_formatter)
 
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        log_queue: SimpleQueue = SimpleQueue()
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(RequestSamplingFilter(cfg.request_sample_rate))
+        logger.addHandler(queue_handler)
+
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # Flush the queue when the process exits
+        atexit.register(listener.stop)
 
     return logger
 
 
-__all__ = ["get_logger"]
+__all__ = ["get_logger", "LoggerConfig", "LogRotation"]
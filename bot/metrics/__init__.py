@@ -0,0 +1,37 @@
+from metrics.metrics import (
+    DatabasePoolCollector,
+    HANDLER_LATENCY,
+    instrument_repository,
+    JOB_DURATION,
+    JOB_RUNS_TOTAL,
+    NAV_CLICKS_COALESCED,
+    QUERIES_PER_UPDATE,
+    QUERY_LATENCY,
+    REDIS_LATENCY,
+    REGISTRY,
+    UPDATE_QUEUE_WAIT,
+    UPDATES_IN_FLIGHT,
+    UPDATES_QUEUED,
+    UPDATES_TOTAL,
+)
+from metrics.server import MetricsConfig, MetricsServer
+
+
+__all__ = [
+    "REGISTRY",
+    "HANDLER_LATENCY",
+    "UPDATES_TOTAL",
+    "QUERIES_PER_UPDATE",
+    "QUERY_LATENCY",
+    "REDIS_LATENCY",
+    "JOB_DURATION",
+    "JOB_RUNS_TOTAL",
+    "UPDATES_QUEUED",
+    "UPDATES_IN_FLIGHT",
+    "UPDATE_QUEUE_WAIT",
+    "NAV_CLICKS_COALESCED",
+    "DatabasePoolCollector",
+    "instrument_repository",
+    "MetricsConfig",
+    "MetricsServer",
+]
@@ -0,0 +1,163 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable, Iterable, Tuple, TypeVar
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy.pool import Pool, QueuePool
+
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# Most handlers answer within tens of milliseconds, media sends take up to a few seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent in a message or callback handler",
+    ["handler"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+UPDATES_TOTAL = Counter(
+    "bot_updates_total",
+    "Processed updates by outcome (handled, unhandled, error)",
+    ["outcome"],
+    registry=REGISTRY,
+)
+
+QUERIES_PER_UPDATE = Histogram(
+    "bot_update_queries",
+    "SQL statements issued while processing one update",
+    ["handler"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+    registry=REGISTRY,
+)
+
+QUERY_LATENCY = Histogram(
+    "bot_repository_query_duration_seconds",
+    "Time spent in a repository method",
+    ["repository", "method"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+REDIS_LATENCY = Histogram(
+    "bot_redis_command_duration_seconds",
+    "Redis command round trip time",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+    registry=REGISTRY,
+)
+
+UPDATES_QUEUED = Gauge(
+    "bot_updates_queued",
+    "Updates waiting for the previous update of the same user or for a free slot",
+    registry=REGISTRY,
+)
+UPDATES_IN_FLIGHT = Gauge(
+    "bot_updates_in_flight",
+    "Updates being processed",
+    registry=REGISTRY,
+)
+UPDATE_QUEUE_WAIT = Histogram(
+    "bot_update_queue_wait_seconds",
+    "Time an update waited before processing",
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+NAV_CLICKS_COALESCED = Counter(
+    "bot_nav_clicks_coalesced_total",
+    "Navigation clicks answered without rendering, superseded by a later click of the same burst",
+    registry=REGISTRY,
+)
+
+JOB_DURATION = Histogram(
+    "bot_job_duration_seconds",
+    "Run time of a scheduled job",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0),
+    registry=REGISTRY,
+)
+
+JOB_RUNS_TOTAL = Counter(
+    "bot_job_runs_total",
+    "Scheduled job runs by outcome (ok, error, timeout, skipped)",
+    ["job", "outcome"],
+    registry=REGISTRY,
+)
+
+
+class DatabasePoolCollector(Collector):
+    """Reports the SQLAlchemy connection pool usage of every engine at scrape time.
+
+    The pools are labelled with the engine name (``primary`` or the replica address) and its role.
+    One collector reports them all, since the registry accepts each metric name once.
+    """
+
+    def __init__(self, pools: Iterable[Tuple[str, str, Pool]]):
+        # Engine name, role and pool of every engine
+        self.pools = list(pools)
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        labels = ["engine", "role"]
+        size = GaugeMetricFamily("bot_db_pool_size", "Configured pool size", labels=labels)
+        checked_out = GaugeMetricFamily("bot_db_pool_checked_out", "Connections currently in use", labels=labels)
+        overflow = GaugeMetricFamily("bot_db_pool_overflow", "Connections opened above the pool size", labels=labels)
+        for engine, role, pool in self.pools:
+            if not isinstance(pool, QueuePool):
+                continue
+            size.add_metric([engine, role], pool.size())
+            checked_out.add_metric([engine, role], pool.checkedout())
+            overflow.add_metric([engine, role], max(pool.overflow(), 0))
+        yield size
+        yield checked_out
+        yield overflow
+
+
+T = TypeVar("T")
+
+
+def _timed(repository: str, method: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    histogram = QUERY_LATENCY.labels(repository=repository, method=method)
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_repository(cls: T) -> T:
+    """Class decorator that records the latency of every public async method of a repository"""
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(func):
+            continue
+        setattr(cls, name, _timed(cls.__name__, name, func))  # type: ignore[attr-defined]
+    return cls
+
+
+__all__ = [
+    "REGISTRY",
+    "HANDLER_LATENCY",
+    "UPDATES_TOTAL",
+    "QUERIES_PER_UPDATE",
+    "QUERY_LATENCY",
+    "REDIS_LATENCY",
+    "JOB_DURATION",
+    "JOB_RUNS_TOTAL",
+    "UPDATES_QUEUED",
+    "UPDATES_IN_FLIGHT",
+    "UPDATE_QUEUE_WAIT",
+    "NAV_CLICKS_COALESCED",
+    "DatabasePoolCollector",
+    "instrument_repository",
+]
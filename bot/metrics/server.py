@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from aiohttp import web
+from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest
+
+from metrics.metrics import REGISTRY
+
+
+@dataclass
+class MetricsConfig:
+    enabled: bool
+    host: str
+    port: int
+
+
+class MetricsServer:
+    """HTTP server exposing ``/metrics`` in the Prometheus text format"""
+
+    def __init__(self, config: MetricsConfig, registry: CollectorRegistry = REGISTRY):
+        self.config = config
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.config.host, self.config.port).start()
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=generate_latest(self.registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+__all__ = ["MetricsConfig", "MetricsServer"]
@@ -0,0 +1,25 @@
+from prometheus_client import CollectorRegistry, generate_latest
+from sqlalchemy.pool import NullPool, QueuePool
+
+from metrics.metrics import DatabasePoolCollector
+
+
+def connect():
+    raise AssertionError("The collector must not open connections")
+
+
+def test_pool_collector_labels_every_engine():
+    registry = CollectorRegistry()
+    pools = [
+        ("primary", "primary", QueuePool(connect, pool_size=10)),
+        ("replica-1:5432", "replica", QueuePool(connect, pool_size=5)),
+        ("replica-2:5432", "replica", NullPool(connect)),
+    ]
+    registry.register(DatabasePoolCollector(pools))
+    output = generate_latest(registry).decode()
+
+    assert 'bot_db_pool_size{engine="primary",role="primary"} 10.0' in output
+    assert 'bot_db_pool_size{engine="replica-1:5432",role="replica"} 5.0' in output
+    assert 'bot_db_pool_checked_out{engine="replica-1:5432",role="replica"} 0.0' in output
+    # Pools without a size are skipped
+    assert "replica-2" not in output
@@ -3,13 +3,37 @@ from logging import Logger
 from aiogram import Dispatcher
 
 from middleware.logging import LoggingMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.navigation import NavigationDebounceMiddleware
+from middleware.routing import ReadYourWritesMiddleware
 from middleware.user import CurrentUserMiddleware
 from service import UserService
 
 
-def setup(dispatcher: Dispatcher, logger: Logger, user_service: UserService):
+def setup(
+    dispatcher: Dispatcher,
+    logger: Logger,
+    user_service: UserService,
+    query_budget: int = 0,
+    nav_debounce: float = 0,
+    read_your_writes: float = 0,
+):
+    if nav_debounce > 0:
+        # Outer middlewares run in registration order and the FSM one is registered by the dispatcher,
+        # the debouncing has to come before its lock
+        dispatcher.update.outer_middleware.unregister(dispatcher.fsm)
+        dispatcher.update.outer_middleware(NavigationDebounceMiddleware(nav_debounce))
+        dispatcher.update.outer_middleware(dispatcher.fsm)
+
+    # Logging goes first so the queries of CurrentUserMiddleware are attributed to the update as well
+    dispatcher.update.middleware(LoggingMiddleware(logger, query_budget=query_budget))
     dispatcher.update.middleware(CurrentUserMiddleware(user_service=user_service))
-    dispatcher.update.middleware(LoggingMiddleware(logger))
+    if read_your_writes > 0:
+        dispatcher.update.middleware(ReadYourWritesMiddleware(read_your_writes))
+
+    metrics_middleware = MetricsMiddleware()
+    dispatcher.message.middleware(metrics_middleware)
+    dispatcher.callback_query.middleware(metrics_middleware)
 
 
 __all__ = ["setup"]
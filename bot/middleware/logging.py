@@ -6,10 +6,14 @@ from aiogram import BaseMiddleware
 from aiogram.dispatcher.event.bases import UNHANDLED
 from aiogram.types import TelegramObject, Update, User
 
+from database import QueryStats, track_queries
+from metrics import QUERIES_PER_UPDATE, UPDATES_TOTAL
+
 
 class LoggingMiddleware(BaseMiddleware):
-    def __init__(self, logger: Logger):
+    def __init__(self, logger: Logger, query_budget: int = 0):
         self.logger = logger
+        self.query_budget = query_budget
         super().__init__()
 
     async def __call__(
@@ -23,49 +27,71 @@ class LoggingMiddleware(BaseMiddleware):
         loop = asyncio.get_running_loop()
         start_time = loop.time()
         handled = False
-        try:
-            result = await handler(update, data)
-            handled = result is not UNHANDLED
-            return result
+        outcome = "unhandled"
+        with track_queries(update.update_id) as stats:
+            try:
+                result = await handler(update, data)
+                handled = result is not UNHANDLED
+                if handled:
+                    outcome = "handled"
+                return result
+
+            except Exception as e:
+                outcome = "error"
+                self.logger.error("<%d> %-7s: %s", update.update_id, "error", str(e))
+
+            finally:
+                UPDATES_TOTAL.labels(outcome=outcome).inc()
+                QUERIES_PER_UPDATE.labels(handler=stats.handler).observe(stats.count)
+                self._log_update(update, handled, (loop.time() - start_time) * 1000, stats)
 
-        except Exception as e:
-            self.logger.error("<%d> %-7s: %s", update.update_id, "error", str(e))
+    def _log_update(self, update: Update, handled: bool, duration: float, stats: QueryStats) -> None:
+        format_string = '<%d> %-7s: "%s" from user %s. Duration %d ms, %d queries / %d ms DB'
+        text = ""
+        user_id = 0
 
-        finally:
-            duration = (loop.time() - start_time) * 1000
-            format_string = '<%d> %-7s: "%s" from user %s. Duration %d ms'
-            text = ""
-            user_id = 0
+        def get_user(obj: Any) -> Optional[User]:
+            return getattr(obj, "from_user", None)
 
-            def get_user(obj: Any) -> Optional[User]:
-                return getattr(obj, "from_user", None)
+        if update.message:
+            user = get_user(update.message)
+            user_id = user.id if user else 0
+            text = update.message.text
+        elif update.callback_query:
+            text = update.callback_query.data
+            user_id = update.callback_query.from_user.id
 
-            if update.message:
-                user = get_user(update.message)
-                user_id = user.id if user else 0
-                text = update.message.text
-            elif update.callback_query:
-                text = update.callback_query.data
-                user_id = update.callback_query.from_user.id
+        if self.query_budget and stats.count > self.query_budget:
+            self.logger.warning(
+                "<%d> %-7s: %s issued %d queries (budget %d)",
+                update.update_id,
+                "budget",
+                stats.handler,
+                stats.count,
+                self.query_budget,
+            )
 
-            if handled:
-                self.logger.info(
-                    format_string,
-                    update.update_id,
-                    "request",
-                    text,
-                    user_id,
-                    duration,
-                )
-            else:
-                format_string = '<%d> %-7s: "%s" from user %s. NOT HANDLED'
-                self.logger.debug(
-                    format_string,
-                    update.update_id,
-                    "request",
-                    text,
-                    user_id,
-                )
+        if handled:
+            self.logger.info(
+                format_string,
+                update.update_id,
+                "request",
+                text,
+                user_id,
+                duration,
+                stats.count,
+                stats.duration_ms,
+                extra={"sampled": True},
+            )
+        else:
+            format_string = '<%d> %-7s: "%s" from user %s. NOT HANDLED'
+            self.logger.debug(
+                format_string,
+                update.update_id,
+                "request",
+                text,
+                user_id,
+            )
 
 
 __all__ = ["LoggingMiddleware"]
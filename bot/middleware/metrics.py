@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+
+from database import current_query_stats
+from metrics import HANDLER_LATENCY
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Inner middleware that records the latency of the matched handler
+
+    It also attributes the SQL statements of the update to the handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object: Optional[HandlerObject] = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+
+        stats = current_query_stats()
+        if stats:
+            stats.handler = name
+
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_LATENCY.labels(handler=name).observe(loop.time() - start_time)
+
+
+__all__ = ["MetricsMiddleware"]
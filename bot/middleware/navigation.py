@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, cast, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from metrics import NAV_CLICKS_COALESCED
+
+
+@dataclass
+class _Burst:
+    update: Update
+    data: Dict[str, Any]
+    steps: int
+    clicked_at: float
+
+
+class NavigationDebounceMiddleware(BaseMiddleware):
+    """Outer update middleware that coalesces bursts of ⬅️/➡️ clicks of one user
+
+    The first click of a burst waits until the user stops clicking for ``window`` seconds. Every
+    click that arrives meanwhile is answered right away and only adds its step, then the last one
+    is handled once with the sum of the steps in ``nav_steps``: a single card is rendered and a
+    single view is logged. Clicks that cancel each other out render nothing.
+
+    It has to run before the FSM middleware: the waiting click must not hold the user's lock,
+    otherwise the following clicks could not reach it.
+    """
+
+    STEPS = {"nav:prev": -1, "nav:next": 1, "wish:prev": -1, "wish:next": 1}
+
+    def __init__(self, window: float):
+        self.window = window
+        self._bursts: Dict[Tuple[int, str], _Burst] = {}
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update = cast(Update, update)
+        query = update.callback_query
+        step = self.STEPS.get(query.data or "") if query else None
+        if query is None or step is None:
+            return await handler(update, data)
+
+        loop = asyncio.get_running_loop()
+        # Catalog and wishlist cards are navigated separately
+        key = (query.from_user.id, (query.data or "").partition(":")[0])
+        burst = self._bursts.get(key)
+        if burst is not None:
+            await self._answer(burst.update)
+            burst.update, burst.data = update, data
+            burst.steps += step
+            burst.clicked_at = loop.time()
+            return None
+
+        burst = self._bursts[key] = _Burst(update, data, step, loop.time())
+        try:
+            while (delay := burst.clicked_at + self.window - loop.time()) > 0:
+                await asyncio.sleep(delay)
+        finally:
+            del self._bursts[key]
+
+        if not burst.steps:
+            await self._answer(burst.update)
+            return None
+        burst.data["nav_steps"] = burst.steps
+        return await handler(burst.update, burst.data)
+
+    @staticmethod
+    async def _answer(update: Update) -> None:
+        NAV_CLICKS_COALESCED.inc()
+        # The query may already be too old to answer, the click is dropped either way
+        with suppress(TelegramBadRequest):
+            await cast(CallbackQuery, update.callback_query).answer()
+
+
+__all__ = ["NavigationDebounceMiddleware"]
@@ -0,0 +1,52 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from database import current_query_stats, read_from_primary
+from models import User
+
+
+class ReadYourWritesMiddleware(BaseMiddleware):
+    """Keeps the reads of an admin on the primary for a while after they changed something
+
+    An update that committed already reads from the primary by itself; this covers the next ones,
+    e.g. the song card shown right after the song was edited. Only staff users are pinned: every
+    catalog view of a user writes to the history, so pinning them would leave the replicas idle.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        # User id -> time.monotonic() until which the user reads from the primary
+        self._pinned: Dict[str, float] = {}
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        current_user: Optional[User] = data.get("current_user")
+        if current_user is None or not current_user.is_staff:
+            return await handler(event, data)
+
+        try:
+            if self._pinned.get(current_user.id, 0) > time.monotonic():
+                with read_from_primary():
+                    return await handler(event, data)
+            return await handler(event, data)
+        finally:
+            stats = current_query_stats()
+            if stats and stats.wrote:
+                self._pinned[current_user.id] = time.monotonic() + self.window
+            self._prune()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for user_id in [user_id for user_id, until in self._pinned.items() if until <= now]:
+            del self._pinned[user_id]
+
+
+__all__ = ["ReadYourWritesMiddleware"]
@@ -38,6 +38,10 @@ class CurrentUserMiddleware(BaseMiddleware):
 
         if current_user.username != username:
             current_user = await self.user_service.update_username(current_user.id, username)
+        if current_user and current_user.blocked_at is not None:
+            # Writing to the bot again means the user unblocked it
+            await self.user_service.set_blocked([current_user.id], blocked=False)
+            current_user.blocked_at = None
 
         data["current_user"] = current_user
         return await handler(update, data)
@@ -1,6 +1,22 @@
-from models.association import SongHistory, Wishlist
+from models.association import HistoryAction, SongHistory, Wishlist
+from models.recommendation import SimilarityKind, SongSimilarity
 from models.song import FileType, Genre, GenreToSong, Song, SongTempo, SongType
+from models.stats import SongStats
 from models.user import User
 
 
-__all__ = ["User", "Song", "Genre", "GenreToSong", "SongType", "SongTempo", "Wishlist", "SongHistory", "FileType"]
+__all__ = [
+    "User",
+    "Song",
+    "Genre",
+    "GenreToSong",
+    "SongType",
+    "SongTempo",
+    "Wishlist",
+    "SongHistory",
+    "HistoryAction",
+    "FileType",
+    "SongSimilarity",
+    "SimilarityKind",
+    "SongStats",
+]
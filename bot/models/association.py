@@ -1,6 +1,8 @@
 from datetime import datetime
+from enum import IntEnum
+from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy import DateTime, ForeignKey, func, Index, Integer, SmallInteger, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
@@ -8,24 +10,61 @@ from database import Base
 
 class Wishlist(Base):
     __tablename__ = "wishlist"
+    __table_args__ = (
+        Index("ix_wishlist_song_id", "song_id"),
+        # Ordered id-only reads of one wishlist
+        Index("ix_wishlist_user_id_added_at", "user_id", "added_at", "song_id"),
+    )
 
     user_id: Mapped[str] = mapped_column(String(20), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     song_id: Mapped[int] = mapped_column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True)
+    added_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+
+class HistoryAction(IntEnum):
+    view = 1
+    like = 2
+    remove = 3
+    delete = 4
 
 
 class SongHistory(Base):
     __tablename__ = "view_history"
+    __table_args__ = (
+        # Covers the per-day aggregates of the admin statistics with an index-only scan
+        Index("ix_view_history_viewed_at_user_id", "viewed_at", "user_id"),
+        Index("ix_view_history_user_id_viewed_at", "user_id", "viewed_at"),
+        Index("ix_view_history_song_id_viewed_at", "song_id", "viewed_at"),
+        # Compaction key: with a compaction window viewed_at is the start of the window
+        Index("uq_view_history_window", "user_id", "song_id", "action", "viewed_at", unique=True),
+        # Monthly partitions are managed by HistoryRetentionService
+        {"postgresql_partition_by": "RANGE (viewed_at)"},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String(20), ForeignKey("users.id", ondelete="CASCADE"))
-    song_title: Mapped[str] = mapped_column(String(150), nullable=False)
-    viewed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
-    action: Mapped[str] = mapped_column(String(20), default="view")
+    song_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("songs.id", ondelete="SET NULL"))
+    # Snapshot of the title, only on the delete rows written when the song is deleted
+    song_title: Mapped[Optional[str]] = mapped_column(String(150))
+    # Part of the primary key, since a unique constraint of a partitioned table has to include the partition key
+    viewed_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, server_default=func.now())
+    action: Mapped[int] = mapped_column(SmallInteger, default=HistoryAction.view, server_default="1")
+    # Number of merged events and the time of the latest one
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
 
     user = relationship("User", back_populates="view_history")
+    song = relationship("Song")
+
+    @property
+    def title(self) -> str:
+        """Current title of the song, or the snapshot kept on the delete rows of a deleted song"""
+        if self.song is not None:
+            return self.song.title
+        return self.song_title or "—"
 
     def __repr__(self):
-        return f"<SongHistory(user={self.user_id}, song_title={self.song_title}, action={self.action})>"
+        return f"<SongHistory(user={self.user_id}, song={self.song_id}, action={self.action})>"
 
 
-__all__ = ["Wishlist"]
+__all__ = ["Wishlist", "SongHistory", "HistoryAction"]
@@ -0,0 +1,33 @@
+from enum import IntEnum
+
+from sqlalchemy import Float, ForeignKey, Integer, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+
+
+class SimilarityKind(IntEnum):
+    co_occurrence = 1
+    content = 2
+
+
+class SongSimilarity(Base):
+    """Precomputed nearest neighbours of a song"""
+
+    __tablename__ = "song_similarity"
+
+    song_id: Mapped[int] = mapped_column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True)
+    kind: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=SimilarityKind.co_occurrence)
+    similar_song_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("songs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    score: Mapped[float] = mapped_column(Float, nullable=False)
+    rank: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<SongSimilarity(song={self.song_id}, kind={self.kind}, similar={self.similar_song_id})>"
+
+
+__all__ = ["SimilarityKind", "SongSimilarity"]
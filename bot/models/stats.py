@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, func, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+from models.association import HistoryAction
+
+
+class SongStats(Base):
+    """Per-song counters of history actions, maintained on every logged action"""
+
+    __tablename__ = "song_stats"
+
+    song_id: Mapped[int] = mapped_column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True)
+    views: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    likes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    removes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+    # History action -> counter column
+    COUNTERS = {HistoryAction.view: "views", HistoryAction.like: "likes", HistoryAction.remove: "removes"}
+
+    def __repr__(self):
+        return f"<SongStats(song={self.song_id}, views={self.views}, likes={self.likes}, removes={self.removes})>"
+
+
+__all__ = ["SongStats"]
@@ -1,6 +1,7 @@
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, String
+from sqlalchemy import Boolean, DateTime, func, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
@@ -14,6 +15,15 @@ class User(Base):
     is_staff: Mapped[bool] = mapped_column(Boolean, default=False)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False)
     date_joined: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
+    # Set when a message to the user fails because they blocked the bot; broadcasts skip such users
+    blocked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Prefix search and keyset pagination of the admin user picker. The "C" collation
+        # compares bytes, so LIKE 'prefix%' becomes an index range scan as with text_pattern_ops,
+        # while ORDER BY on the same expression is still served by the index
+        Index("ix_users_username_search", func.lower(username).collate("C"), "id"),
+    )
 
     wishlist = relationship("Song", secondary="wishlist", back_populates="customers")
     view_history = relationship(
@@ -1,6 +1,18 @@
 from repository.association import SongHistoryRepository, WishlistRepository
+from repository.partition import HistoryPartitionRepository
+from repository.recommendation import SimilarityRepository
 from repository.song import GenreRepository, SongRepository
+from repository.stats import StatsRepository
 from repository.user import UserRepository
 
 
-__all__ = ["UserRepository", "SongRepository", "GenreRepository", "SongHistoryRepository", "WishlistRepository"]
+__all__ = [
+    "UserRepository",
+    "SongRepository",
+    "GenreRepository",
+    "SongHistoryRepository",
+    "WishlistRepository",
+    "SimilarityRepository",
+    "StatsRepository",
+    "HistoryPartitionRepository",
+]
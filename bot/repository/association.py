@@ -1,29 +1,31 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from sqlalchemy import delete, select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import cast, DateTime, delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from database import DefaultDatabase
-from models import SongHistory, Wishlist
+from metrics import instrument_repository
+from models import HistoryAction, Song, SongHistory, SongStats, Wishlist
 
 
+@instrument_repository
 class WishlistRepository:
     """Wishlist Repository class"""
 
     def __init__(self, database: DefaultDatabase):
         self.db = database
 
-    async def add(self, user_id: str, song_id: int) -> None:
+    async def add(self, user_id: str, song_id: int) -> bool:
+        """Add a song to the wishlist; False if it is already there"""
         async with self.db.get_session() as session:
             session: AsyncSession
-            entry = Wishlist(user_id=user_id, song_id=song_id)
-            session.add(entry)
-            try:
-                await session.commit()
-            except IntegrityError:
-                await session.rollback()
-                # возможно уже в wishlist
+            stmt = insert(Wishlist).values(user_id=user_id, song_id=song_id).on_conflict_do_nothing()
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount > 0
 
     async def remove(self, user_id: str, song_id: int) -> None:
         async with self.db.get_session() as session:
@@ -35,30 +37,165 @@ class WishlistRepository:
             await session.execute(stmt)
             await session.commit()
 
+    async def get_song_ids(self, user_id: str) -> List[int]:
+        """Ids of the wishlisted songs, most recently added first"""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            stmt = (
+                select(Wishlist.song_id)
+                .where(Wishlist.user_id == user_id)
+                .order_by(Wishlist.added_at.desc(), Wishlist.song_id.desc())
+            )
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def get_titles(self, user_id: str) -> List[str]:
+        """Titles of the wishlisted songs, most recently added first"""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            stmt = (
+                select(Song.title)
+                .join(Wishlist, Wishlist.song_id == Song.id)
+                .where(Wishlist.user_id == user_id)
+                .order_by(Wishlist.added_at.desc(), Wishlist.song_id.desc())
+            )
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def count(self, user_id: str) -> int:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            stmt = select(func.count()).select_from(Wishlist).where(Wishlist.user_id == user_id)
+            return await session.scalar(stmt) or 0
+
 
+@instrument_repository
 class SongHistoryRepository:
     """Song History Repository class"""
 
     def __init__(self, database: DefaultDatabase):
         self.db = database
 
-    async def log(self, user_id: str, song_title: str, action: str = "view") -> int:
+    async def log(
+        self,
+        user_id: str,
+        song_id: Optional[int],
+        action: HistoryAction = HistoryAction.view,
+        song_title: Optional[str] = None,
+        window: int = 0,
+    ) -> int:
+        """Log an action and bump the popularity counter of the song in the same transaction.
+
+        Args:
+            user_id (str): User id
+            song_id (Optional[int]): Song id, None for a song that no longer exists
+            action (HistoryAction): Action
+            song_title (Optional[str]): Title snapshot, only stored without song_id
+            window (int): Compaction window, seconds. Repeated actions of the user on the song within
+                one window are merged into a single row with a count. 0 logs every action separately
+
+        Returns:
+            int: Id of the history row
+        """
         async with self.db.get_session() as session:
             session: AsyncSession
 
-            history = SongHistory(
+            viewed_at = func.now()
+            if window > 0:
+                epoch = func.extract("epoch", func.now())
+                viewed_at = cast(func.to_timestamp(func.floor(epoch / window) * window), DateTime)
+            stmt = insert(SongHistory).values(
                 user_id=user_id,
-                song_title=song_title,
+                song_id=song_id,
+                song_title=song_title if song_id is None else None,
                 action=action,
+                viewed_at=viewed_at,
+                count=1,
+                last_seen_at=func.now(),
             )
-            session.add(history)
-            await session.commit()
-            return history.id
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SongHistory.user_id, SongHistory.song_id, SongHistory.action, SongHistory.viewed_at],
+                set_={"count": SongHistory.count + 1, "last_seen_at": func.now()},
+            ).returning(SongHistory.id)
 
-    async def get_by_user(self, user_id: str) -> List[SongHistory]:
-        async with self.db.get_session() as session:
+            counter = SongStats.COUNTERS.get(action)
+            try:
+                history_id = await session.scalar(stmt)
+                if song_id is not None and counter is not None:
+                    stats_stmt = insert(SongStats).values(song_id=song_id, **{counter: 1})
+                    stats_stmt = stats_stmt.on_conflict_do_update(
+                        index_elements=[SongStats.song_id],
+                        set_={counter: getattr(SongStats, counter) + 1, "updated_at": func.now()},
+                    )
+                    await session.execute(stats_stmt)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
+            return history_id
+
+    async def get_page(
+        self,
+        user_id: str,
+        since: datetime,
+        before: Optional[Tuple[datetime, datetime, int]] = None,
+        limit: int = 20,
+    ) -> List[SongHistory]:
+        """One page of the history of a user, newest first.
+
+        Args:
+            user_id (str): User id
+            since (datetime): Oldest viewed_at shown; only the partitions from that month on are scanned
+            before (Optional[Tuple[datetime, datetime, int]]): Keyset cursor, the (viewed_at, last_seen_at, id)
+                of the last row of the previous page
+            limit (int): Page size
+
+        Returns:
+            List[SongHistory]: Rows of the page with their songs
+        """
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
-            stmt = select(SongHistory).filter(SongHistory.user_id == user_id).order_by(SongHistory.viewed_at.desc())
+            stmt = (
+                select(SongHistory)
+                .options(joinedload(SongHistory.song))
+                .where(SongHistory.user_id == user_id, SongHistory.viewed_at >= since)
+            )
+            if before is not None:
+                viewed_at, last_seen_at, history_id = before
+                stmt = stmt.where(
+                    # The plain bound lets the planner skip the partitions newer than the cursor
+                    SongHistory.viewed_at <= viewed_at,
+                    tuple_(SongHistory.viewed_at, SongHistory.last_seen_at, SongHistory.id)
+                    < tuple_(viewed_at, last_seen_at, history_id),
+                )
+            stmt = stmt.order_by(
+                SongHistory.viewed_at.desc(),
+                SongHistory.last_seen_at.desc(),
+                SongHistory.id.desc(),
+            ).limit(limit)
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def count(self, user_id: str, since: datetime) -> int:
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            stmt = (
+                select(func.count())
+                .select_from(SongHistory)
+                .where(SongHistory.user_id == user_id, SongHistory.viewed_at >= since)
+            )
+            return await session.scalar(stmt) or 0
+
+    async def get_by_user(self, user_id: str, since: datetime) -> List[SongHistory]:
+        """History of a user since the given moment, newest first; only the partitions from that month on are scanned"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            stmt = (
+                select(SongHistory)
+                .options(joinedload(SongHistory.song))
+                .where(SongHistory.user_id == user_id, SongHistory.viewed_at >= since)
+                .order_by(SongHistory.viewed_at.desc(), SongHistory.last_seen_at.desc(), SongHistory.id.desc())
+            )
             result = await session.execute(stmt)
             return list(result.scalars().all())
 
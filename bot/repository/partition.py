@@ -0,0 +1,105 @@
+from datetime import date, datetime
+import re
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DefaultDatabase
+from metrics import instrument_repository
+
+PARTITION_PREFIX = "view_history_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})_(\d{{2}})$")
+
+
+def month_of(moment: date | datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after the month of the given date"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def partition_ddl(month: date) -> str:
+    """CREATE TABLE statement of the view_history partition holding the given month"""
+    start = month_of(month)
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(start)}" PARTITION OF view_history '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+    )
+
+
+@instrument_repository
+class HistoryPartitionRepository:
+    """Monthly partitions of view_history.
+
+    Partition names are generated by ``partition_name`` and validated before they are put into DDL.
+    """
+
+    def __init__(self, database: DefaultDatabase):
+        self.db = database
+
+    async def create(self, month: date) -> None:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            await session.execute(text(partition_ddl(month)))
+            await session.commit()
+
+    async def get_all(self) -> List[Tuple[str, date, bool]]:
+        """(name, month, attached) of every partition table, detached leftovers included, oldest first"""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            result = await session.execute(
+                text(
+                    "SELECT c.relname, i.inhrelid IS NOT NULL "
+                    "FROM pg_class c "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = current_schema() "
+                    "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+                    "WHERE c.relkind = 'r' AND c.relname LIKE :prefix",
+                ),
+                {"prefix": f"{PARTITION_PREFIX}%"},
+            )
+            partitions = []
+            for name, attached in result.all():
+                match = _PARTITION_NAME.match(name)
+                if match:
+                    partitions.append((name, date(int(match[1]), int(match[2]), 1), bool(attached)))
+            return sorted(partitions, key=lambda partition: partition[1])
+
+    async def detach(self, name: str) -> None:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            await session.execute(text(f'ALTER TABLE view_history DETACH PARTITION "{_checked(name)}"'))
+            await session.commit()
+
+    async def drop(self, name: str) -> None:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            await session.execute(text(f'DROP TABLE IF EXISTS "{_checked(name)}"'))
+            await session.commit()
+
+    async def iter_rows(self, name: str, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Rows of a partition table in batches, streamed with a server-side cursor"""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            result = await session.stream(
+                text(f'SELECT * FROM "{_checked(name)}" ORDER BY viewed_at, id'),
+                execution_options={"yield_per": batch_size},
+            )
+            async for rows in result.mappings().partitions(batch_size):
+                yield [dict(row) for row in rows]
+
+
+def _checked(name: str) -> str:
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"Not a view_history partition: {name}")
+    return name
+
+
+__all__ = ["HistoryPartitionRepository", "add_months", "month_of", "partition_ddl", "partition_name"]
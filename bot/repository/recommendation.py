@@ -0,0 +1,130 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DefaultDatabase
+from metrics import instrument_repository
+from models import GenreToSong, HistoryAction, SimilarityKind, Song, SongHistory, SongSimilarity, Wishlist
+
+
+@instrument_repository
+class SimilarityRepository:
+    """Song Similarity Repository class"""
+
+    # Weight of a user-song interaction, a song in the wishlist counts as three views
+    VIEW_WEIGHT = 1.0
+    LIKE_WEIGHT = 2.0
+    WISHLIST_WEIGHT = 3.0
+
+    def __init__(self, database: DefaultDatabase):
+        self.db = database
+
+    async def get_interactions(self, since: datetime) -> List[Tuple[str, int, float]]:
+        """Summed interaction weight of every user-song pair, aggregated by the database."""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            wishlist = select(
+                Wishlist.user_id.label("user_id"),
+                Wishlist.song_id.label("song_id"),
+                literal(self.WISHLIST_WEIGHT).label("weight"),
+            )
+            action_weight = case(
+                (SongHistory.action == HistoryAction.like, self.LIKE_WEIGHT),
+                else_=self.VIEW_WEIGHT,
+            )
+            history = (
+                select(
+                    SongHistory.user_id.label("user_id"),
+                    SongHistory.song_id.label("song_id"),
+                    # Compacted rows stand for count actions
+                    (action_weight * SongHistory.count).label("weight"),
+                )
+                .where(
+                    SongHistory.viewed_at >= since,
+                    SongHistory.song_id.is_not(None),
+                    SongHistory.action.in_([HistoryAction.view, HistoryAction.like]),
+                )
+            )
+            events = union_all(wishlist, history).subquery()
+            stmt = select(events.c.user_id, events.c.song_id, func.sum(events.c.weight)).group_by(
+                events.c.user_id,
+                events.c.song_id,
+            )
+            result = await session.execute(stmt)
+            return [(user_id, song_id, float(weight)) for user_id, song_id, weight in result.all()]
+
+    async def get_content_features(
+        self,
+        song_ids: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[int, Optional[str], str, str, List[int]]]:
+        """(song_id, lyrics, type, tempo, genre_ids) of the given songs, of all songs by default."""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            songs_stmt = select(Song.id, Song.lyrics, Song.type, Song.tempo).order_by(Song.id)
+            genres_stmt = select(GenreToSong.song_id, GenreToSong.genre_id)
+            if song_ids is not None:
+                songs_stmt = songs_stmt.where(Song.id.in_(song_ids))
+                genres_stmt = genres_stmt.where(GenreToSong.song_id.in_(song_ids))
+
+            genres: Dict[int, List[int]] = {}
+            for song_id, genre_id in (await session.execute(genres_stmt)).all():
+                genres.setdefault(song_id, []).append(genre_id)
+
+            result = await session.execute(songs_stmt)
+            return [
+                (song_id, lyrics, song_type.value, tempo.value, genres.get(song_id, []))
+                for song_id, lyrics, song_type, tempo in result.all()
+            ]
+
+    async def get_all(self, kind: SimilarityKind) -> Dict[int, List[int]]:
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            stmt = (
+                select(SongSimilarity.song_id, SongSimilarity.similar_song_id)
+                .where(SongSimilarity.kind == kind)
+                .order_by(SongSimilarity.song_id, SongSimilarity.rank)
+            )
+            result = await session.execute(stmt)
+            similar: Dict[int, List[int]] = {}
+            for song_id, similar_song_id in result.all():
+                similar.setdefault(song_id, []).append(similar_song_id)
+            return similar
+
+    async def replace(
+        self,
+        kind: SimilarityKind,
+        rows: Sequence[Tuple[int, int, float, int]],
+        song_ids: Optional[Sequence[int]] = None,
+    ) -> None:
+        """Swap the neighbours of the given songs (of all songs by default) in one transaction,
+        so readers never see the table half-filled."""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            try:
+                stmt = delete(SongSimilarity).where(SongSimilarity.kind == kind)
+                if song_ids is not None:
+                    stmt = stmt.where(SongSimilarity.song_id.in_(song_ids))
+                await session.execute(stmt)
+                if rows:
+                    await session.execute(
+                        insert(SongSimilarity),
+                        [
+                            {
+                                "song_id": song_id,
+                                "kind": kind,
+                                "similar_song_id": similar_id,
+                                "score": score,
+                                "rank": rank,
+                            }
+                            for song_id, similar_id, score, rank in rows
+                        ],
+                    )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
+
+
+__all__ = ["SimilarityRepository"]
@@ -1,14 +1,31 @@
 from typing import List, Optional
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, insert, literal, select, SmallInteger, String
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import joinedload
 
 from database import DefaultDatabase
-from models import FileType, Genre, GenreToSong, Song, SongTempo, SongType, User
-
-
+from metrics import instrument_repository
+from models import (
+    FileType,
+    Genre,
+    GenreToSong,
+    HistoryAction,
+    Song,
+    SongHistory,
+    SongStats,
+    SongTempo,
+    SongType,
+    Wishlist,
+)
+
+
+# Ranking of the "popular first" catalog: likes weigh more than views, removals from the wishlist count against
+POPULARITY = SongStats.views + 5 * SongStats.likes - 2 * SongStats.removes
+
+
+@instrument_repository
 class SongRepository:
     """Song Repository class"""
 
@@ -81,7 +98,7 @@ class SongRepository:
                 raise e
 
     async def get_one(self, id: int) -> Optional[Song]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             stmt = select(Song).where(Song.id == id).options(joinedload(Song.genres))
 
@@ -92,7 +109,7 @@ class SongRepository:
             return song
 
     async def get_by_title(self, title: str) -> Song:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             stmt = select(Song).where(Song.title == title).options(joinedload(Song.genres))
 
@@ -103,7 +120,7 @@ class SongRepository:
             return song
 
     async def get_all(self) -> List[Song]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             result = await session.execute(select(Song).order_by(Song.id))
             return list(result.scalars().all())
@@ -113,8 +130,9 @@ class SongRepository:
         type: Optional[SongType],
         tempo: Optional[SongTempo],
         genre_ids: List[int],
+        popular_first: bool = False,
     ) -> List[Song]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             stmt = select(Song)
             if type is not None:
@@ -123,20 +141,14 @@ class SongRepository:
                 stmt = stmt.where(Song.tempo == tempo)
             if genre_ids:
                 stmt = stmt.join(GenreToSong).where(GenreToSong.genre_id.in_(genre_ids))
+            if popular_first:
+                stmt = stmt.outerjoin(SongStats, SongStats.song_id == Song.id).order_by(
+                    func.coalesce(POPULARITY, 0).desc(),
+                    Song.id,
+                )
             result = await session.execute(stmt)
             return list(result.scalars().all())
 
-    async def get_customers(self, id: int) -> List[User]:
-        async with self.db.get_session() as session:
-            session: AsyncSession
-            stmt = select(Song).options(selectinload(Song.customers)).filter(Song.id == id)
-            result = await session.execute(stmt)
-            song: Optional[Song] = result.scalars().first()
-
-            if not song:
-                raise NoResultFound(f"Song with id={id} does not exist")
-            return song.customers
-
     async def update(
         self,
         id: int,
@@ -169,15 +181,37 @@ class SongRepository:
             return song
 
     async def delete(self, id: int) -> None:
+        """Delete a song, logging a delete action for everyone who had it in the wishlist.
+
+        The whole fan-out is one set-based statement in the transaction of the delete, so it
+        takes the same few round trips however many customers the song has.
+        """
         async with self.db.get_session() as session:
             session: AsyncSession
-            song = await session.get(Song, id)
-            if not song:
+            title = await session.scalar(select(Song.title).where(Song.id == id))
+            if title is None:
                 raise NoResultFound(f"Song with id={id} does not exist")
-            await session.delete(song)
-            await session.commit()
+            try:
+                # The delete rows keep the title once song_id is set to NULL by the foreign key; the older
+                # rows of the song are left alone, rewriting them would cost as much as its whole history
+                customers = select(
+                    Wishlist.user_id,
+                    Wishlist.song_id,
+                    literal(title, String),
+                    literal(int(HistoryAction.delete), SmallInteger),
+                ).where(Wishlist.song_id == id)
+                await session.execute(
+                    insert(SongHistory).from_select(["user_id", "song_id", "song_title", "action"], customers),
+                )
+                # Wishlist, genres and stats rows go with the song through ON DELETE CASCADE
+                await session.execute(delete(Song).where(Song.id == id))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
 
 
+@instrument_repository
 class GenreRepository:
     """Genre Repository class"""
 
@@ -197,7 +231,7 @@ class GenreRepository:
                 raise
 
     async def get_one(self, id: int) -> Genre:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             genre = await session.get(Genre, id)
             if not genre:
@@ -205,7 +239,7 @@ class GenreRepository:
             return genre
 
     async def get_by_title(self, title: str) -> Genre:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             stmt = select(Genre).filter(Genre.title == title)
             genre = (await session.execute(stmt)).scalar_one_or_none()
@@ -214,13 +248,13 @@ class GenreRepository:
             return genre
 
     async def get_all(self) -> List[Genre]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             result = await session.execute(select(Genre).order_by(Genre.id))
             return list(result.scalars().all())
 
     async def get_by_type_and_tempo(self, song_type: SongType, tempo: SongTempo) -> List[Genre]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(readonly=True) as session:
             session: AsyncSession
             stmt = (
                 select(Genre)
@@ -0,0 +1,108 @@
+from datetime import date, datetime
+from typing import List, Tuple
+
+from sqlalchemy import cast, Date, Float, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DefaultDatabase
+from metrics import instrument_repository
+from models import Genre, GenreToSong, Song, SongHistory, SongStats, SongTempo, Wishlist
+
+
+@instrument_repository
+class StatsRepository:
+    """Statistics Repository class
+
+    Every method is a single aggregate computed by the database, mostly over the song_stats rollup.
+    """
+
+    def __init__(self, database: DefaultDatabase):
+        self.db = database
+
+    async def get_active_users(self, since: datetime) -> List[Tuple[date, int]]:
+        """Distinct users with any action per day, oldest day first"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            day = cast(SongHistory.viewed_at, Date)
+            stmt = (
+                select(day, func.count(SongHistory.user_id.distinct()))
+                .where(SongHistory.viewed_at >= since)
+                .group_by(day)
+                .order_by(day)
+            )
+            result = await session.execute(stmt)
+            return [(row_day, count) for row_day, count in result.all()]
+
+    async def get_top_songs(self, limit: int, by_likes: bool = False) -> List[Tuple[str, int, int]]:
+        """(title, views, likes) of the most viewed or the most liked songs"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            order = SongStats.likes if by_likes else SongStats.views
+            stmt = (
+                select(Song.title, SongStats.views, SongStats.likes)
+                .join(SongStats, SongStats.song_id == Song.id)
+                .where(order > 0)
+                .order_by(order.desc(), Song.id)
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return [(title, views, likes) for title, views, likes in result.all()]
+
+    async def get_wishlist_conversion(self, limit: int, min_views: int) -> List[Tuple[str, int, int, float]]:
+        """(title, views, wishlisted, ratio) of the songs most often added to wishlists per view"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            wishlisted = (
+                select(Wishlist.song_id, func.count().label("users")).group_by(Wishlist.song_id).subquery()
+            )
+            ratio = cast(wishlisted.c.users, Float) / SongStats.views
+            stmt = (
+                select(Song.title, SongStats.views, wishlisted.c.users, ratio)
+                .join(SongStats, SongStats.song_id == Song.id)
+                .join(wishlisted, wishlisted.c.song_id == Song.id)
+                .where(SongStats.views >= min_views)
+                .order_by(ratio.desc(), Song.id)
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return [(title, views, users, float(value)) for title, views, users, value in result.all()]
+
+    async def get_totals(self) -> Tuple[int, int]:
+        """Total views and total wishlist entries"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            views = await session.scalar(select(func.coalesce(func.sum(SongStats.views), 0)))
+            wishlisted = await session.scalar(select(func.count()).select_from(Wishlist))
+            return int(views or 0), int(wishlisted or 0)
+
+    async def get_genre_demand(self) -> List[Tuple[str, int, int]]:
+        """(genre, views, likes) summed over the songs of every genre, most viewed first"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            views = func.sum(SongStats.views)
+            stmt = (
+                select(Genre.title, views, func.sum(SongStats.likes))
+                .join(GenreToSong, GenreToSong.genre_id == Genre.id)
+                .join(SongStats, SongStats.song_id == GenreToSong.song_id)
+                .group_by(Genre.id, Genre.title)
+                .order_by(views.desc())
+            )
+            result = await session.execute(stmt)
+            return [(title, int(views), int(likes)) for title, views, likes in result.all()]
+
+    async def get_tempo_demand(self) -> List[Tuple[SongTempo, int, int]]:
+        """(tempo, views, likes) summed over the songs of every tempo, most viewed first"""
+        async with self.db.get_session(readonly=True) as session:
+            session: AsyncSession
+            views = func.sum(SongStats.views)
+            stmt = (
+                select(Song.tempo, views, func.sum(SongStats.likes))
+                .join(SongStats, SongStats.song_id == Song.id)
+                .group_by(Song.tempo)
+                .order_by(views.desc())
+            )
+            result = await session.execute(stmt)
+            return [(tempo, int(views), int(likes)) for tempo, views, likes in result.all()]
+
+
+__all__ = ["StatsRepository"]
@@ -1,14 +1,22 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_, update
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from database import DefaultDatabase
-from models import Song, SongHistory, User
+from metrics import instrument_repository
+from models import User
 
+# Sort and search key of the user picker, matches ix_users_username_search
+SEARCH_KEY = func.lower(User.username).collate("C")
 
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@instrument_repository
 class UserRepository:
     """User Repository class"""
 
@@ -104,29 +112,73 @@ class UserRepository:
                 await session.rollback()
                 raise e
 
-    async def get_wishlist(self, user_id: str) -> List[Song]:
+    def _search_filter(self, prefix: str) -> list:
+        conditions = [User.is_staff.is_not(True)]
+        if prefix:
+            conditions.append(SEARCH_KEY.like(_escape_like(prefix.lower()) + "%", escape="\\"))
+        return conditions
+
+    async def search(
+        self,
+        prefix: str = "",
+        after: Optional[Tuple[str, str]] = None,
+        limit: int = 10,
+    ) -> List[User]:
+        """Non-staff users whose username starts with the prefix, ordered by username.
+
+        Args:
+            prefix (str): Case-insensitive username prefix, empty for all users
+            after (Optional[Tuple[str, str]]): Keyset cursor, the (username, id) of the last user
+                of the previous page
+            limit (int): Page size
+
+        Returns:
+            List[User]: Users of the page
+        """
         async with self.db.get_session() as session:
             session: AsyncSession
-
-            stmt = select(User).options(selectinload(User.wishlist)).filter(User.id == user_id)
+            stmt = select(User).where(*self._search_filter(prefix))
+            if after is not None:
+                username, user_id = after
+                # Lowercased by the database, so the cursor compares exactly like the sort key
+                stmt = stmt.where(tuple_(SEARCH_KEY, User.id) > tuple_(func.lower(username).collate("C"), user_id))
+            stmt = stmt.order_by(SEARCH_KEY, User.id).limit(limit)
             result = await session.execute(stmt)
-            user: Optional[User] = result.scalars().first()
-
-            if not user:
-                raise NoResultFound(f"User with id={user_id} does not exist")
-            return user.wishlist
+            return list(result.scalars().all())
 
-    async def get_history(self, user_id: str) -> List[SongHistory]:
+    async def count_search(self, prefix: str = "") -> int:
         async with self.db.get_session() as session:
             session: AsyncSession
+            stmt = select(func.count()).select_from(User).where(*self._search_filter(prefix))
+            return await session.scalar(stmt) or 0
 
-            stmt = select(User).options(selectinload(User.view_history)).filter(User.id == user_id)
+    async def get_recipient_ids(self, after: Optional[str] = None, limit: int = 500) -> List[str]:
+        """Ids of the users who did not block the bot, in id order starting after the given one"""
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            stmt = select(User.id).where(User.blocked_at.is_(None))
+            if after is not None:
+                stmt = stmt.where(User.id > after)
+            stmt = stmt.order_by(User.id).limit(limit)
             result = await session.execute(stmt)
-            user: Optional[User] = result.scalars().first()
+            return list(result.scalars().all())
 
-            if not user:
-                raise NoResultFound(f"User with id={user_id} does not exist")
-            return user.view_history
+    async def count_recipients(self) -> int:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            stmt = select(func.count()).select_from(User).where(User.blocked_at.is_(None))
+            return await session.scalar(stmt) or 0
+
+    async def set_blocked(self, ids: List[str], blocked: bool = True) -> None:
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            try:
+                stmt = update(User).where(User.id.in_(ids)).values(blocked_at=func.now() if blocked else None)
+                await session.execute(stmt)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
 
 
 __all__ = ["UserRepository"]
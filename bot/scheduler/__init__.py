@@ -0,0 +1,5 @@
+from scheduler.scheduler import Job, Scheduler, SchedulerConfig
+from scheduler.triggers import Cron, Interval, Trigger
+
+
+__all__ = ["Scheduler", "SchedulerConfig", "Job", "Cron", "Interval", "Trigger"]
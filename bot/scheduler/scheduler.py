@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger
+import random
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+import uuid
+
+from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+
+from metrics import JOB_DURATION, JOB_RUNS_TOTAL
+from scheduler.triggers import Trigger
+
+
+@dataclass
+class SchedulerConfig:
+    # Seconds a claimed run stays claimed; must exceed the clock skew between the instances
+    claim_ttl: int = 3600
+    # Default limit of one run, seconds; None lets a run take as long as it needs
+    timeout: Optional[float] = 1800
+    # Cron expression of the sweep of abandoned FSM records
+    fsm_sweep: str = "15 4 * * *"
+    # FSM records untouched for this many seconds are removed by the sweep
+    fsm_max_idle: int = 2592000
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    trigger: Trigger
+    # Seconds of random delay added to every run, spreads the load of jobs sharing a schedule
+    jitter: float = 0
+    timeout: Optional[float] = None
+    # Run on one instance only; local jobs (e.g. reloading an in-memory cache) run everywhere
+    exclusive: bool = True
+
+
+class Scheduler:
+    """Scheduler class
+
+    Runs coroutines on interval or cron triggers inside the bot process. Every job gets its own
+    task, so a slow job never delays the others, and a run that fails or exceeds its timeout is
+    logged and the job goes on with its next run.
+
+    With several instances, an exclusive job runs once per scheduled time: every instance computes
+    the same run time from the trigger and the first one to claim it in Redis with SET NX runs it.
+    Without a Redis client every job runs locally.
+    """
+
+    KEY_PREFIX = "{scheduler}"
+
+    def __init__(self, redis: Optional[Union[Redis, RedisCluster]], config: SchedulerConfig, logger: Logger):
+        self.redis = redis
+        self.config = config
+        self.log = logger
+        self.instance = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        trigger: Trigger,
+        jitter: float = 0,
+        timeout: Optional[float] = None,
+        exclusive: bool = True,
+    ) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job {name} is already scheduled")
+        job = Job(name, func, trigger, jitter, timeout or self.config.timeout, exclusive)
+        self.jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+        self.log.info("Scheduler started %d jobs on %s", len(self._tasks), self.instance)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _loop(self, job: Job) -> None:
+        scheduled = datetime.now()
+        while True:
+            # The timer may fire a little early, the next run still has to be a new one
+            scheduled = job.trigger.next_run(max(datetime.now(), scheduled))
+            delay = (scheduled - datetime.now()).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(0.0, delay))
+            await self.run(job, scheduled)
+
+    async def run(self, job: Job, scheduled: Optional[datetime] = None) -> None:
+        """Run a job once, unless another instance already claimed this run."""
+        if job.exclusive and not await self._claim(job, scheduled or datetime.now()):
+            JOB_RUNS_TOTAL.labels(job=job.name, outcome="skipped").inc()
+            return
+
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            await asyncio.wait_for(job.func(), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            self.log.error("Scheduler: job %s timed out after %s s" % (job.name, job.timeout))
+        except Exception as e:
+            outcome = "error"
+            self.log.error("Scheduler: job %s: %s" % (job.name, e))
+        duration = time.perf_counter() - started
+        JOB_DURATION.labels(job=job.name).observe(duration)
+        JOB_RUNS_TOTAL.labels(job=job.name, outcome=outcome).inc()
+        self.log.debug("Job %s finished in %.3f s: %s", job.name, duration, outcome)
+
+    async def _claim(self, job: Job, scheduled: datetime) -> bool:
+        if self.redis is None:
+            return True
+
+        key = f"{self.KEY_PREFIX}:{job.name}:{int(scheduled.timestamp())}"
+        try:
+            return bool(await self.redis.set(key, self.instance, nx=True, ex=self.config.claim_ttl))
+        except Exception as e:
+            # Running twice is safer than not running at all
+            self.log.error("Scheduler: claim of %s failed: %s" % (job.name, e))
+            return True
+
+
+__all__ = ["Job", "Scheduler", "SchedulerConfig"]
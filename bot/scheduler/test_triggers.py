@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from scheduler.triggers import Cron, Interval
+
+
+def test_interval_is_aligned_to_the_epoch():
+    trigger = Interval(seconds=3600)
+    after = datetime(2024, 5, 1, 10, 17, 42, tzinfo=timezone.utc)
+    assert trigger.next_run(after) == datetime(2024, 5, 1, 11, 0, tzinfo=timezone.utc)
+
+
+def test_interval_is_strictly_after():
+    trigger = Interval(seconds=60)
+    after = datetime(2024, 5, 1, 10, 17, tzinfo=timezone.utc)
+    assert trigger.next_run(after) == datetime(2024, 5, 1, 10, 18, tzinfo=timezone.utc)
+
+
+def test_interval_offset():
+    trigger = Interval(seconds=3600, offset=300)
+    hour = datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert trigger.next_run(hour.replace(minute=2)) == hour.replace(minute=5)
+    assert trigger.next_run(hour.replace(minute=5)) == hour.replace(hour=11, minute=5)
+
+
+@pytest.mark.parametrize(
+    "expression, after, expected",
+    [
+        ("*/15 * * * *", datetime(2024, 5, 1, 10, 7), datetime(2024, 5, 1, 10, 15)),
+        ("30 3 * * *", datetime(2024, 5, 1, 10, 0), datetime(2024, 5, 2, 3, 30)),
+        ("0 9-17/4 * * *", datetime(2024, 5, 1, 14, 0), datetime(2024, 5, 1, 17, 0)),
+        ("0 0 1 * *", datetime(2024, 12, 15), datetime(2025, 1, 1)),
+        ("0 0 29 2 *", datetime(2023, 3, 1), datetime(2024, 2, 29)),
+        # 2024-05-01 is a Wednesday; both 0 and 7 are Sunday
+        ("0 12 * * 0", datetime(2024, 5, 1), datetime(2024, 5, 5, 12, 0)),
+        ("0 12 * * 7", datetime(2024, 5, 1), datetime(2024, 5, 5, 12, 0)),
+        ("0 12 * * 1,5", datetime(2024, 5, 1), datetime(2024, 5, 3, 12, 0)),
+    ],
+)
+def test_cron_next_run(expression, after, expected):
+    assert Cron(expression).next_run(after) == expected
+
+
+def test_cron_restricted_days_match_either_field():
+    # The 10th of the month or any Monday, whichever comes first
+    trigger = Cron("0 0 10 * 1")
+    assert trigger.next_run(datetime(2024, 5, 1)) == datetime(2024, 5, 6)
+    assert trigger.next_run(datetime(2024, 5, 7)) == datetime(2024, 5, 10)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 24 * * *", "5-1 * * * *", "* * * 13 *"])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        Cron(expression)
+
+
+def test_cron_that_never_matches():
+    with pytest.raises(ValueError):
+        Cron("0 0 31 2 *").next_run(datetime(2024, 1, 1))
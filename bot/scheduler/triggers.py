@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import math
+from typing import List, Protocol, Set
+
+
+class Trigger(Protocol):
+    def next_run(self, after: datetime) -> datetime:
+        """First run time strictly after the given moment"""
+        ...
+
+
+@dataclass(frozen=True)
+class Interval:
+    """Every ``seconds`` seconds, aligned to the Unix epoch and shifted by ``offset`` seconds.
+
+    Aligned run times are the same on every instance, which lets the instances agree on who runs them.
+    """
+
+    seconds: float
+    offset: float = 0
+
+    def next_run(self, after: datetime) -> datetime:
+        timestamp = after.timestamp() - self.offset
+        slot = math.floor(timestamp / self.seconds + 1) * self.seconds + self.offset
+        return datetime.fromtimestamp(slot, tz=after.tzinfo)
+
+
+class Cron:
+    """Five-field cron expression: minute, hour, day of month, month, day of week (0 or 7 is Sunday).
+
+    Fields accept ``*``, numbers, ranges ``a-b``, steps ``*/n`` or ``a-b/n`` and comma-separated lists.
+    As in cron, a day matches if either day field matches when both are restricted.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *bounds) for field, bounds in zip(fields, self.RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def __repr__(self) -> str:
+        return f"Cron({self.expression!r})"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        # datetime counts from Monday = 0, cron from Sunday = 0
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_run(self, after: datetime) -> datetime:
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Every step skips at least one non-matching unit, so a few years of search is plenty
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values: List[int] = []
+    for part in field.split(","):
+        span, _, step = part.partition("/")
+        if span == "*":
+            start, end = low, high
+        elif "-" in span:
+            start, end = (int(value) for value in span.split("-", 1))
+        else:
+            start = end = int(span)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field {field!r} is out of range {low}-{high}")
+        values.extend(range(start, end + 1, int(step) if step else 1))
+    return set(values)
+
+
+__all__ = ["Cron", "Interval", "Trigger"]
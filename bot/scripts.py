@@ -1,5 +1,6 @@
 import asyncio
 
+from benchmarks.dataset import DatasetSize, generate
 from config import Config, load_config
 from database import PostgresDatabase
 from logger import get_logger
@@ -31,11 +32,36 @@ async def make_user_admin(username: str, make_admin: bool = True) -> None:
         )
 
 
+async def seed_database(rows: int, seed: int) -> None:
+    config: Config = load_config()
+    logger = get_logger("main", config.logger)
+
+    db = PostgresDatabase(config=config.postgres)
+    size = DatasetSize.for_rows(rows)
+    logger.info(f"Generating {size.users} users, {size.songs} songs and {size.history} history rows (seed {seed})...")
+    try:
+        await db.init_db()
+        await generate(db.engine, size, seed=seed, logger=logger)
+        logger.info("Synthetic data generated.")
+    except RuntimeError as e:
+        logger.error(str(e))
+    finally:
+        await db.close()
+
+
 if __name__ == "__main__":
-    choice = input("Choose action:\n1. Make user admin\n2. Revoke admin rights\n\nEnter choice (1/2): ")
-    username = input("Enter username: ")
+    choice = input(
+        "Choose action:\n1. Make user admin\n2. Revoke admin rights\n3. Generate synthetic data\n\n"
+        "Enter choice (1/2/3): ",
+    )
 
-    asyncio.run(make_user_admin(username, choice == "1"))
+    if choice == "3":
+        rows = int(input("Enter number of history rows [1000000]: ") or 1_000_000)
+        seed = int(input("Enter seed [42]: ") or 42)
+        asyncio.run(seed_database(rows, seed))
+    else:
+        username = input("Enter username: ")
+        asyncio.run(make_user_admin(username, choice == "1"))
 
 
 __all__ = []
@@ -1,5 +1,29 @@
+from service.broadcast import BroadcastConfig, BroadcastService
+from service.recommendation import RecommendationConfig, RecommendationService
+from service.retention import HistoryRetentionService, RetentionConfig
 from service.song import GenreService, SongService
-from service.user import UserService
+from service.stats import Dashboard, StatsConfig, StatsService
+from service.trending import TrendingConfig, TrendingService
+from service.user import HistoryConfig, UserService
+from service.wishlist import WishlistCache, WishlistCacheConfig
 
 
-__all__ = ["UserService", "SongService", "GenreService"]
+__all__ = [
+    "UserService",
+    "SongService",
+    "GenreService",
+    "RecommendationService",
+    "RecommendationConfig",
+    "TrendingService",
+    "TrendingConfig",
+    "StatsService",
+    "StatsConfig",
+    "Dashboard",
+    "HistoryRetentionService",
+    "RetentionConfig",
+    "HistoryConfig",
+    "WishlistCache",
+    "WishlistCacheConfig",
+    "BroadcastService",
+    "BroadcastConfig",
+]
@@ -0,0 +1,317 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import asdict, dataclass, fields
+from enum import Enum
+import json
+from logging import Logger
+from typing import Any, Dict, List, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError
+
+from service.user import UserService
+
+
+@dataclass
+class BroadcastConfig:
+    # Messages sent per second; Telegram allows about 30 per second to different chats
+    rate: int = 25
+    # Recipients read from the database at once
+    batch_size: int = 500
+    # Seconds between two updates of the progress message
+    progress_interval: int = 5
+    # Attempts per recipient when Telegram asks to retry later
+    attempts: int = 3
+    # Seconds the instance sending a broadcast keeps its claim without renewing it;
+    # another instance resumes the broadcast after that
+    lock_ttl: int = 60
+    # Seconds between two checks for a broadcast started or left by another instance
+    poll_interval: int = 10
+    # Seconds to wait before resuming a broadcast interrupted by an error
+    retry_delay: int = 30
+
+
+class BroadcastStatus(str, Enum):
+    running = "running"
+    done = "done"
+    cancelled = "cancelled"
+
+
+@dataclass
+class BroadcastJob:
+    # The message to copy to every user
+    from_chat_id: int
+    message_id: int
+    # The message that shows the progress
+    report_chat_id: int
+    report_message_id: int
+    total: int
+    # Id of the last user the message was sent to; users are processed in id order
+    cursor: Optional[str] = None
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    status: BroadcastStatus = BroadcastStatus.running
+    # Set by stop() on any instance; the instance sending the broadcast cancels it before the next chunk
+    stop_requested: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+
+class _Result(Enum):
+    sent = "sent"
+    failed = "failed"
+    blocked = "blocked"
+
+
+class BroadcastService:
+    """Broadcast Service class
+
+    Copies an admin's message to every user. Only one broadcast runs at a time; its state is kept
+    in a Redis hash and saved after every second's worth of messages, so a broadcast interrupted by
+    a restart or an error resumes from the last saved user (the messages of that second may be sent
+    twice). With several instances the one that claims the broadcast with a lock sends it and renews
+    the lock after every chunk; the others take over if it stops renewing. Users who blocked the bot
+    are marked in the database and skipped by the following broadcasts.
+
+    Without a Redis client (e.g. with the in-memory FSM storage) the state lives in memory and
+    does not survive a restart.
+    """
+
+    KEY = "{broadcast}:state"
+    LOCK_KEY = "{broadcast}:lock"
+
+    def __init__(
+        self,
+        redis: Optional[Union[Redis, RedisCluster]],
+        user_service: UserService,
+        config: BroadcastConfig,
+        logger: Logger,
+    ):
+        self.redis = redis
+        self.user_service = user_service
+        self.config = config
+        self.log = logger
+        self._job: Optional[BroadcastJob] = None
+        self._wakeup = asyncio.Event()
+
+    async def get_job(self) -> Optional[BroadcastJob]:
+        if self.redis is None:
+            return self._job
+        try:
+            raw = await self.redis.hgetall(self.KEY)
+        except Exception as e:
+            self.log.error("BroadcastService.get_job: %s" % e)
+            return None
+        if not raw:
+            return None
+        return _decode(raw)
+
+    async def _save(self, job: BroadcastJob) -> None:
+        """Save the progress; the stop flag is left alone, it belongs to stop()"""
+        self._job = job
+        if self.redis is None:
+            return
+        mapping = _encode(job)
+        del mapping["stop_requested"]
+        try:
+            await self.redis.hset(self.KEY, mapping=mapping)
+        except Exception as e:
+            self.log.error("BroadcastService._save: %s" % e)
+
+    async def start(self, from_chat_id: int, message_id: int, report_chat_id: int, report_message_id: int) -> bool:
+        """Queue a broadcast; False if another one is still running"""
+        job = await self.get_job()
+        if job is not None and job.status == BroadcastStatus.running:
+            return False
+
+        job = BroadcastJob(
+            from_chat_id=from_chat_id,
+            message_id=message_id,
+            report_chat_id=report_chat_id,
+            report_message_id=report_message_id,
+            total=await self.user_service.count_recipients(),
+        )
+        self._job = job
+        if self.redis is not None:
+            # The whole record is replaced, so the stop flag of the previous broadcast goes too
+            async with self.redis.pipeline(transaction=not isinstance(self.redis, RedisCluster)) as pipe:
+                await pipe.delete(self.KEY).hset(self.KEY, mapping=_encode(job)).execute()
+        self._wakeup.set()
+        return True
+
+    async def stop(self) -> None:
+        """Ask the instance sending the broadcast to cancel it after the messages in flight"""
+        job = await self.get_job()
+        if job is None or job.status != BroadcastStatus.running:
+            return
+        job.stop_requested = True
+        if self.redis is None:
+            return
+        try:
+            await self.redis.hset(self.KEY, "stop_requested", json.dumps(True))
+        except Exception as e:
+            self.log.error("BroadcastService.stop: %s" % e)
+
+    async def run(self, bot: Bot) -> None:
+        """Process broadcasts forever; one left running by a stopped or failed instance is resumed."""
+        while True:
+            self._wakeup.clear()
+            delay = self.config.poll_interval
+            try:
+                await self.resume(bot)
+            except Exception as e:
+                self.log.error("BroadcastService.run: %s" % e)
+                delay = self.config.retry_delay
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+
+    async def resume(self, bot: Bot) -> None:
+        """Send the running broadcast unless another instance holds its lock"""
+        job = await self.get_job()
+        if job is None or job.status != BroadcastStatus.running:
+            return
+        if self.redis is None:
+            await self._process(bot, job, None)
+            return
+
+        lock = self.redis.lock(self.LOCK_KEY, timeout=self.config.lock_ttl)
+        if not await lock.acquire(blocking=False):
+            return
+        try:
+            # The previous holder may have moved the broadcast on before releasing the lock
+            job = await self.get_job()
+            if job is not None and job.status == BroadcastStatus.running:
+                await self._process(bot, job, lock)
+        finally:
+            # An expired lock is not ours to release any more
+            with suppress(LockError):
+                await lock.release()
+
+    async def _stop_requested(self, job: BroadcastJob) -> bool:
+        if self.redis is None:
+            return job.stop_requested
+        raw = await self.redis.hget(self.KEY, "stop_requested")
+        return raw is not None and json.loads(raw)
+
+    async def _process(self, bot: Bot, job: BroadcastJob, lock: Optional[Lock]) -> None:
+        self.log.info("Broadcast of message %s started at user %s", job.message_id, job.cursor)
+        loop = asyncio.get_running_loop()
+        reported_at = loop.time()
+
+        while job.status == BroadcastStatus.running:
+            user_ids = await self.user_service.get_recipient_ids(after=job.cursor, limit=self.config.batch_size)
+            if user_ids is None:
+                # The job stays running at its cursor; run() resumes it after the retry delay
+                raise RuntimeError("recipients of broadcast %s could not be read" % job.message_id)
+            if not user_ids:
+                job.status = BroadcastStatus.done
+                break
+
+            for start in range(0, len(user_ids), self.config.rate):
+                if await self._stop_requested(job):
+                    job.status = BroadcastStatus.cancelled
+                    break
+
+                # One chunk per second keeps the bot under the global limit
+                second_started = loop.time()
+                end = start + self.config.rate
+                chunk = user_ids[start:end]
+                results = await asyncio.gather(*(self._send(bot, job, user_id) for user_id in chunk))
+                await self._count(job, chunk, results)
+                job.cursor = chunk[-1]
+                await self._save(job)
+                if lock is not None:
+                    # Raises if the lock expired meanwhile and another instance may have taken over
+                    await lock.reacquire()
+
+                if loop.time() - reported_at >= self.config.progress_interval:
+                    await self.report(bot, job)
+                    reported_at = loop.time()
+                await asyncio.sleep(max(0.0, 1 - (loop.time() - second_started)))
+
+        await self._save(job)
+        await self.report(bot, job)
+        self.log.info(
+            "Broadcast of message %s %s: %s sent, %s failed, %s blocked",
+            job.message_id,
+            job.status.value,
+            job.sent,
+            job.failed,
+            job.blocked,
+        )
+
+    async def _send(self, bot: Bot, job: BroadcastJob, user_id: str) -> _Result:
+        for _ in range(self.config.attempts):
+            try:
+                await bot.copy_message(chat_id=user_id, from_chat_id=job.from_chat_id, message_id=job.message_id)
+                return _Result.sent
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError:
+                return _Result.blocked
+            except Exception as e:
+                self.log.warning("Broadcast to %s failed: %s", user_id, e)
+                return _Result.failed
+        return _Result.failed
+
+    async def _count(self, job: BroadcastJob, user_ids: List[str], results: List[_Result]) -> None:
+        blocked = [user_id for user_id, result in zip(user_ids, results) if result == _Result.blocked]
+        job.sent += results.count(_Result.sent)
+        job.failed += results.count(_Result.failed)
+        job.blocked += len(blocked)
+        if blocked:
+            await self.user_service.set_blocked(blocked)
+
+    async def report(self, bot: Bot, job: BroadcastJob) -> None:
+        """Update the progress message in place"""
+        keyboard = None
+        if job.status == BroadcastStatus.running:
+            keyboard = InlineKeyboardMarkup(
+                inline_keyboard=[[InlineKeyboardButton(text="⏹ Остановить", callback_data="broadcast:stop")]],
+            )
+        # Not modified and deleted messages are fine, the next report will try again
+        with suppress(TelegramBadRequest):
+            await bot.edit_message_text(
+                format_progress(job),
+                chat_id=job.report_chat_id,
+                message_id=job.report_message_id,
+                reply_markup=keyboard,
+            )
+
+
+def _encode(job: BroadcastJob) -> Dict[str, str]:
+    return {name: json.dumps(value) for name, value in asdict(job).items()}
+
+
+def _decode(raw: Dict[Any, Any]) -> BroadcastJob:
+    data = {(name.decode() if isinstance(name, bytes) else name): json.loads(value) for name, value in raw.items()}
+    # Fields unknown to this version are dropped
+    data = {field.name: data[field.name] for field in fields(BroadcastJob) if field.name in data}
+    data["status"] = BroadcastStatus(data["status"])
+    return BroadcastJob(**data)
+
+
+def format_progress(job: BroadcastJob) -> str:
+    titles = {
+        BroadcastStatus.running: "📣 <b>Идёт рассылка</b>",
+        BroadcastStatus.done: "✅ <b>Рассылка завершена</b>",
+        BroadcastStatus.cancelled: "⏹ <b>Рассылка остановлена</b>",
+    }
+    return (
+        f"{titles[job.status]}\n\n"
+        f"Обработано: {job.processed} из {max(job.total, job.processed)}\n"
+        f"📬 Доставлено: {job.sent}\n"
+        f"🚫 Заблокировали бота: {job.blocked}\n"
+        f"⚠️ Ошибок: {job.failed}"
+    )
+
+
+__all__ = ["BroadcastConfig", "BroadcastJob", "BroadcastService", "BroadcastStatus", "format_progress"]
@@ -0,0 +1,206 @@
+from dataclasses import dataclass, field
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from models import SongTempo, SongType
+
+_WORD = re.compile(r"[а-яa-z]+")
+
+STOPWORDS = frozenset(
+    (
+        "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было "
+        "вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас "
+        "нибудь опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их "
+        "чем была сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой "
+        "совсем ним здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при "
+        "наконец два об другой хоть после над больше тот через эти нас про всего них какая много разве три "
+        "эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда конечно "
+        "всю между припев куплет"
+    ).split(),
+)
+
+# Inflection endings, longest first; enough to merge the common word forms in song lyrics
+ENDINGS = sorted(
+    (
+        "ившись ывшись вшись ивши ывши ями ами ией иям ием иях ого ему ими ыми ешь ете ишь ите ает яет "
+        "ют ат ят ет ит ем им ом ой ей ий ый ая яя ое ее ую юю ых их ам ям ах ях ов ев ия ие ья ье ы и а я "
+        "о е у ю ь ся сь"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+
+
+def _stem(word: str) -> str:
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase Russian/Latin words without stop words, reduced to a rough stem."""
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [_stem(word) for word in words if len(word) > 2 and word not in STOPWORDS]
+
+
+@dataclass
+class SongFeatures:
+    song_id: int
+    lyrics: Optional[str]
+    type: str
+    tempo: str
+    genre_ids: List[int] = field(default_factory=list)
+
+
+class ContentModel:
+    """TF-IDF over lyrics combined with one-hot type, tempo and genres.
+
+    Every block is L2-normalised and weighted, then the whole row is normalised again,
+    so a dot product of two rows is their cosine similarity.
+    """
+
+    WEIGHTS = {"lyrics": 0.6, "genres": 0.25, "type": 0.1, "tempo": 0.05}
+    BLOCK_SIZE = 512
+
+    def __init__(self, songs: Sequence[SongFeatures]):
+        self.types = {song_type.value: i for i, song_type in enumerate(SongType)}
+        self.tempos = {tempo.value: i for i, tempo in enumerate(SongTempo)}
+        self.genres = {genre_id: i for i, genre_id in enumerate(sorted({g for s in songs for g in s.genre_ids}))}
+
+        tokens = [tokenize(song.lyrics or "") for song in songs]
+        document_frequency: Dict[str, int] = {}
+        for words in tokens:
+            for word in set(words):
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.vocabulary = {word: i for i, word in enumerate(sorted(document_frequency))}
+        self.idf = np.array(
+            [math.log((1 + len(songs)) / (1 + document_frequency[word])) + 1 for word in sorted(document_frequency)],
+            dtype=np.float32,
+        )
+
+        self.song_ids: List[int] = [song.song_id for song in songs]
+        self.index = {song_id: i for i, song_id in enumerate(self.song_ids)}
+        self.matrix = self._vectorize(songs, tokens)
+
+    @staticmethod
+    def _one_hot(values: Iterable[Tuple[int, List[int]]], height: int, width: int) -> sparse.csr_matrix:
+        rows, columns = [], []
+        for row, indices in values:
+            rows += [row] * len(indices)
+            columns += indices
+        data = np.ones(len(rows), dtype=np.float32)
+        return sparse.csr_matrix((data, (rows, columns)), shape=(height, max(width, 1)))
+
+    def _vectorize(self, songs: Sequence[SongFeatures], tokens: Sequence[List[str]]) -> sparse.csr_matrix:
+        rows, columns, data = [], [], []
+        for row, words in enumerate(tokens):
+            counts: Dict[int, int] = {}
+            for word in words:
+                column = self.vocabulary.get(word)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            for column, count in counts.items():
+                rows.append(row)
+                columns.append(column)
+                data.append((1 + math.log(count)) * self.idf[column])
+        lyrics = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), (rows, columns)),
+            shape=(len(songs), max(len(self.vocabulary), 1)),
+        )
+
+        blocks = {
+            "lyrics": lyrics,
+            "genres": self._one_hot(
+                ((i, [self.genres[g] for g in s.genre_ids if g in self.genres]) for i, s in enumerate(songs)),
+                len(songs),
+                len(self.genres),
+            ),
+            "type": self._one_hot(
+                ((i, [self.types[s.type]] if s.type in self.types else []) for i, s in enumerate(songs)),
+                len(songs),
+                len(self.types),
+            ),
+            "tempo": self._one_hot(
+                ((i, [self.tempos[s.tempo]] if s.tempo in self.tempos else []) for i, s in enumerate(songs)),
+                len(songs),
+                len(self.tempos),
+            ),
+        }
+        combined = sparse.hstack(
+            [_normalize_rows(block) * math.sqrt(self.WEIGHTS[name]) for name, block in blocks.items()],
+            format="csr",
+        )
+        return _normalize_rows(combined)
+
+    def update(self, song: SongFeatures) -> None:
+        """Re-vectorise one song with the fitted vocabulary; unseen words wait for the next full build."""
+        vector = self._vectorize([song], [tokenize(song.lyrics or "")])
+        row = self.index.get(song.song_id)
+        if row is None:
+            self.index[song.song_id] = len(self.song_ids)
+            self.song_ids.append(song.song_id)
+            self.matrix = sparse.vstack([self.matrix, vector], format="csr")
+        else:
+            matrix = self.matrix.tolil()
+            matrix[row] = vector
+            self.matrix = matrix.tocsr()
+
+    def remove(self, song_id: int) -> None:
+        row = self.index.get(song_id)
+        if row is None:
+            return
+        matrix = self.matrix.tolil()
+        matrix[row] = 0
+        self.matrix = matrix.tocsr()
+
+    def neighbors(self, top_k: int, song_ids: Optional[Sequence[int]] = None) -> List[Tuple[int, int, float, int]]:
+        """Top-K most similar songs, computed block by block to bound memory.
+
+        Args:
+            top_k (int): Neighbours kept per song
+            song_ids (Optional[Sequence[int]]): Songs to compute the neighbours of. Defaults to all
+
+        Returns:
+            List[Tuple[int, int, float, int]]: (song_id, similar_song_id, score, rank) rows
+        """
+        if song_ids is None:
+            rows = np.arange(len(self.song_ids))
+        else:
+            rows = np.array([self.index[song_id] for song_id in song_ids if song_id in self.index], dtype=np.int64)
+
+        result: List[Tuple[int, int, float, int]] = []
+        transposed = self.matrix.T.tocsc()
+        k = min(top_k, len(self.song_ids) - 1)
+        if k <= 0:
+            return result
+
+        for start in range(0, len(rows), self.BLOCK_SIZE):
+            end = start + self.BLOCK_SIZE
+            block = rows[start:end]
+            scores = (self.matrix[block] @ transposed).toarray()
+            scores[np.arange(len(block)), block] = 0
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for i, row in enumerate(block):
+                candidates = best[i][np.argsort(-scores[i, best[i]], kind="stable")]
+                rank = 0
+                for column in candidates:
+                    score = float(scores[i, column])
+                    if score <= 0:
+                        break
+                    result.append((self.song_ids[row], self.song_ids[column], score, rank))
+                    rank += 1
+        return result
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+__all__ = ["ContentModel", "SongFeatures", "tokenize"]
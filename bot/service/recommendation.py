@@ -0,0 +1,195 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from models import SimilarityKind
+from repository import SimilarityRepository
+from service.content import ContentModel, SongFeatures
+
+
+@dataclass
+class RecommendationConfig:
+    top_k: int = 10
+    # Seconds between two recomputations of the similarity table
+    refresh_interval: int = 3600
+    # Only this many days of view history are taken into account
+    history_days: int = 180
+    # Songs need at least this many common users to be considered similar
+    min_support: int = 2
+
+
+def compute_neighbors(
+    interactions: Sequence[Tuple[str, int, float]],
+    top_k: int,
+    min_support: int = 1,
+) -> List[Tuple[int, int, float, int]]:
+    """Item-to-item cosine similarity over the user-song interaction matrix.
+
+    Args:
+        interactions (Sequence[Tuple[str, int, float]]): (user_id, song_id, weight) triples
+        top_k (int): Neighbours kept per song
+        min_support (int): Minimum number of users who interacted with both songs
+
+    Returns:
+        List[Tuple[int, int, float, int]]: (song_id, similar_song_id, score, rank) rows
+    """
+    if not interactions:
+        return []
+
+    user_ids, song_ids, weights = zip(*interactions)
+    _, user_index = np.unique(np.asarray(user_ids), return_inverse=True)
+    songs, song_index = np.unique(np.asarray(song_ids, dtype=np.int64), return_inverse=True)
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(weights, dtype=np.float32), (user_index, song_index)),
+        shape=(user_index.max() + 1, len(songs)),
+    )
+
+    norms = np.sqrt(np.asarray(matrix.power(2).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = matrix @ sparse.diags(1 / norms)
+    similarity = (normalized.T @ normalized).tocsr()
+
+    if min_support > 1:
+        binary = matrix.copy()
+        binary.data[:] = 1
+        support = (binary.T @ binary).tocsr()
+        support.data = (support.data >= min_support).astype(np.float32)
+        similarity = similarity.multiply(support).tocsr()
+
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    rows: List[Tuple[int, int, float, int]] = []
+    for i in range(similarity.shape[0]):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        if start == end:
+            continue
+        scores = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            scores, columns = scores[best], columns[best]
+        order = np.argsort(-scores, kind="stable")
+        for rank, j in enumerate(order):
+            rows.append((int(songs[i]), int(songs[columns[j]]), float(scores[j]), rank))
+    return rows
+
+
+class RecommendationService:
+    """Recommendation Service class
+
+    Neighbour tables are recomputed in the background and mirrored in memory,
+    so looking up the neighbours of a song costs no queries.
+    """
+
+    def __init__(self, repository: SimilarityRepository, config: RecommendationConfig, logger: Logger):
+        self.repo = repository
+        self.config = config
+        self.log = logger
+        self._co_occurrence: Dict[int, List[int]] = {}
+        self._content: Dict[int, List[int]] = {}
+        self._model: Optional[ContentModel] = None
+
+    def similar(self, song_id: int) -> List[int]:
+        """Songs liked by the same users; songs like this one while there is no engagement yet."""
+        return self._co_occurrence.get(song_id) or self._content.get(song_id, [])
+
+    def like_this(self, song_id: int) -> List[int]:
+        """Songs with similar lyrics, type, tempo and genres."""
+        return self._content.get(song_id, [])
+
+    async def load(self) -> None:
+        try:
+            self._co_occurrence = await self.repo.get_all(SimilarityKind.co_occurrence)
+            self._content = await self.repo.get_all(SimilarityKind.content)
+        except Exception as e:
+            self.log.error("SimilarityRepository: %s" % e)
+
+    async def refresh(self) -> None:
+        await self.refresh_co_occurrence()
+        await self.refresh_content()
+
+    async def refresh_co_occurrence(self) -> None:
+        try:
+            since = datetime.now() - timedelta(days=self.config.history_days)
+            interactions = await self.repo.get_interactions(since)
+            rows = await asyncio.to_thread(
+                compute_neighbors,
+                interactions,
+                self.config.top_k,
+                self.config.min_support,
+            )
+            await self.repo.replace(SimilarityKind.co_occurrence, rows)
+        except Exception as e:
+            self.log.error("RecommendationService.refresh_co_occurrence: %s" % e)
+            return
+
+        self._co_occurrence = _group(rows)
+        self.log.info(
+            "Co-occurrence neighbours refreshed: %d songs, %d interactions",
+            len(self._co_occurrence),
+            len(interactions),
+        )
+
+    async def refresh_content(self) -> None:
+        try:
+            features = [SongFeatures(*row) for row in await self.repo.get_content_features()]
+            model = await asyncio.to_thread(ContentModel, features)
+            rows = await asyncio.to_thread(model.neighbors, self.config.top_k)
+            await self.repo.replace(SimilarityKind.content, rows)
+        except Exception as e:
+            self.log.error("RecommendationService.refresh_content: %s" % e)
+            return
+
+        self._model = model
+        self._content = _group(rows)
+        self.log.info("Content neighbours refreshed: %d songs", len(self._content))
+
+    async def refresh_song(self, song_id: int) -> None:
+        """Recompute the content neighbours of a created or edited song.
+
+        Other songs pick the change up with the next full refresh.
+        """
+        if self._model is None:
+            await self.refresh_content()
+            return
+
+        try:
+            features = await self.repo.get_content_features([song_id])
+            if not features:
+                self.forget(song_id)
+                return
+            self._model.update(SongFeatures(*features[0]))
+            rows = await asyncio.to_thread(self._model.neighbors, self.config.top_k, [song_id])
+            await self.repo.replace(SimilarityKind.content, rows, song_ids=[song_id])
+        except Exception as e:
+            self.log.error("RecommendationService.refresh_song: %s" % e)
+            return
+
+        self._content[song_id] = [similar_song_id for _, similar_song_id, _, _ in rows]
+
+    def forget(self, song_id: int) -> None:
+        """Drop a deleted song from the in-memory tables; the stored rows go away by cascade."""
+        if self._model is not None:
+            self._model.remove(song_id)
+        for table in (self._co_occurrence, self._content):
+            table.pop(song_id, None)
+            for song_ids in table.values():
+                if song_id in song_ids:
+                    song_ids.remove(song_id)
+
+
+def _group(rows: Sequence[Tuple[int, int, float, int]]) -> Dict[int, List[int]]:
+    similar: Dict[int, List[int]] = {}
+    for song_id, similar_song_id, _, _ in rows:
+        similar.setdefault(song_id, []).append(similar_song_id)
+    return similar
+
+
+__all__ = ["RecommendationConfig", "RecommendationService", "compute_neighbors"]
@@ -0,0 +1,102 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime
+import gzip
+import json
+from logging import Logger
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from repository import HistoryPartitionRepository
+from repository.partition import add_months, month_of
+
+
+@dataclass
+class RetentionConfig:
+    # Months of history kept in the database, the current one included
+    keep_months: int = 12
+    # Partitions created in advance, so inserts never miss one
+    months_ahead: int = 3
+    # Directory of the archived partitions, one gzipped JSON Lines file per month
+    archive_dir: str = "archive"
+    # Seconds between two maintenance runs
+    interval: int = 86400
+    # Rows fetched from the database at once while archiving
+    batch_size: int = 5000
+
+
+class HistoryRetentionService:
+    """History Retention Service class
+
+    view_history is partitioned by month. The service creates the upcoming partitions and
+    moves the expired ones out of the database: a partition is detached first, so it no
+    longer takes part in queries or vacuum, then written to the archive and dropped.
+    A partition left detached by a failed run is picked up by the next one.
+    """
+
+    def __init__(self, repository: HistoryPartitionRepository, config: RetentionConfig, logger: Logger):
+        self.repo = repository
+        self.config = config
+        self.log = logger
+
+    async def ensure_partitions(self, today: Optional[date] = None) -> None:
+        current = month_of(today or datetime.now())
+        try:
+            for months in range(self.config.months_ahead + 1):
+                await self.repo.create(add_months(current, months))
+        except Exception as e:
+            self.log.error("HistoryPartitionRepository: %s" % e)
+
+    async def archive_expired(self, today: Optional[date] = None) -> List[Path]:
+        """Archive and drop the partitions older than keep_months.
+
+        Returns:
+            List[Path]: Written archive files
+        """
+        cutoff = add_months(month_of(today or datetime.now()), 1 - self.config.keep_months)
+        archived: List[Path] = []
+        try:
+            partitions = await self.repo.get_all()
+        except Exception as e:
+            self.log.error("HistoryPartitionRepository: %s" % e)
+            return archived
+
+        for name, month, attached in partitions:
+            if month >= cutoff:
+                continue
+            try:
+                if attached:
+                    await self.repo.detach(name)
+                path = await self._archive(name)
+                await self.repo.drop(name)
+            except Exception as e:
+                self.log.error("HistoryRetentionService.archive_expired: %s: %s" % (name, e))
+                continue
+            self.log.info("History partition %s archived to %s", name, path)
+            archived.append(path)
+        return archived
+
+    async def _archive(self, name: str) -> Path:
+        directory = Path(self.config.archive_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}.jsonl.gz"
+        partial = directory / f"{name}.jsonl.gz.part"
+
+        # The file only gets its final name once all rows are written
+        with gzip.open(partial, "wt", encoding="utf-8") as file:
+            async for rows in self.repo.iter_rows(name, self.config.batch_size):
+                await asyncio.to_thread(_write_lines, file, rows)
+        os.replace(partial, path)
+        return path
+
+    async def maintain(self) -> None:
+        await self.ensure_partitions()
+        await self.archive_expired()
+
+
+def _write_lines(file: Any, rows: List[Dict[str, Any]]) -> None:
+    file.writelines(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+
+
+__all__ = ["HistoryRetentionService", "RetentionConfig"]
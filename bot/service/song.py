@@ -3,7 +3,7 @@ from typing import List, Optional
 
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
-from models import FileType, Genre, Song, SongTempo, SongType, User
+from models import FileType, Genre, Song, SongTempo, SongType
 from repository import GenreRepository, SongRepository
 
 
@@ -107,18 +107,12 @@ class SongService:
             self.log.error("SongRepository: %s", e)
         return []
 
-    async def get_customers(self, song_id: int) -> List[User]:
-        try:
-            return await self.song_repo.get_customers(song_id)
-        except Exception as e:
-            self.log.error("SongRepository: %s", e)
-        return []
-
     async def get_by_filter(
         self,
         type_str: Optional[str],
         tempo_str: Optional[str],
         genre_titles: Optional[List[str]],
+        popular_first: bool = False,
     ) -> List[Song]:
         try:
             type = None
@@ -134,7 +128,7 @@ class SongService:
                     if not genre:
                         continue
                     genre_ids.append(genre.id)
-            return await self.song_repo.get_by_filter(type, tempo, genre_ids)
+            return await self.song_repo.get_by_filter(type, tempo, genre_ids, popular_first)
         except Exception as e:
             self.log.error("SongRepository: %s", e)
         return []
@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from logging import Logger
+import time
+from typing import List, Optional, Tuple
+
+from models import SongTempo
+from repository import StatsRepository
+
+
+@dataclass
+class StatsConfig:
+    # Seconds the computed dashboard is served from memory
+    cache_ttl: int = 60
+    # Days of the active users chart
+    days: int = 14
+    # Rows of every top list
+    top: int = 5
+    # Songs with fewer views are left out of the wishlist conversion top
+    min_views: int = 10
+
+
+@dataclass
+class Dashboard:
+    generated_at: datetime
+    active_users: List[Tuple[date, int]] = field(default_factory=list)
+    top_viewed: List[Tuple[str, int, int]] = field(default_factory=list)
+    top_liked: List[Tuple[str, int, int]] = field(default_factory=list)
+    conversion: List[Tuple[str, int, int, float]] = field(default_factory=list)
+    total_views: int = 0
+    total_wishlisted: int = 0
+    genres: List[Tuple[str, int, int]] = field(default_factory=list)
+    tempos: List[Tuple[SongTempo, int, int]] = field(default_factory=list)
+
+    @property
+    def wishlist_ratio(self) -> float:
+        return self.total_wishlisted / self.total_views if self.total_views else 0.0
+
+
+class StatsService:
+    """Statistics Service class
+
+    The dashboard is computed by the database and kept in memory for cache_ttl seconds,
+    so repeated opening of the admin screen costs no queries.
+    """
+
+    def __init__(self, repository: StatsRepository, config: StatsConfig, logger: Logger):
+        self.repo = repository
+        self.config = config
+        self.log = logger
+        self._dashboard: Optional[Dashboard] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_dashboard(self, refresh: bool = False) -> Optional[Dashboard]:
+        async with self._lock:
+            if refresh or self._dashboard is None or time.monotonic() >= self._expires_at:
+                dashboard = await self._compute()
+                if dashboard is None:
+                    return self._dashboard
+                self._dashboard = dashboard
+                self._expires_at = time.monotonic() + self.config.cache_ttl
+            return self._dashboard
+
+    async def _compute(self) -> Optional[Dashboard]:
+        try:
+            since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            since -= timedelta(days=self.config.days - 1)
+            total_views, total_wishlisted = await self.repo.get_totals()
+            return Dashboard(
+                generated_at=datetime.now(),
+                active_users=await self.repo.get_active_users(since),
+                top_viewed=await self.repo.get_top_songs(self.config.top),
+                top_liked=await self.repo.get_top_songs(self.config.top, by_likes=True),
+                conversion=await self.repo.get_wishlist_conversion(self.config.top, self.config.min_views),
+                total_views=total_views,
+                total_wishlisted=total_wishlisted,
+                genres=await self.repo.get_genre_demand(),
+                tempos=await self.repo.get_tempo_demand(),
+            )
+        except Exception as e:
+            self.log.error("StatsRepository: %s" % e)
+        return None
+
+
+__all__ = ["Dashboard", "StatsConfig", "StatsService"]
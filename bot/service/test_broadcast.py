@@ -0,0 +1,164 @@
+import asyncio
+import logging
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import CopyMessage
+import fakeredis
+import pytest
+
+from service.broadcast import BroadcastConfig, BroadcastJob, BroadcastService, BroadcastStatus
+
+LOGGER = logging.getLogger("test")
+CONFIG = BroadcastConfig(rate=2, batch_size=3, progress_interval=0, attempts=1)
+USERS = [str(user_id) for user_id in range(1, 8)]
+
+
+class FakeUsers:
+    def __init__(self, fail_at: int = 0):
+        self.blocked = []
+        # Number of reads after which the database fails once
+        self.fail_at = fail_at
+        self.reads = 0
+
+    async def get_recipient_ids(self, after=None, limit=500):
+        self.reads += 1
+        if self.reads == self.fail_at:
+            return None
+        rest = [user_id for user_id in USERS if after is None or int(user_id) > int(after)]
+        return rest[:limit]
+
+    async def count_recipients(self):
+        return len(USERS)
+
+    async def set_blocked(self, user_ids):
+        self.blocked.extend(user_ids)
+        return True
+
+
+class FakeBot:
+    def __init__(self, blocked=(), on_send=None):
+        self.received = []
+        self.blocked = set(blocked)
+        self.on_send = on_send
+
+    async def copy_message(self, chat_id, from_chat_id, message_id):
+        if chat_id in self.blocked:
+            method = CopyMessage(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
+            raise TelegramForbiddenError(method=method, message="bot was blocked by the user")
+        self.received.append(chat_id)
+        if self.on_send is not None:
+            await self.on_send(chat_id)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_pacing(monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda delay: sleep(0))
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis()
+
+
+def test_sends_to_everyone_once(redis):
+    users = FakeUsers()
+    bot = FakeBot(blocked={"3"})
+    service = BroadcastService(redis, users, CONFIG, LOGGER)
+
+    async def scenario():
+        assert await service.start(1, 10, 1, 11)
+        assert not await service.start(1, 12, 1, 13)
+        await service.resume(bot)
+        return await service.get_job()
+
+    job = asyncio.run(scenario())
+    assert job.status == BroadcastStatus.done
+    assert (job.sent, job.blocked, job.failed) == (6, 1, 0)
+    assert job.cursor == USERS[-1]
+    assert bot.received == [user_id for user_id in USERS if user_id != "3"]
+    assert users.blocked == ["3"]
+
+
+def test_resumes_from_cursor(redis):
+    bot = FakeBot()
+    service = BroadcastService(redis, FakeUsers(), CONFIG, LOGGER)
+
+    async def scenario():
+        await service.start(1, 10, 1, 11)
+        job = await service.get_job()
+        job.cursor, job.sent = "4", 4
+        await service._save(job)
+        await service.resume(bot)
+        return await service.get_job()
+
+    job = asyncio.run(scenario())
+    assert bot.received == ["5", "6", "7"]
+    assert job.status == BroadcastStatus.done
+    assert job.sent == len(USERS)
+
+
+def test_stop_from_another_instance(redis):
+    other = BroadcastService(redis, FakeUsers(), CONFIG, LOGGER)
+    bot = FakeBot(on_send=lambda user_id: other.stop())
+    service = BroadcastService(redis, FakeUsers(), CONFIG, LOGGER)
+
+    async def scenario():
+        await service.start(1, 10, 1, 11)
+        await service.resume(bot)
+        return await other.get_job()
+
+    job = asyncio.run(scenario())
+    assert job.status == BroadcastStatus.cancelled
+    # The chunk in flight is finished, nothing after it is sent
+    assert bot.received == ["1", "2"]
+
+
+def test_database_failure_keeps_the_job_running(redis):
+    bot = FakeBot()
+    service = BroadcastService(redis, FakeUsers(fail_at=2), CONFIG, LOGGER)
+
+    async def scenario():
+        await service.start(1, 10, 1, 11)
+        with pytest.raises(RuntimeError):
+            await service.resume(bot)
+        interrupted = await service.get_job()
+        await service.resume(bot)
+        return interrupted, await service.get_job()
+
+    interrupted, job = asyncio.run(scenario())
+    assert interrupted.status == BroadcastStatus.running
+    assert interrupted.cursor == "3"
+    assert job.status == BroadcastStatus.done
+    assert bot.received == USERS
+
+
+def test_instances_do_not_send_the_same_broadcast(redis):
+    bot = FakeBot()
+    first = BroadcastService(redis, FakeUsers(), CONFIG, LOGGER)
+    second = BroadcastService(redis, FakeUsers(), CONFIG, LOGGER)
+
+    async def scenario():
+        await first.start(1, 10, 1, 11)
+        await asyncio.gather(first.resume(bot), second.resume(bot))
+
+    asyncio.run(scenario())
+    assert bot.received == USERS
+
+
+def test_without_redis():
+    bot = FakeBot()
+    service = BroadcastService(None, FakeUsers(), CONFIG, LOGGER)
+
+    async def scenario():
+        await service.start(1, 10, 1, 11)
+        await service.resume(bot)
+        return await service.get_job()
+
+    job = asyncio.run(scenario())
+    assert isinstance(job, BroadcastJob)
+    assert job.status == BroadcastStatus.done
+    assert bot.received == USERS
@@ -0,0 +1,69 @@
+import pytest
+
+from models import SongTempo, SongType
+from service.content import ContentModel, SongFeatures, tokenize
+
+
+def song(song_id, lyrics, genre_ids=(1,), song_type=SongType.universal, tempo=SongTempo.mid_tempo):
+    return SongFeatures(song_id, lyrics, song_type.value, tempo.value, list(genre_ids))
+
+
+SONGS = [
+    song(1, "Ночной город, огни и дождь над рекой"),
+    song(2, "Огни ночного города, дождь и река"),
+    song(3, "Солнечное утро, поле и ромашки", genre_ids=(2,)),
+    song(4, "Утро солнечное, ромашковое поле", genre_ids=(2,)),
+    song(5, None, genre_ids=(3,)),
+]
+
+
+def test_tokenize_drops_stop_words_and_merges_word_forms():
+    assert tokenize("Я люблю тебя, и припев") == ["любл"]
+    assert tokenize("огни") == tokenize("огней") == ["огн"]
+
+
+def test_neighbors_rank_the_closest_song_first():
+    neighbors = ContentModel(SONGS).neighbors(top_k=2)
+    best = {song_id: similar for song_id, similar, _, rank in neighbors if rank == 0}
+    assert best[1] == 2
+    assert best[2] == 1
+    assert best[3] == 4
+    assert best[4] == 3
+
+
+def test_neighbors_are_ranked_cosine_scores_without_the_song_itself():
+    neighbors = ContentModel(SONGS).neighbors(top_k=3)
+    for song_id, similar, score, _ in neighbors:
+        assert song_id != similar
+        assert 0 < score <= 1 + 1e-6
+
+    for song_id in {row[0] for row in neighbors}:
+        rows = [row for row in neighbors if row[0] == song_id]
+        assert len(rows) <= 3
+        assert [row[3] for row in rows] == list(range(len(rows)))
+        assert [row[2] for row in rows] == sorted((row[2] for row in rows), reverse=True)
+
+
+def test_neighbors_of_selected_songs_only():
+    neighbors = ContentModel(SONGS).neighbors(top_k=2, song_ids=[3, 42])
+    assert {row[0] for row in neighbors} == {3}
+
+
+def test_removed_song_is_nobodys_neighbor():
+    model = ContentModel(SONGS)
+    model.remove(2)
+    neighbors = model.neighbors(top_k=4)
+    assert all(2 not in (song_id, similar) for song_id, similar, _, _ in neighbors)
+
+
+def test_updated_song_moves_next_to_its_new_twin():
+    model = ContentModel(SONGS)
+    model.update(song(5, "Солнечное утро, поле и ромашки", genre_ids=(2,)))
+    best = {song_id: similar for song_id, similar, _, rank in model.neighbors(top_k=1)}
+    assert best[5] == 3
+    assert model.neighbors(top_k=1, song_ids=[6]) == []
+
+
+@pytest.mark.parametrize("songs", [[], SONGS[:1]])
+def test_too_few_songs_have_no_neighbors(songs):
+    assert ContentModel(songs).neighbors(top_k=5) == []
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+import fakeredis
+import pytest
+
+from models import HistoryAction
+from service.trending import TrendingConfig, TrendingService
+
+LOGGER = logging.getLogger("test")
+CONFIG = TrendingConfig(bucket_seconds=3600, window=48, half_life=86400, capacity=2)
+
+
+@pytest.fixture
+def service():
+    return TrendingService(fakeredis.FakeAsyncRedis(), CONFIG, LOGGER)
+
+
+def test_decay_halves_every_half_life():
+    trending = TrendingService(None, CONFIG, LOGGER)
+    hours_per_half_life = CONFIG.half_life // CONFIG.bucket_seconds
+    assert trending._decay(0) == 1
+    assert trending._decay(hours_per_half_life) == pytest.approx(0.5)
+    assert trending._decay(2 * hours_per_half_life) == pytest.approx(0.25)
+    assert trending._decay(1) < trending._decay(0)
+
+
+def test_likes_outweigh_views(service):
+    async def scenario():
+        await service.record(1)
+        await service.record(1)
+        await service.record(2, HistoryAction.like)
+        await service.record(3, HistoryAction.delete)
+        return await service.top()
+
+    assert asyncio.run(scenario()) == [2, 1]
+
+
+def test_rebuild_decays_old_buckets(service):
+    async def scenario():
+        current = service._bucket()
+        # Song 1 was hot a day ago, song 2 is a little less hot right now
+        await service.redis.zincrby(service._bucket_key(current - 24), 4, 1)
+        await service.redis.zincrby(service._bucket_key(current), 3, 2)
+        # A bucket that left the window does not count at all
+        await service.redis.zincrby(service._bucket_key(current - CONFIG.window), 100, 3)
+        await service.rebuild()
+        return await service.redis.zrevrange(service.top_key, 0, -1, withscores=True)
+
+    ranking = asyncio.run(scenario())
+    assert [(int(song_id), score) for song_id, score in ranking] == [(2, 3.0), (1, pytest.approx(2.0))]
+
+
+def test_rebuild_keeps_the_capacity(service):
+    async def scenario():
+        for song_id in (1, 2, 2, 3, 3, 3):
+            await service.record(song_id)
+        await service.rebuild()
+        return await service.top()
+
+    assert asyncio.run(scenario()) == [3, 2]
+
+
+def test_forget_drops_the_song_everywhere(service):
+    async def scenario():
+        await service.record(1)
+        await service.record(2)
+        await service.forget(1)
+        await service.rebuild()
+        return await service.top()
+
+    assert asyncio.run(scenario()) == [2]
+
+
+def test_disabled_without_redis():
+    trending = TrendingService(None, CONFIG, LOGGER)
+
+    async def scenario():
+        await trending.record(1)
+        await trending.rebuild()
+        return await trending.top()
+
+    assert asyncio.run(scenario()) == []
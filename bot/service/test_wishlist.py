@@ -0,0 +1,80 @@
+import asyncio
+import logging
+
+import fakeredis
+import pytest
+
+from service.wishlist import WishlistCache, WishlistCacheConfig
+
+LOGGER = logging.getLogger("test")
+
+
+class FakeWishlist:
+    def __init__(self, song_ids):
+        self.song_ids = list(song_ids)
+        self.reads = 0
+        # Runs after the read, like a write of another instance committed in the meantime
+        self.after_read = None
+
+    async def get_song_ids(self, user_id):
+        self.reads += 1
+        try:
+            return list(self.song_ids)
+        finally:
+            after_read, self.after_read = self.after_read, None
+            if after_read is not None:
+                await after_read()
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis()
+
+
+def test_loads_once_and_follows_writes(redis):
+    repo = FakeWishlist([1, 2])
+    cache = WishlistCache(redis, repo, WishlistCacheConfig(), LOGGER)
+
+    async def scenario():
+        assert await cache.contains("7", 1)
+        assert not await cache.contains("7", 3)
+        repo.song_ids.append(3)
+        await cache.add("7", 3)
+        assert await cache.contains("7", 3)
+        repo.song_ids.remove(1)
+        await cache.remove("7", 1)
+        assert not await cache.contains("7", 1)
+
+    asyncio.run(scenario())
+    assert repo.reads == 1
+
+
+def test_write_during_load_is_not_lost(redis):
+    repo = FakeWishlist([1])
+    cache = WishlistCache(redis, repo, WishlistCacheConfig(), LOGGER)
+    other = WishlistCache(redis, repo, WishlistCacheConfig(), LOGGER)
+
+    async def concurrent_add():
+        repo.song_ids.append(2)
+        await other.add("7", 2)
+
+    async def scenario():
+        repo.after_read = concurrent_add
+        # The stale read is answered but not stored as complete
+        assert not await cache.contains("7", 2)
+        assert await cache.contains("7", 2)
+        assert await cache.contains("7", 1)
+
+    asyncio.run(scenario())
+    assert repo.reads == 2
+
+
+def test_without_redis():
+    repo = FakeWishlist([1])
+    cache = WishlistCache(None, repo, WishlistCacheConfig(), LOGGER)
+
+    async def scenario():
+        await cache.add("7", 2)
+        return await cache.contains("7", 1), await cache.contains("7", 2)
+
+    assert asyncio.run(scenario()) == (True, False)
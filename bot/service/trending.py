@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from logging import Logger
+import time
+from typing import Dict, List, Optional, Union
+
+from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+
+from models import HistoryAction
+
+
+@dataclass
+class TrendingConfig:
+    # Length of one time bucket, seconds
+    bucket_seconds: int = 3600
+    # Number of buckets in the sliding window; older buckets expire
+    window: int = 168
+    # Age at which an event counts half as much as a fresh one, seconds
+    half_life: int = 86400
+    # Seconds between two rebuilds of the decayed ranking
+    refresh_interval: int = 60
+    # Songs kept in the ranking
+    capacity: int = 1000
+    # Songs shown in the catalog entry
+    top_n: int = 50
+
+
+class TrendingService:
+    """Trending Service class
+
+    Views and likes are counted in hourly Redis sorted sets that expire once they leave the window.
+    A background job merges the live buckets into one ranking with ZUNIONSTORE, weighting every
+    bucket by its age, and new events are added to the ranking right away, so reading the
+    top songs is a single ZREVRANGE. All keys share one hash tag to stay in a single cluster slot.
+
+    Without a Redis client (e.g. with the in-memory FSM storage) trending is disabled.
+    """
+
+    KEY_PREFIX = "{trending}"
+    WEIGHTS = {HistoryAction.view: 1.0, HistoryAction.like: 3.0}
+
+    def __init__(self, redis: Optional[Union[Redis, RedisCluster]], config: TrendingConfig, logger: Logger):
+        self.redis = redis
+        self.config = config
+        self.log = logger
+        self.top_key = f"{self.KEY_PREFIX}:top"
+
+    def _bucket(self, now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // self.config.bucket_seconds)
+
+    def _bucket_key(self, bucket: int) -> str:
+        return f"{self.KEY_PREFIX}:bucket:{bucket}"
+
+    def _decay(self, age: int) -> float:
+        return 0.5 ** (age * self.config.bucket_seconds / self.config.half_life)
+
+    async def record(self, song_id: int, action: HistoryAction = HistoryAction.view) -> None:
+        weight = self.WEIGHTS.get(action)
+        if self.redis is None or weight is None:
+            return
+
+        key = self._bucket_key(self._bucket())
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zincrby(key, weight, song_id)
+                pipe.expire(key, self.config.bucket_seconds * (self.config.window + 1))
+                # The current bucket has no decay yet, so the ranking can take the event as is
+                pipe.zincrby(self.top_key, weight, song_id)
+                await pipe.execute()
+        except Exception as e:
+            self.log.error("TrendingService.record: %s" % e)
+
+    async def top(self, limit: Optional[int] = None) -> List[int]:
+        """Ids of the hottest songs, best first"""
+        if self.redis is None:
+            return []
+
+        try:
+            song_ids = await self.redis.zrevrange(self.top_key, 0, (limit or self.config.top_n) - 1)
+        except Exception as e:
+            self.log.error("TrendingService.top: %s" % e)
+            return []
+        return [int(song_id) for song_id in song_ids]
+
+    async def rebuild(self) -> None:
+        """Merge the live buckets into the ranking with age-decayed weights."""
+        if self.redis is None:
+            return
+
+        current = self._bucket()
+        weights: Dict[str, float] = {
+            self._bucket_key(current - age): self._decay(age) for age in range(self.config.window)
+        }
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                # Expired buckets are simply missing and count as empty sets
+                pipe.zunionstore(self.top_key, weights, aggregate="SUM")
+                pipe.zremrangebyrank(self.top_key, 0, -self.config.capacity - 1)
+                await pipe.execute()
+        except Exception as e:
+            self.log.error("TrendingService.rebuild: %s" % e)
+
+    async def forget(self, song_id: int) -> None:
+        """Drop a deleted song from the ranking and every live bucket."""
+        if self.redis is None:
+            return
+
+        current = self._bucket()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zrem(self.top_key, song_id)
+                for age in range(self.config.window):
+                    pipe.zrem(self._bucket_key(current - age), song_id)
+                await pipe.execute()
+        except Exception as e:
+            self.log.error("TrendingService.forget: %s" % e)
+
+
+__all__ = ["TrendingConfig", "TrendingService"]
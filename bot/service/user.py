@@ -1,10 +1,23 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from logging import Logger
-from typing import Optional
+from typing import Optional, Tuple
 
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
-from models import Song, SongHistory, User
+from models import HistoryAction, SongHistory, User
 from repository import SongHistoryRepository, UserRepository, WishlistRepository
+from service.trending import TrendingService
+from service.wishlist import WishlistCache
+
+
+@dataclass
+class HistoryConfig:
+    # Repeated actions of a user on a song within one window of this many seconds are stored
+    # as a single row with a count; 0 stores every action separately
+    compaction_window: int = 1800
+    # Days of history shown to the admins and exported; older partitions are not read
+    view_days: int = 90
 
 
 class UserService:
@@ -16,11 +29,17 @@ class UserService:
         wish_repo: WishlistRepository,
         history_repo: SongHistoryRepository,
         logger: Logger,
+        trending: Optional[TrendingService] = None,
+        history_config: Optional[HistoryConfig] = None,
+        wishlist_cache: Optional[WishlistCache] = None,
     ):
         self.repo = repository
         self.wish_repo = wish_repo
         self.history_repo = history_repo
         self.log = logger
+        self.trending = trending
+        self.history_config = history_config or HistoryConfig(compaction_window=0)
+        self.wishlist_cache = wishlist_cache
 
     async def create(self, id: str, username: str, is_staff: bool = False) -> str:
         try:
@@ -74,6 +93,43 @@ class UserService:
             self.log.error("UserRepository: %s" % e)
         return []
 
+    async def search(self, prefix: str = "", after: Optional[Tuple[str, str]] = None, limit: int = 10) -> list[User]:
+        try:
+            return await self.repo.search(prefix, after=after, limit=limit)
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+        return []
+
+    async def count_search(self, prefix: str = "") -> int:
+        try:
+            return await self.repo.count_search(prefix)
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+        return 0
+
+    async def get_recipient_ids(self, after: Optional[str] = None, limit: int = 500) -> Optional[list[str]]:
+        """None if the database could not be read, so callers can tell a failure from the end of the list"""
+        try:
+            return await self.repo.get_recipient_ids(after=after, limit=limit)
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+        return None
+
+    async def count_recipients(self) -> int:
+        try:
+            return await self.repo.count_recipients()
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+        return 0
+
+    async def set_blocked(self, ids: list[str], blocked: bool = True) -> bool:
+        try:
+            await self.repo.set_blocked(ids, blocked)
+            return True
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+        return False
+
     async def update_username(self, id: str, username: str) -> Optional[User]:
         try:
             return await self.repo.update_username(id, username)
@@ -117,43 +173,107 @@ class UserService:
         return False
 
     async def add_to_wishlist(self, user_id: str, song_id: int) -> bool:
+        """Add a song to the wishlist; False if it was already there or on error"""
         try:
-            await self.wish_repo.add(user_id, song_id)
-            return True
-        except IntegrityError as e:
-            self.log.warning("WishlistRepository: %s", e)
+            added = await self.wish_repo.add(user_id, song_id)
+        except Exception as e:
+            self.log.error("WishlistRepository: %s", e)
+            return False
+        if self.wishlist_cache is not None:
+            await self.wishlist_cache.add(user_id, song_id)
+        return added
+
+    async def in_wishlist(self, user_id: str, song_id: int) -> bool:
+        """Whether the song is wishlisted, answered from the cache when possible"""
+        try:
+            if self.wishlist_cache is not None:
+                return await self.wishlist_cache.contains(user_id, song_id)
+            return song_id in await self.wish_repo.get_song_ids(user_id)
         except Exception as e:
             self.log.error("WishlistRepository: %s", e)
         return False
 
-    async def get_wishlist(self, user_id: str) -> list[Song]:
+    async def get_wishlist_ids(self, user_id: str) -> list[int]:
+        """Ids of the wishlisted songs, most recently added first"""
+        try:
+            return await self.wish_repo.get_song_ids(user_id)
+        except Exception as e:
+            self.log.error("WishlistRepository: %s", e)
+        return []
+
+    async def get_wishlist_titles(self, user_id: str) -> list[str]:
         try:
-            return await self.repo.get_wishlist(user_id)
+            return await self.wish_repo.get_titles(user_id)
         except Exception as e:
             self.log.error("WishlistRepository: %s", e)
         return []
 
+    async def count_wishlist(self, user_id: str) -> int:
+        try:
+            return await self.wish_repo.count(user_id)
+        except Exception as e:
+            self.log.error("WishlistRepository: %s", e)
+        return 0
+
     async def remove_from_wishlist(self, user_id: str, song_id: int) -> bool:
         try:
             await self.wish_repo.remove(user_id, song_id)
-            return True
         except Exception as e:
             self.log.error("WishlistRepository: %s", e)
-        return False
+            return False
+        if self.wishlist_cache is not None:
+            await self.wishlist_cache.remove(user_id, song_id)
+        return True
 
-    async def log_view(self, user_id: str, song_title: str, action: str = "view") -> Optional[int]:
+    async def log_view(
+        self,
+        user_id: str,
+        song_id: int,
+        action: HistoryAction = HistoryAction.view,
+    ) -> Optional[int]:
+        if self.trending is not None:
+            await self.trending.record(song_id, action)
         try:
-            return await self.history_repo.log(user_id, song_title, action)
+            return await self.history_repo.log(
+                user_id,
+                song_id,
+                action,
+                window=self.history_config.compaction_window,
+            )
         except Exception as e:
             self.log.error("SongHistoryRepository: %s", e)
             return None
 
+    def _history_since(self) -> datetime:
+        return datetime.now() - timedelta(days=self.history_config.view_days)
+
+    async def get_history_page(
+        self,
+        user_id: str,
+        before: Optional[Tuple[datetime, datetime, int]] = None,
+        limit: int = 20,
+    ) -> list[SongHistory]:
+        """One page of the recent history of a user, newest first"""
+        try:
+            return await self.history_repo.get_page(user_id, self._history_since(), before=before, limit=limit)
+        except Exception as e:
+            self.log.error("SongHistoryRepository: %s", e)
+        return []
+
+    async def count_history(self, user_id: str) -> int:
+        try:
+            return await self.history_repo.count(user_id, self._history_since())
+        except Exception as e:
+            self.log.error("SongHistoryRepository: %s", e)
+        return 0
+
     async def get_history(self, user_id: str) -> list[SongHistory]:
+        """Recent history of a user, newest first"""
         try:
-            return await self.repo.get_history(user_id)
+            return await self.history_repo.get_by_user(user_id, self._history_since())
         except Exception as e:
             self.log.error("SongHistoryRepository: %s", e)
         return []
 
 
-__all__ = ["UserService"]
+__all__ = ["UserService", "HistoryConfig"]
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from logging import Logger
+from typing import List, Optional, Union
+
+from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+
+from repository import WishlistRepository
+
+
+@dataclass
+class WishlistCacheConfig:
+    # Seconds an untouched wishlist stays in Redis; it is reloaded from the database on the next read
+    ttl: int = 86400
+
+
+# Replaces the set with the loaded one unless a write bumped the version since the load read it
+# KEYS: set, version; ARGV: version seen before the read, ttl, members
+STORE_LOADED = """
+if (redis.call("GET", KEYS[2]) or "") ~= ARGV[1] then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+redis.call("SADD", KEYS[1], unpack(ARGV, 3))
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class WishlistCache:
+    """Wishlist Cache class
+
+    Mirrors the song ids of every wishlist in a Redis set, so song cards can tell whether a song is
+    wishlisted without a query. Adds and removes update the set after the database write, a set that
+    is missing or expired is rebuilt from the database on the next read. Song ids start at 1, so the
+    member 0 marks a complete set: a set without it only holds writes made since it expired.
+
+    Every write also bumps a version key in the same slot. A rebuild is stored only if the version
+    did not change while the database was read; otherwise a write from another instance may be
+    missing from it, and the set is left for the next read to rebuild.
+
+    Without a Redis client (e.g. with the in-memory FSM storage) every check goes to the database.
+    """
+
+    KEY_PREFIX = "wishlist"
+    LOADED = 0
+
+    def __init__(
+        self,
+        redis: Optional[Union[Redis, RedisCluster]],
+        repository: WishlistRepository,
+        config: WishlistCacheConfig,
+        logger: Logger,
+    ):
+        self.redis = redis
+        self.repo = repository
+        self.config = config
+        self.log = logger
+        self._store_loaded = redis.register_script(STORE_LOADED) if redis is not None else None
+
+    def _key(self, user_id: str) -> str:
+        # The hash tag keeps the set and its version in one Redis Cluster slot
+        return f"{self.KEY_PREFIX}:{{{user_id}}}"
+
+    def _version_key(self, user_id: str) -> str:
+        return f"{self._key(user_id)}:version"
+
+    async def contains(self, user_id: str, song_id: int) -> bool:
+        if self.redis is not None:
+            try:
+                loaded, member = await self.redis.smismember(self._key(user_id), [self.LOADED, song_id])
+                if loaded:
+                    return bool(member)
+            except Exception as e:
+                self.log.error("WishlistCache.contains: %s" % e)
+        return song_id in await self._load(user_id)
+
+    async def add(self, user_id: str, song_id: int) -> None:
+        await self._write(user_id, song_id, add=True)
+
+    async def remove(self, user_id: str, song_id: int) -> None:
+        await self._write(user_id, song_id, add=False)
+
+    async def _write(self, user_id: str, song_id: int, add: bool) -> None:
+        if self.redis is None:
+            return
+
+        key = self._key(user_id)
+        version_key = self._version_key(user_id)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                # Bumped first, so a rebuild stored before it is followed by this write
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.config.ttl)
+                if add:
+                    pipe.sadd(key, song_id)
+                else:
+                    pipe.srem(key, song_id)
+                pipe.expire(key, self.config.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.log.error("WishlistCache.%s: %s" % ("add" if add else "remove", e))
+
+    async def _load(self, user_id: str) -> List[int]:
+        """Read the wishlist from the database and store it as a complete set"""
+        if self.redis is None:
+            return await self.repo.get_song_ids(user_id)
+
+        version = None
+        try:
+            version = await self.redis.get(self._version_key(user_id))
+        except Exception as e:
+            self.log.error("WishlistCache._load: %s" % e)
+        song_ids = await self.repo.get_song_ids(user_id)
+
+        try:
+            await self._store_loaded(
+                keys=[self._key(user_id), self._version_key(user_id)],
+                args=[version or "", self.config.ttl, self.LOADED, *song_ids],
+            )
+        except Exception as e:
+            self.log.error("WishlistCache._load: %s" % e)
+        return song_ids
+
+
+__all__ = ["WishlistCache", "WishlistCacheConfig"]
@@ -0,0 +1,13 @@
+from storage.isolation import BoundedEventIsolation, IsolationConfig
+from storage.redis import create_redis, HashTagKeyBuilder, PipelinedRedisStorage, RedisConfig, RedisMode
+
+
+__all__ = [
+    "RedisConfig",
+    "RedisMode",
+    "create_redis",
+    "HashTagKeyBuilder",
+    "PipelinedRedisStorage",
+    "BoundedEventIsolation",
+    "IsolationConfig",
+]
@@ -0,0 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import time
+from typing import AsyncGenerator, Dict
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from metrics import UPDATE_QUEUE_WAIT, UPDATES_IN_FLIGHT, UPDATES_QUEUED
+
+
+@dataclass
+class IsolationConfig:
+    # Updates processed at once; an update holds at most one database connection at a time,
+    # and the default SQLAlchemy pool has 5 connections plus 10 overflow ones
+    max_concurrent_updates: int = 15
+
+
+class _Queue:
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Updates of the context that are waiting or running
+        self.size = 0
+
+
+class BoundedEventIsolation(BaseEventIsolation):
+    """Event isolation that runs the updates of one FSM context in arrival order.
+
+    The FSM middleware takes the lock before it reads the state, so the next update of a user
+    sees everything the previous one stored (two quick taps on "next" move two songs forward).
+    An update takes one of the global slots only when it is first in its user's queue: a user
+    flooding the bot waits for their own updates and does not occupy the slots of the others.
+
+    The queues live in memory. Polling delivers every update to one process, which is all the
+    ordering needs; the queue of a context is dropped as soon as it is empty.
+    """
+
+    def __init__(self, config: IsolationConfig):
+        self.config = config
+        self._slots = asyncio.Semaphore(config.max_concurrent_updates)
+        self._queues: Dict[StorageKey, _Queue] = {}
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _Queue()
+        queue.size += 1
+
+        UPDATES_QUEUED.inc()
+        queued = True
+        started = time.perf_counter()
+        try:
+            async with queue.lock, self._slots:
+                UPDATES_QUEUED.dec()
+                queued = False
+                UPDATE_QUEUE_WAIT.observe(time.perf_counter() - started)
+                with UPDATES_IN_FLIGHT.track_inprogress():
+                    yield
+        finally:
+            if queued:
+                UPDATES_QUEUED.dec()
+            queue.size -= 1
+            if not queue.size:
+                del self._queues[key]
+
+    async def close(self) -> None:
+        self._queues.clear()
+
+
+__all__ = ["BoundedEventIsolation", "IsolationConfig"]
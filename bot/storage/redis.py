@@ -0,0 +1,273 @@
+from dataclasses import dataclass, field
+from enum import Enum as PyEnum
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio.client import Pipeline, Redis
+from redis.asyncio.cluster import ClusterNode, ClusterPipeline, RedisCluster
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, RedisClusterException, TimeoutError
+
+from metrics import REDIS_LATENCY
+
+
+class RedisMode(PyEnum):
+    standalone = "standalone"
+    sentinel = "sentinel"
+    cluster = "cluster"
+
+
+@dataclass
+class RedisConfig:
+    host: str
+    port: int
+    db: int
+    password: Optional[str] = None
+    mode: RedisMode = RedisMode.standalone
+    # "host:port" pairs of the Sentinel processes / Cluster startup nodes
+    sentinels: List[str] = field(default_factory=list)
+    sentinel_master: str = "mymaster"
+    cluster_nodes: List[str] = field(default_factory=list)
+    # Connection pool
+    max_connections: int = 50
+    socket_keepalive: bool = True
+    socket_timeout: float = 5.0
+    socket_connect_timeout: float = 5.0
+    health_check_interval: int = 30
+    retry_attempts: int = 3
+    # FSM records
+    state_ttl: Optional[int] = None
+    data_ttl: Optional[int] = None
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        with REDIS_LATENCY.labels(command="PIPELINE").time():
+            return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """Redis client that records the latency of every command"""
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        with REDIS_LATENCY.labels(command=str(args[0]).upper()).time():
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedClusterPipeline(ClusterPipeline):
+    async def execute(self, raise_on_error: bool = True, allow_redirections: bool = True) -> List[Any]:
+        with REDIS_LATENCY.labels(command="PIPELINE").time():
+            return await super().execute(raise_on_error, allow_redirections)
+
+
+class InstrumentedRedisCluster(RedisCluster):
+    """Redis Cluster client that records the latency of every command"""
+
+    async def execute_command(self, *args: Any, **kwargs: Any) -> Any:
+        with REDIS_LATENCY.labels(command=str(args[0]).upper()).time():
+            return await super().execute_command(*args, **kwargs)
+
+    def pipeline(self, transaction: Optional[Any] = None, shard_hint: Optional[Any] = None) -> ClusterPipeline:
+        if transaction or shard_hint:
+            raise RedisClusterException("transaction and shard_hint are not supported in cluster mode")
+        return InstrumentedClusterPipeline(self)
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+def create_redis(cfg: RedisConfig) -> Union[Redis, RedisCluster]:
+    """Create a pooled Redis client for the configured topology.
+
+    Args:
+        cfg (RedisConfig): Redis configuration
+
+    Returns:
+        Union[Redis, RedisCluster]: Client that reconnects on failover
+    """
+    connection_kwargs: Dict[str, Any] = {
+        "password": cfg.password,
+        "socket_keepalive": cfg.socket_keepalive,
+        "socket_timeout": cfg.socket_timeout,
+        "socket_connect_timeout": cfg.socket_connect_timeout,
+        "health_check_interval": cfg.health_check_interval,
+        "retry": Retry(ExponentialBackoff(cap=1.0, base=0.05), cfg.retry_attempts),
+        "retry_on_error": [ConnectionError, TimeoutError],
+        "max_connections": cfg.max_connections,
+    }
+
+    if cfg.mode is RedisMode.sentinel:
+        sentinel = Sentinel(
+            [_parse_address(address) for address in cfg.sentinels],
+            sentinel_kwargs={
+                "password": cfg.password,
+                "socket_timeout": cfg.socket_timeout,
+                "socket_connect_timeout": cfg.socket_connect_timeout,
+            },
+        )
+        return sentinel.master_for(
+            cfg.sentinel_master,
+            redis_class=InstrumentedRedis,
+            db=cfg.db,
+            **connection_kwargs,
+        )
+
+    if cfg.mode is RedisMode.cluster:
+        nodes = [ClusterNode(*_parse_address(address)) for address in cfg.cluster_nodes]
+        if not nodes:
+            nodes = [ClusterNode(cfg.host, cfg.port)]
+        return InstrumentedRedisCluster(startup_nodes=nodes, **connection_kwargs)
+
+    return InstrumentedRedis(host=cfg.host, port=cfg.port, db=cfg.db, **connection_kwargs)
+
+
+class HashTagKeyBuilder(DefaultKeyBuilder):
+    """Key builder that wraps the per-user part of the key into a hash tag.
+
+    All records of one FSM context (state, data, lock) land in the same Redis Cluster slot,
+    so they can be read and written by a single pipeline.
+
+    Format:
+        <prefix>:{<bot_id?>:<chat_id>:<user_id>:<destiny?>}:<field?>
+    """
+
+    def build(
+        self,
+        key: StorageKey,
+        part: Optional[Literal["data", "state", "lock"]] = None,
+    ) -> str:
+        prefix, _, tag = super().build(key).partition(self.separator)
+        parts = [prefix, "{" + tag + "}"]
+        if part:
+            parts.append(part)
+        return self.separator.join(parts)
+
+
+class PipelinedRedisStorage(RedisStorage):
+    """FSM storage that keeps the context data in a Redis hash.
+
+    Every data value is a separate JSON-encoded hash field, so ``update_data`` is a single
+    pipelined round trip instead of GET + SET, and concurrent updates of different fields
+    no longer overwrite each other.
+    """
+
+    @property
+    def _transaction(self) -> bool:
+        # Cluster pipelines are not transactional; all commands still go to a single slot
+        return not isinstance(self.redis, RedisCluster)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    def _decode(self, raw: Dict[Any, Any]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for field_name, value in raw.items():
+            if isinstance(field_name, bytes):
+                field_name = field_name.decode("utf-8")
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            data[field_name] = self.json_loads(value)
+        return data
+
+    def _encode(self, data: Dict[str, Any]) -> Dict[str, str]:
+        return {field_name: self.json_dumps(value) for field_name, value in data.items()}
+
+    async def set_state(
+        self,
+        key: StorageKey,
+        state: StateType = None,
+    ) -> None:
+        if not self.data_ttl:
+            return await super().set_state(key, state)
+
+        # Keep the data alive as long as the state is
+        redis_key = self.key_builder.build(key, "state")
+        async with self.redis.pipeline(transaction=self._transaction) as pipe:
+            if state is None:
+                pipe.delete(redis_key)
+            else:
+                pipe.set(redis_key, state.state if isinstance(state, State) else state, ex=self.state_ttl)
+            pipe.expire(self.key_builder.build(key, "data"), self.data_ttl)
+            await pipe.execute()
+        return None
+
+    async def set_data(
+        self,
+        key: StorageKey,
+        data: Dict[str, Any],
+    ) -> None:
+        redis_key = self.key_builder.build(key, "data")
+        async with self.redis.pipeline(transaction=self._transaction) as pipe:
+            pipe.delete(redis_key)
+            if data:
+                pipe.hset(redis_key, mapping=self._encode(data))
+                if self.data_ttl:
+                    pipe.expire(redis_key, self.data_ttl)
+            await pipe.execute()
+
+    async def get_data(
+        self,
+        key: StorageKey,
+    ) -> Dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        return self._decode(await self.redis.hgetall(redis_key))
+
+    async def get_value(
+        self,
+        storage_key: StorageKey,
+        dict_key: str,
+        default: Optional[Any] = None,
+    ) -> Optional[Any]:
+        redis_key = self.key_builder.build(storage_key, "data")
+        value = await self.redis.hget(redis_key, dict_key)
+        if value is None:
+            return default
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return self.json_loads(value)
+
+    async def update_data(
+        self,
+        key: StorageKey,
+        data: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            return await self.get_data(key)
+        async with self.redis.pipeline(transaction=self._transaction) as pipe:
+            pipe.hset(redis_key, mapping=self._encode(data))
+            if self.data_ttl:
+                pipe.expire(redis_key, self.data_ttl)
+            pipe.hgetall(redis_key)
+            result = await pipe.execute()
+        return self._decode(result[-1])
+
+    async def sweep(self, max_idle: int, batch_size: int = 500) -> int:
+        """Delete the FSM records of users who have not touched them for max_idle seconds.
+
+        Only records without a TTL of their own are swept; the others expire anyway.
+
+        Returns:
+            int: Number of deleted keys
+        """
+        deleted = 0
+        pattern = f"{self.key_builder.prefix}{self.key_builder.separator}*"
+        async for key in self.redis.scan_iter(match=pattern, count=batch_size):
+            if await self.redis.ttl(key) != -1:
+                continue
+            idle = await self.redis.object("idletime", key)
+            if idle is not None and idle > max_idle:
+                deleted += await self.redis.delete(key)
+        return deleted
+
+
+__all__ = ["RedisConfig", "RedisMode", "create_redis", "HashTagKeyBuilder", "PipelinedRedisStorage"]
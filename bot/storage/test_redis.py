@@ -0,0 +1,24 @@
+from aiogram.fsm.storage.base import StorageKey
+from redis.crc import key_slot
+
+from storage import HashTagKeyBuilder
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+
+def test_user_part_is_a_hash_tag():
+    builder = HashTagKeyBuilder()
+    assert builder.build(KEY) == "fsm:{2:3}"
+    assert builder.build(KEY, "state") == "fsm:{2:3}:state"
+    assert builder.build(KEY, "data") == "fsm:{2:3}:data"
+
+
+def test_bot_id_and_destiny_stay_inside_the_tag():
+    builder = HashTagKeyBuilder(prefix="bot", with_bot_id=True, with_destiny=True)
+    assert builder.build(KEY, "lock") == "bot:{1:2:3:default}:lock"
+
+
+def test_records_of_one_context_share_a_slot():
+    builder = HashTagKeyBuilder()
+    slots = {key_slot(builder.build(KEY, part).encode()) for part in ("state", "data", "lock")}
+    assert len(slots) == 1